@@ -37,6 +37,14 @@ class CalibrationTool:
         self.min_aspect_ratio = tk.DoubleVar(value=0.5)
         self.max_aspect_ratio = tk.DoubleVar(value=2.0)
 
+        # 관심 영역 (ROI, 원본 이미지 좌표)
+        self.roi_polygon_mode = tk.BooleanVar(value=False)
+        self.roi_rect = None      # (x, y, w, h)
+        self.roi_points = []      # 다각형 꼭짓점 [(x, y), ...]
+        self.roi_closed = False   # 다각형 완성 여부
+        self._drag_start = None
+        self._display_scale = 1.0  # 표시 이미지 / 원본 이미지 배율
+
         # UI 생성
         self._create_widgets()
 
@@ -60,6 +68,24 @@ class CalibrationTool:
             command=self._save_parameters
         ).pack(side=tk.LEFT, padx=5)
 
+        ttk.Checkbutton(
+            top_frame,
+            text="다각형 ROI",
+            variable=self.roi_polygon_mode,
+            command=self._clear_roi
+        ).pack(side=tk.LEFT, padx=(20, 5))
+
+        ttk.Button(
+            top_frame,
+            text="ROI 초기화",
+            command=self._clear_roi
+        ).pack(side=tk.LEFT, padx=5)
+
+        ttk.Label(
+            top_frame,
+            text="ROI: 이미지 위에서 드래그 (다각형: 클릭으로 꼭짓점 추가, 더블클릭으로 완성)"
+        ).pack(side=tk.LEFT, padx=5)
+
         # 중앙: 이미지 표시 및 파라미터
         middle_frame = ttk.Frame(self.root)
         middle_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -71,6 +97,12 @@ class CalibrationTool:
         self.image_label = ttk.Label(image_frame, text="이미지를 불러오세요")
         self.image_label.pack()
 
+        # ROI 그리기 (마우스)
+        self.image_label.bind("<ButtonPress-1>", self._on_roi_press)
+        self.image_label.bind("<B1-Motion>", self._on_roi_drag)
+        self.image_label.bind("<ButtonRelease-1>", self._on_roi_release)
+        self.image_label.bind("<Double-Button-1>", self._on_roi_double_click)
+
         # 우측: 파라미터 조정
         param_frame = ttk.LabelFrame(middle_frame, text="파라미터 조정", padding=10, width=300)
         param_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(10, 0))
@@ -161,6 +193,85 @@ class CalibrationTool:
         # 감지 수행
         self._update_detection()
 
+    def _to_image_coords(self, event):
+        """
+        마우스 위치(표시 이미지 좌표)를 원본 이미지 좌표로 변환
+        """
+        h, w = self.current_image.shape[:2]
+        x = int(event.x / self._display_scale)
+        y = int(event.y / self._display_scale)
+        return min(max(x, 0), w - 1), min(max(y, 0), h - 1)
+
+    def _on_roi_press(self, event):
+        """
+        ROI 그리기 시작 (사각형: 드래그 시작점, 다각형: 꼭짓점 추가)
+        """
+        if self.current_image is None:
+            return
+
+        point = self._to_image_coords(event)
+        if self.roi_polygon_mode.get():
+            if self.roi_closed:
+                self.roi_points = []
+                self.roi_closed = False
+            self.roi_points.append(point)
+            self._update_detection()
+        else:
+            self._drag_start = point
+
+    def _on_roi_drag(self, event):
+        """
+        사각형 ROI 드래그 중
+        """
+        if self.current_image is None or self._drag_start is None:
+            return
+
+        x0, y0 = self._drag_start
+        x1, y1 = self._to_image_coords(event)
+        self.roi_rect = (min(x0, x1), min(y0, y1), abs(x1 - x0), abs(y1 - y0))
+        self._update_detection()
+
+    def _on_roi_release(self, event):
+        """
+        사각형 ROI 드래그 완료 (너무 작으면 취소)
+        """
+        if self._drag_start is None:
+            return
+
+        self._drag_start = None
+        if self.roi_rect and (self.roi_rect[2] < 10 or self.roi_rect[3] < 10):
+            self.roi_rect = None
+        self._update_detection()
+
+    def _on_roi_double_click(self, event):
+        """
+        다각형 ROI 완성
+        """
+        if self.roi_polygon_mode.get() and len(self.roi_points) >= 3:
+            self.roi_closed = True
+            self._update_detection()
+
+    def _clear_roi(self):
+        """
+        ROI 초기화 (전체 프레임)
+        """
+        self.roi_rect = None
+        self.roi_points = []
+        self.roi_closed = False
+        self._drag_start = None
+        self._update_detection()
+
+    def _get_roi(self):
+        """
+        현재 ROI 반환
+
+        Returns:
+            tuple | list | None: (x, y, w, h) 사각형, [(x, y), ...] 다각형, 없으면 None
+        """
+        if self.roi_polygon_mode.get():
+            return list(self.roi_points) if self.roi_closed else None
+        return self.roi_rect
+
     def _update_detection(self):
         """
         객체 감지 업데이트
@@ -178,11 +289,13 @@ class CalibrationTool:
         # 감지 수행
         count, boxes = self._detect_objects(
             self.current_image,
-            threshold, min_area, max_area, min_ratio, max_ratio
+            threshold, min_area, max_area, min_ratio, max_ratio,
+            roi=self._get_roi()
         )
 
         # 시각화
         vis_image = self._visualize_detection(self.current_image_rgb.copy(), boxes)
+        vis_image = self._visualize_roi(vis_image)
 
         # 표시
         self._display_image(vis_image)
@@ -190,10 +303,29 @@ class CalibrationTool:
         # 결과 업데이트
         self.result_label.config(text=f"감지된 객체: {count}개")
 
-    def _detect_objects(self, image, threshold, min_area, max_area, min_ratio, max_ratio):
+    def _detect_objects(self, image, threshold, min_area, max_area, min_ratio, max_ratio, roi=None):
         """
         객체 감지 (edge_device/detector.py와 동일한 로직)
         """
+        # ROI 크롭 (다각형은 감싸는 사각형으로 크롭 후 바깥 마스킹)
+        offset, mask = (0, 0), None
+        if roi:
+            img_h, img_w = image.shape[:2]
+            if isinstance(roi, tuple):
+                x, y, w, h = roi
+                x0, y0, x1, y1 = x, y, x + w, y + h
+            else:
+                points = np.array(roi, dtype=np.int32)
+                x0, y0 = points.min(axis=0)
+                x1, y1 = points.max(axis=0) + 1
+            x0, y0 = max(0, int(x0)), max(0, int(y0))
+            x1, y1 = min(img_w, int(x1)), min(img_h, int(y1))
+            image = image[y0:y1, x0:x1]
+            offset = (x0, y0)
+            if isinstance(roi, list):
+                mask = np.zeros(image.shape[:2], dtype=np.uint8)
+                cv2.fillPoly(mask, [points - (x0, y0)], 255)
+
         # 그레이스케일 변환
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
@@ -202,9 +334,12 @@ class CalibrationTool:
 
         # 이진화
         _, binary = cv2.threshold(blurred, threshold, 255, cv2.THRESH_BINARY)
+        if mask is not None:
+            binary = cv2.bitwise_and(binary, mask)
 
-        # 윤곽선 찾기
-        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # 윤곽선 찾기 (ROI 오프셋을 더해 전체 이미지 좌표로)
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                       offset=offset)
 
         # 필터링
         valid_objects = []
@@ -248,6 +383,22 @@ class CalibrationTool:
 
         return image
 
+    def _visualize_roi(self, image):
+        """
+        ROI 영역 표시 (그리는 중인 다각형 포함)
+        """
+        if self.roi_polygon_mode.get():
+            if self.roi_points:
+                points = np.array(self.roi_points, dtype=np.int32)
+                cv2.polylines(image, [points], self.roi_closed, (255, 200, 0), 2)
+                for point in self.roi_points:
+                    cv2.circle(image, point, 4, (255, 200, 0), -1)
+        elif self.roi_rect:
+            x, y, w, h = self.roi_rect
+            cv2.rectangle(image, (x, y), (x + w, y + h), (255, 200, 0), 2)
+
+        return image
+
     def _display_image(self, image_rgb):
         """
         이미지 표시
@@ -259,10 +410,12 @@ class CalibrationTool:
         h, w = image_rgb.shape[:2]
         max_w, max_h = 640, 480
 
+        self._display_scale = 1.0
         if w > max_w or h > max_h:
             scale = min(max_w / w, max_h / h)
             new_w, new_h = int(w * scale), int(h * scale)
             image_rgb = cv2.resize(image_rgb, (new_w, new_h))
+            self._display_scale = scale
 
         # PIL 이미지로 변환
         pil_image = Image.fromarray(image_rgb)
@@ -284,6 +437,7 @@ MIN_AREA = {self.min_area.get()}
 MAX_AREA = {self.max_area.get()}
 MIN_ASPECT_RATIO = {self.min_aspect_ratio.get():.2f}
 MAX_ASPECT_RATIO = {self.max_aspect_ratio.get():.2f}
+DETECTION_ROI = {self._get_roi()}
         """
 
         filepath = filedialog.asksaveasfilename(
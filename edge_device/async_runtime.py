@@ -0,0 +1,263 @@
+"""
+누룽지 생산량 카운팅 시스템 - asyncio 실행 방식 (EDGE_RUNTIME = "asyncio")
+단계별 워커 스레드 / paho 네트워크 스레드 / HTTP 서버 스레드 대신 이벤트 루프 1개에서 모든 작업을 스케줄링
+
+  - 캡처 + 감지: 전용 스레드 1개 (카메라 / 감지기는 한 스레드에서만 사용)
+  - 전송 단계 (MJPEG 갱신 + MQTT 발행): 전용 스레드 1개 - 밀리면 대기 중인 결과를 최신 것으로 교체
+  - MQTT 네트워크: paho 소켓을 루프에 등록 (MQTTSocketBridge, loop_start 스레드 없음)
+  - MJPEG HTTP: MJPEGServer.serve_async() 코루틴
+  - Firebase: 팬 완료 기록은 전용 스레드 1개, 주기 작업(scheduler.Scheduler)은 run_async()가
+    예정 시각을 관리하고 I/O 스레드 풀에서 실행 → 네트워크 타임아웃(5초)이 캡처 경로를 막지 않음
+  - Firebase 쓰기 큐(FirebaseWriter)와 스트리밍 구독(FirebaseStream)은 장시간 블로킹 연결이라 기존 스레드 유지
+
+main.py의 단계 함수(_capture_step / _detect_step / _publish_step ...)를 그대로 호출하므로
+감지 / 팬 완료 / 전송 결과는 스레드 실행 방식과 같다.
+"""
+
+import asyncio
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ASYNC_IO_WORKERS, DEBUG_MODE
+
+# MQTT 재연결 대기 시간 상한 (초)
+MQTT_RECONNECT_MAX_DELAY = 60
+
+
+class MQTTSocketBridge:
+    """
+    paho 클라이언트 소켓을 asyncio 루프에 등록 (paho loop_start 스레드 대체)
+
+    읽기 / 쓰기 가능해지면 루프가 loop_read / loop_write를 호출하고,
+    1초마다 loop_misc (keepalive, 재전송)를 실행한다. 연결이 끊기면 지수 백오프로 재연결.
+    """
+
+    def __init__(self, loop, client):
+        """
+        Args:
+            loop (asyncio.AbstractEventLoop): 실행 중인 이벤트 루프
+            client (paho.mqtt.client.Client): 이미 connect()를 호출한 클라이언트
+        """
+        self.loop = loop
+        self.client = client
+        self._loop_thread = threading.get_ident()
+        self._fd = None
+        self.reconnects = 0
+
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+
+        # MQTTClient() 생성 시 이미 열린 소켓 등록
+        sock = client.socket()
+        if sock is not None:
+            self._add_reader(sock.fileno())
+            if client.want_write():
+                self._add_writer(sock.fileno())
+
+    def _call(self, fn, *args):
+        """paho 콜백은 다른 스레드(전송 단계의 publish 등)에서도 호출됨 → 루프 스레드에서 실행"""
+        if threading.get_ident() == self._loop_thread:
+            fn(*args)
+        elif not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    # 소켓 번호(fd)로 등록/해제 - 소켓이 닫힌 뒤에 해제 요청이 처리되어도 안전
+    def _on_socket_open(self, client, userdata, sock):
+        self._call(self._add_reader, sock.fileno())
+
+    def _on_socket_close(self, client, userdata, sock):
+        self._call(self._remove, sock.fileno())
+
+    def _on_socket_register_write(self, client, userdata, sock):
+        self._call(self._add_writer, sock.fileno())
+
+    def _on_socket_unregister_write(self, client, userdata, sock):
+        self._call(self._remove_writer, sock.fileno())
+
+    def _add_reader(self, fd):
+        self._fd = fd
+        self.loop.add_reader(fd, self.client.loop_read)
+
+    def _add_writer(self, fd):
+        if fd == self._fd:
+            self.loop.add_writer(fd, self.client.loop_write)
+
+    def _remove_writer(self, fd):
+        if fd == self._fd:
+            self.loop.remove_writer(fd)
+
+    def _remove(self, fd):
+        if fd == self._fd:
+            self.loop.remove_reader(fd)
+            self.loop.remove_writer(fd)
+            self._fd = None
+
+    async def run(self, executor):
+        """
+        keepalive 코루틴 (취소될 때까지)
+
+        Args:
+            executor: 재연결(블로킹 TCP 연결)을 실행할 executor
+        """
+        delay = 1
+        while True:
+            await asyncio.sleep(1)
+            if self._fd is not None:
+                self.client.loop_misc()
+                continue
+            try:
+                await self.loop.run_in_executor(executor, self.client.reconnect)
+                self.reconnects += 1
+                delay = 1
+            except OSError as e:
+                if DEBUG_MODE:
+                    print(f"[Async] MQTT 재연결 실패 ({delay}초 후 재시도): {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MQTT_RECONNECT_MAX_DELAY)
+
+    def detach(self):
+        """소켓 등록 해제 (루프 종료 전 호출)"""
+        if self._fd is not None:
+            self._remove(self._fd)
+        for name in ("on_socket_open", "on_socket_close",
+                     "on_socket_register_write", "on_socket_unregister_write"):
+            setattr(self.client, name, None)
+
+
+class AsyncEdgeRuntime:
+    """
+    NurungjiCounterEdge를 asyncio 이벤트 루프 1개로 실행
+
+    사용법:
+        edge = NurungjiCounterEdge()   # EDGE_RUNTIME = "asyncio"
+        edge.run()                     # 내부에서 AsyncEdgeRuntime(edge).run()
+    """
+
+    def __init__(self, edge):
+        """
+        Args:
+            edge (NurungjiCounterEdge): 단계 함수 / 컴포넌트를 가진 엣지 객체
+        """
+        self.edge = edge
+        self._capture_executor = ThreadPoolExecutor(1, thread_name_prefix="edge-capture")
+        self._publish_executor = ThreadPoolExecutor(1, thread_name_prefix="edge-publish")
+        self._firebase_executor = ThreadPoolExecutor(1, thread_name_prefix="edge-firebase")
+        self._io_executor = ThreadPoolExecutor(ASYNC_IO_WORKERS, thread_name_prefix="edge-io")
+        self._loop = None
+        self._stopped = None
+
+        # 전송 단계: 실행 중 1개 + 대기 1개 (대기 중인 결과는 최신 것으로 교체)
+        self._publish_busy = False
+        self._next_result = None
+        self.publish_dropped = 0
+
+    def run(self):
+        """이벤트 루프 실행 (종료 신호 또는 edge.running = False 까지)"""
+        try:
+            asyncio.run(self._main())
+        finally:
+            for executor in (self._capture_executor, self._publish_executor,
+                             self._firebase_executor, self._io_executor):
+                executor.shutdown(wait=True)
+
+    def stop(self):
+        """다른 스레드에서 종료 요청"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    async def _main(self):
+        edge = self.edge
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                self._loop.add_signal_handler(sig, self._stopped.set)
+
+        bridge = MQTTSocketBridge(self._loop, edge.mqtt_client.client)
+        tasks = [
+            asyncio.ensure_future(edge.mjpeg_server.serve_async(self._io_executor)),
+            asyncio.ensure_future(bridge.run(self._io_executor)),
+            asyncio.ensure_future(self._frame_loop()),
+            asyncio.ensure_future(edge.scheduler.run_async(self._io_executor)),
+        ]
+        print(f"[Async] 이벤트 루프 시작 (I/O 스레드 {ASYNC_IO_WORKERS}개)")
+
+        await self._stopped.wait()
+        print("[Async] 이벤트 루프 종료 중...")
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        bridge.detach()
+
+    async def _run_stage(self, name, executor, fn, *args):
+        """
+        단계 함수를 executor에서 실행 (처리 시간은 스레드 안에서 측정 → 대기 시간 제외)
+        처리 시간 / 오류 수는 같은 이름의 PipelineStage 통계에 기록
+
+        Returns:
+            단계 함수 결과 (오류 시 None)
+        """
+        stage = self.edge._stages[name]
+
+        def call():
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            except Exception as e:
+                stage.errors += 1
+                print(f"[Pipeline] {name} 단계 오류: {e}")
+                return None
+            finally:
+                stage.histogram.observe(time.perf_counter() - start)
+
+        return await self._loop.run_in_executor(executor, call)
+
+    async def _frame_loop(self):
+        """[캡처 코루틴] 촬영 간격마다 캡처 + 감지 → 전송 / Firebase 기록은 기다리지 않음"""
+        edge = self.edge
+        while edge.running:
+            loop_start = self._loop.time()
+            interval = edge._current_interval()
+
+            item = await self._run_stage("capture", self._capture_executor, edge._capture_step)
+            if item is not None:
+                result = await self._run_stage("detect", self._capture_executor, edge._detect_step, item)
+                if result is not None:
+                    self._submit_publish(result)
+                self._drain_firebase_events()
+
+            await asyncio.sleep(max(0.0, interval - (self._loop.time() - loop_start)))
+        self._stopped.set()
+
+    def _submit_publish(self, result):
+        """전송 단계 실행 (이전 전송이 끝나지 않았으면 대기 슬롯의 결과를 교체)"""
+        if self._publish_busy:
+            if self._next_result is not None:
+                self.publish_dropped += 1
+            self._next_result = result
+            return
+        self._publish_busy = True
+        future = asyncio.ensure_future(
+            self._run_stage("publish", self._publish_executor, self.edge._publish_step, result)
+        )
+        future.add_done_callback(self._publish_done)
+
+    def _publish_done(self, _):
+        self._publish_busy = False
+        result, self._next_result = self._next_result, None
+        if result is not None and self.edge.running:
+            self._submit_publish(result)
+
+    def _drain_firebase_events(self):
+        """감지 단계가 넣은 팬 완료 이벤트를 Firebase 스레드로 (순서 유지, 캡처는 기다리지 않음)"""
+        while True:
+            event = self.edge._firebase_events.get(timeout=0)
+            if event is None:
+                return
+            asyncio.ensure_future(
+                self._run_stage("firebase", self._firebase_executor, self.edge._record_batch, event)
+            )
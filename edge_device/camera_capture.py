@@ -1,11 +1,144 @@
 """
 누룽지 생산량 카운팅 시스템 - 카메라 캡처 모듈
 Raspberry Pi Camera Module V2를 사용하여 프레임 캡처
+
+캡처 모드 (config.CAMERA_CAPTURE_MODE):
+  "video" → 비디오 설정으로 연속 스트리밍, 캡처 스레드는 최신 캡처 요청(CompletedRequest)만 보관하고
+            배열 변환(make_array)은 프레임을 가져갈 때만 수행 (소비되지 않은 1080p 프레임은 복사하지 않음)
+  "still" → 스틸 설정, capture_frame() 호출 시마다 블로킹 캡처 (기존 방식)
+
+lores 스트림 (config.CAMERA_LORES_ENABLED):
+  감지용 저해상도 그레이스케일 프레임은 capture_lores_frame()으로 최신 캡처 요청에서 가져오고,
+  메인 해상도 프레임은 필요할 때만 capture_detection_frames(with_main=True)로 같은 캡처 요청에서 추출
+  (capture_frame()은 다음 센서 프레임에서 메인 프레임만 추출 - 테스트 도구 / 단독 캡처용)
 """
 
+import threading
+import time
+from collections import deque
+
 import numpy as np
-from picamera2 import Picamera2
-from config import CAMERA_RESOLUTION, CAMERA_FRAMERATE, DEBUG_MODE
+from config import (
+    CAMERA_RESOLUTION,
+    CAMERA_FRAMERATE,
+    CAMERA_CAPTURE_MODE,
+    CAMERA_BUFFER_SIZE,
+    CAMERA_SOURCE,
+    CAMERA_LORES_ENABLED,
+    CAMERA_LORES_RESOLUTION,
+    DEBUG_MODE
+)
+
+try:
+    from picamera2 import Picamera2
+except ImportError:  # 라즈베리 파이가 아닌 환경 (synthetic 소스로 테스트)
+    Picamera2 = None
+
+
+class SyntheticRequest:
+    """SyntheticCamera.capture_request() 결과 (Picamera2 CompletedRequest 대체)"""
+
+    def __init__(self, renderers, metadata):
+        self._renderers = renderers
+        self._metadata = metadata
+
+    def make_array(self, name="main"):
+        # 요청된 스트림만 렌더링 (Picamera2처럼 스트림별 복사 비용이 따로 발생)
+        return self._renderers[name]()
+
+    def get_metadata(self):
+        return self._metadata
+
+    def release(self):
+        self._renderers = None
+
+
+class SyntheticCamera:
+    """
+    Picamera2와 동일한 인터페이스의 가상 카메라 (카메라 없는 PC에서 테스트용)
+
+    어두운 배경 위에 밝은 사각형(가상 누룽지)을 그리며,
+    5초마다 개수가 0 → 5개로 순환하여 팬 채움/비움을 흉내낸다.
+    capture_array()는 실제 센서처럼 프레임레이트에 맞춰 블로킹된다.
+    """
+
+    def __init__(self):
+        self._config = None
+        self._started = False
+        self._frame_index = 0
+        self._next_frame_time = 0.0
+
+    def create_still_configuration(self, main=None, lores=None, **kwargs):
+        return {"main": dict(main or {}), "lores": lores, **kwargs}
+
+    def create_video_configuration(self, main=None, lores=None, **kwargs):
+        return {"main": dict(main or {}), "lores": lores, **kwargs}
+
+    def configure(self, config):
+        self._config = config
+
+    def start(self):
+        self._started = True
+        self._next_frame_time = time.monotonic()
+
+    def stop(self):
+        self._started = False
+
+    def close(self):
+        self._config = None
+
+    def _render_gray(self, frame_index, width, height):
+        main_w, main_h = self._config["main"].get("size", CAMERA_RESOLUTION)
+        scale_x, scale_y = width / main_w, height / main_h
+        frame = np.full((height, width), 40, dtype=np.uint8)
+
+        pieces = (frame_index // (CAMERA_FRAMERATE * 5)) % 6
+        size = max(main_h // 9, 8)
+        for i in range(pieces):
+            x = size + i * size * 2
+            y = main_h // 2 - size // 2
+            frame[int(y * scale_y):int((y + size) * scale_y),
+                  int(x * scale_x):int((x + size) * scale_x)] = 220
+        return frame
+
+    def _render_main(self, frame_index):
+        width, height = self._config["main"].get("size", CAMERA_RESOLUTION)
+        gray = self._render_gray(frame_index, width, height)
+        return np.repeat(gray[:, :, np.newaxis], 3, axis=2)
+
+    def _render_lores(self, frame_index):
+        # Picamera2 lores YUV420 배열과 동일한 배치: Y 평면(h행) + U/V 평면(h/2행)
+        width, height = self._config["lores"]["size"]
+        y_plane = self._render_gray(frame_index, width, height)
+        uv_planes = np.full((height // 2, width), 128, dtype=np.uint8)
+        return np.vstack([y_plane, uv_planes])
+
+    def capture_request(self):
+        # 센서 프레임레이트에 맞춰 대기
+        now = time.monotonic()
+        if self._next_frame_time > now:
+            time.sleep(self._next_frame_time - now)
+        self._next_frame_time = max(self._next_frame_time, now) + 1.0 / CAMERA_FRAMERATE
+
+        self._frame_index += 1
+        frame_index = self._frame_index
+        renderers = {"main": lambda: self._render_main(frame_index)}
+        if self._config.get("lores"):
+            renderers["lores"] = lambda: self._render_lores(frame_index)
+        metadata = {"SensorTimestamp": time.monotonic_ns()}
+        return SyntheticRequest(renderers, metadata)
+
+    def capture_array(self, name="main"):
+        request = self.capture_request()
+        try:
+            return request.make_array(name)
+        finally:
+            request.release()
+
+    def capture_file(self, filepath):
+        import cv2
+        frame = self.capture_array("main")
+        cv2.imwrite(filepath, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
 
 
 class CameraCapture:
@@ -13,45 +146,253 @@ class CameraCapture:
     라즈베리 파이 카메라 모듈을 관리하는 클래스
     """
 
-    def __init__(self):
-        """카메라 초기화"""
+    def __init__(self, capture_mode=None, source=None, lores_enabled=None):
+        """
+        카메라 초기화
+
+        Args:
+            capture_mode (str): "video" | "still" (None이면 config 사용)
+            source (str): "picamera2" | "synthetic" (None이면 config 사용)
+            lores_enabled (bool): 저해상도 보조 스트림 사용 여부 (None이면 config 사용)
+        """
         self.camera = None
+        self.capture_mode = capture_mode or CAMERA_CAPTURE_MODE
+        self.source = source or CAMERA_SOURCE
+        self.lores_enabled = CAMERA_LORES_ENABLED if lores_enabled is None else lores_enabled
+        self.main_size = tuple(CAMERA_RESOLUTION)
+        self.lores_size = tuple(CAMERA_LORES_RESOLUTION) if self.lores_enabled else None
+
+        # 스트리밍 모드 상태 (캡처 스레드 ↔ 메인 루프 공유)
+        # 최신 캡처 요청 1개만 보관 (버퍼를 오래 잡고 있으면 센서가 새 프레임을 채울 버퍼가 모자람)
+        # 링 버퍼에는 최근 프레임 번호/시각만 보관 (캡처 FPS 통계용)
+        self._latest = None  # (sequence, timestamp, request)
+        self._ring = deque(maxlen=CAMERA_BUFFER_SIZE)  # (sequence, timestamp)
+        self._frame_cond = threading.Condition()
+        self._capture_thread = None
+        self._stop_event = threading.Event()
+        self._sequence = 0
+        self._last_delivered_seq = 0
+
+        # lores 모드에서 메인 프레임 요청 (캡처 스레드가 다음 프레임에서 추출)
+        self._main_requested = False
+        self._main_frame = None  # (sequence, timestamp, frame)
+
+        # 통계
+        self._frames_captured = 0
+        self._frames_delivered = 0
+        self._frames_dropped = 0
+        self._capture_errors = 0
+
+        # 마지막으로 반환한 프레임 정보
+        self.last_frame_timestamp = None
+        self.last_frame_sequence = 0
+
         self._initialize_camera()
 
+    def _create_camera(self):
+        """프레임 소스 생성 (Picamera2 또는 가상 카메라)"""
+        if self.source == "synthetic":
+            return SyntheticCamera()
+        if Picamera2 is None:
+            raise RuntimeError("picamera2 모듈이 없습니다 (CAMERA_SOURCE='synthetic' 사용 가능)")
+        return Picamera2()
+
     def _initialize_camera(self):
         """카메라 설정 및 시작"""
         try:
-            self.camera = Picamera2()
+            self.camera = self._create_camera()
 
             # 카메라 설정
-            config = self.camera.create_still_configuration(
-                main={"size": CAMERA_RESOLUTION, "format": "RGB888"}
-            )
+            main_stream = {"size": CAMERA_RESOLUTION, "format": "RGB888"}
+            lores_stream = None
+            if self.lores_enabled:
+                lores_stream = {"size": CAMERA_LORES_RESOLUTION, "format": "YUV420"}
+
+            if self.capture_mode == "video":
+                config = self.camera.create_video_configuration(
+                    main=main_stream,
+                    lores=lores_stream,
+                    controls={"FrameRate": CAMERA_FRAMERATE},
+                    buffer_count=CAMERA_BUFFER_SIZE + 1
+                )
+            else:
+                config = self.camera.create_still_configuration(
+                    main=main_stream,
+                    lores=lores_stream
+                )
             self.camera.configure(config)
 
             # 카메라 시작
             self.camera.start()
 
+            if self.capture_mode == "video":
+                self._start_capture_thread()
+
             if DEBUG_MODE:
-                print(f"[Camera] 카메라 초기화 완료 - 해상도: {CAMERA_RESOLUTION}")
+                print(f"[Camera] 카메라 초기화 완료 - 해상도: {CAMERA_RESOLUTION}, "
+                      f"lores: {self.lores_size or '사용 안 함'}, "
+                      f"모드: {self.capture_mode}, 소스: {self.source}")
 
         except Exception as e:
             print(f"[Camera] 오류: 카메라 초기화 실패 - {e}")
             raise
 
-    def capture_frame(self):
+    def _start_capture_thread(self):
+        """연속 캡처 스레드 시작 (video 모드)"""
+        self._stop_event.clear()
+        self._capture_thread = threading.Thread(
+            target=self._capture_loop,
+            daemon=True,
+            name="camera-capture"
+        )
+        self._capture_thread.start()
+
+    def _capture_loop(self):
+        """
+        캡처 스레드 본체: 센서 프레임레이트로 계속 캡처 요청을 받아 최신 요청만 보관.
+        배열 변환은 메인 루프가 프레임을 가져갈 때 수행하고, 가져가기 전에 새 요청으로 대체된
+        요청은 배열로 만들지 않고 바로 반환 (드롭으로 집계).
+        lores 모드의 capture_frame() 요청이 있을 때만 이 스레드에서 메인 프레임을 추출.
+        """
+        while not self._stop_event.is_set():
+            main_frame = None
+            try:
+                request = self.camera.capture_request()
+                if self._main_requested:
+                    try:
+                        main_frame = request.make_array("main")
+                    except Exception:
+                        request.release()
+                        raise
+            except Exception as e:
+                self._capture_errors += 1
+                if not self._stop_event.is_set():
+                    print(f"[Camera] 오류: 스트림 캡처 실패 - {e}")
+                    time.sleep(0.1)
+                continue
+
+            timestamp = time.time()
+            with self._frame_cond:
+                self._sequence += 1
+                self._frames_captured += 1
+                replaced, self._latest = self._latest, (self._sequence, timestamp, request)
+                self._ring.append((self._sequence, timestamp))
+                if main_frame is not None:
+                    self._main_frame = (self._sequence, timestamp, main_frame)
+                    self._main_requested = False
+                self._frame_cond.notify_all()
+            if replaced is not None:
+                replaced[2].release()
+
+    def _extract_lores_gray(self, yuv):
+        """
+        YUV420 lores 배열에서 Y 평면(그레이스케일)만 추출
+
+        Args:
+            yuv (numpy.ndarray): (height * 3/2, stride) 형태의 YUV420 배열
+
+        Returns:
+            numpy.ndarray: (height, width) 그레이스케일 이미지
+        """
+        width, height = self.lores_size
+        return yuv[:height, :width]
+
+    def _pull_main_frame(self, timeout):
         """
-        현재 프레임 캡처
+        lores 모드에서 메인 해상도 프레임을 다음 센서 프레임에서 가져옴 (video 모드)
+
+        Args:
+            timeout (float): 대기 최대 시간 (초)
+
+        Returns:
+            tuple | None: (sequence, timestamp, frame)
+        """
+        deadline = time.monotonic() + timeout
+        with self._frame_cond:
+            self._main_requested = True
+            self._main_frame = None
+            while self._main_frame is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop_event.is_set():
+                    self._main_requested = False
+                    return None
+                self._frame_cond.wait(remaining)
+            return self._main_frame
+
+    def _take_latest(self, timeout):
+        """
+        아직 전달하지 않은 최신 캡처 요청을 꺼냄 (video 모드)
+        꺼낸 요청은 호출한 쪽 소유 - 필요한 스트림만 배열로 만든 뒤 release() 해야 함
+
+        Args:
+            timeout (float): 새 프레임 대기 최대 시간 (초)
+
+        Returns:
+            tuple | None: (sequence, timestamp, request)
+        """
+        deadline = time.monotonic() + timeout
+        with self._frame_cond:
+            while self._latest is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop_event.is_set():
+                    return None
+                self._frame_cond.wait(remaining)
+
+            latest, self._latest = self._latest, None
+            sequence = latest[0]
+            if self._last_delivered_seq:
+                # 건너뛴 프레임 = 메인 루프가 가져가기 전에 새 프레임으로 대체된 프레임
+                self._frames_dropped += sequence - self._last_delivered_seq - 1
+            self._last_delivered_seq = sequence
+            self._frames_delivered += 1
+            return latest
+
+    def _make_detect_frame(self, request):
+        """캡처 요청에서 감지용 프레임 추출 (lores 그레이스케일 또는 메인 RGB) 후 요청 반환"""
+        try:
+            if self.lores_enabled:
+                return self._extract_lores_gray(request.make_array("lores"))
+            return request.make_array("main")
+        finally:
+            request.release()
+
+    def capture_frame(self, timeout=1.0):
+        """
+        현재 프레임 캡처 (메인 해상도)
+
+        video 모드에서는 센서를 기다리지 않고 캡처 스레드가 보관한 최신 프레임을 반환한다.
+        (이전 호출 이후 새 프레임이 없을 때만 최대 timeout초 대기)
+        lores 모드에서는 다음 센서 프레임에서 메인 스트림을 추출한다 (MJPEG/캘리브레이션용).
+
+        Args:
+            timeout (float): video 모드에서 새 프레임 대기 최대 시간 (초)
 
         Returns:
             numpy.ndarray: RGB 이미지 배열 (height, width, 3)
         """
+        if self.lores_enabled:
+            return self._capture_main_on_demand(timeout)
+
         try:
-            # 프레임 캡처
-            frame = self.camera.capture_array()
+            if self.capture_mode == "video":
+                latest = self._take_latest(timeout)
+                if latest is None:
+                    print("[Camera] 오류: 새 프레임 대기 시간 초과")
+                    return None
+                sequence, timestamp, request = latest
+                frame = self._make_detect_frame(request)
+            else:
+                frame = self.camera.capture_array()
+                self._sequence += 1
+                self._frames_captured += 1
+                self._frames_delivered += 1
+                sequence, timestamp = self._sequence, time.time()
+
+            self.last_frame_sequence = sequence
+            self.last_frame_timestamp = timestamp
 
             if DEBUG_MODE:
-                print(f"[Camera] 프레임 캡처 완료 - Shape: {frame.shape}")
+                print(f"[Camera] 프레임 캡처 완료 - #{sequence}, Shape: {frame.shape}")
 
             return frame
 
@@ -59,6 +400,105 @@ class CameraCapture:
             print(f"[Camera] 오류: 프레임 캡처 실패 - {e}")
             return None
 
+    def capture_lores_frame(self, timeout=1.0):
+        """
+        감지용 저해상도 그레이스케일 프레임 캡처 (lores 모드 전용)
+
+        Args:
+            timeout (float): video 모드에서 새 프레임 대기 최대 시간 (초)
+
+        Returns:
+            numpy.ndarray | None: 그레이스케일 이미지 (lores_height, lores_width)
+        """
+        if not self.lores_enabled:
+            return None
+
+        try:
+            if self.capture_mode == "video":
+                latest = self._take_latest(timeout)
+                if latest is None:
+                    print("[Camera] 오류: 새 lores 프레임 대기 시간 초과")
+                    return None
+                sequence, timestamp, request = latest
+                frame = self._make_detect_frame(request)
+            else:
+                frame = self._extract_lores_gray(self.camera.capture_array("lores"))
+                self._sequence += 1
+                self._frames_captured += 1
+                self._frames_delivered += 1
+                sequence, timestamp = self._sequence, time.time()
+
+            self.last_frame_sequence = sequence
+            self.last_frame_timestamp = timestamp
+            return frame
+
+        except Exception as e:
+            print(f"[Camera] 오류: lores 프레임 캡처 실패 - {e}")
+            return None
+
+    def capture_detection_frames(self, with_main=False, timeout=1.0):
+        """
+        감지용 프레임 + (필요할 때만) 같은 센서 프레임의 메인 해상도 프레임 캡처
+
+        lores 모드에서 메인 프레임은 lores와 같은 캡처 요청에서 추출하므로 감지 결과(박스)와
+        MJPEG/캘리브레이션 이미지가 같은 순간의 장면이다. lores를 쓰지 않으면 감지 프레임이 곧 메인 프레임.
+
+        Args:
+            with_main (bool): lores 모드에서 메인 프레임도 추출할지 (MJPEG 시청자 / 스냅샷 / 캘리브레이션 이미지)
+            timeout (float): video 모드에서 새 프레임 대기 최대 시간 (초)
+
+        Returns:
+            tuple: (감지 프레임, 메인 프레임 | None) - 캡처 실패 시 (None, None)
+        """
+        if not self.lores_enabled:
+            frame = self.capture_frame(timeout)
+            return frame, frame
+        if not with_main:
+            return self.capture_lores_frame(timeout), None
+
+        try:
+            if self.capture_mode == "video":
+                latest = self._take_latest(timeout)
+                if latest is None:
+                    print("[Camera] 오류: 새 lores 프레임 대기 시간 초과")
+                    return None, None
+                sequence, timestamp, request = latest
+            else:
+                request = self.camera.capture_request()
+                self._sequence += 1
+                self._frames_captured += 1
+                self._frames_delivered += 1
+                sequence, timestamp = self._sequence, time.time()
+
+            try:
+                main_frame = request.make_array("main")
+                frame = self._extract_lores_gray(request.make_array("lores"))
+            finally:
+                request.release()
+
+            self.last_frame_sequence = sequence
+            self.last_frame_timestamp = timestamp
+            return frame, main_frame
+
+        except Exception as e:
+            print(f"[Camera] 오류: 프레임 캡처 실패 - {e}")
+            return None, None
+
+    def _capture_main_on_demand(self, timeout):
+        """lores 모드에서 메인 해상도 프레임 1장 캡처"""
+        try:
+            if self.capture_mode == "video":
+                latest = self._pull_main_frame(timeout)
+                if latest is None:
+                    print("[Camera] 오류: 메인 프레임 대기 시간 초과")
+                    return None
+                return latest[2]
+            return self.camera.capture_array("main")
+
+        except Exception as e:
+            print(f"[Camera] 오류: 메인 프레임 캡처 실패 - {e}")
+            return None
+
     def capture_and_save(self, filepath):
         """
         프레임 캡처 및 파일로 저장 (디버깅용)
@@ -73,6 +513,30 @@ class CameraCapture:
         except Exception as e:
             print(f"[Camera] 오류: 이미지 저장 실패 - {e}")
 
+    def get_capture_stats(self):
+        """
+        캡처 통계 반환
+
+        Returns:
+            dict: 캡처/전달/드롭 프레임 수, 마지막 프레임 타임스탬프, 실측 캡처 FPS
+        """
+        with self._frame_cond:
+            capture_fps = None
+            if len(self._ring) >= 2:
+                span = self._ring[-1][1] - self._ring[0][1]
+                if span > 0:
+                    capture_fps = round((len(self._ring) - 1) / span, 2)
+
+            return {
+                "mode": self.capture_mode,
+                "frames_captured": self._frames_captured,
+                "frames_delivered": self._frames_delivered,
+                "frames_dropped": self._frames_dropped,
+                "capture_errors": self._capture_errors,
+                "last_frame_timestamp": self.last_frame_timestamp,
+                "capture_fps": capture_fps
+            }
+
     def get_camera_info(self):
         """
         카메라 정보 반환
@@ -82,25 +546,44 @@ class CameraCapture:
         """
         return {
             "resolution": CAMERA_RESOLUTION,
+            "lores_resolution": self.lores_size,
             "framerate": CAMERA_FRAMERATE,
+            "capture_mode": self.capture_mode,
+            "source": self.source,
             "is_running": self.camera is not None
         }
 
     def close(self):
         """카메라 리소스 해제"""
+        self._stop_event.set()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
+
+        if self._capture_thread is not None:
+            self._capture_thread.join(timeout=2.0)
+            self._capture_thread = None
+
+        if self._latest is not None:
+            self._latest[2].release()
+            self._latest = None
+
         if self.camera is not None:
             self.camera.stop()
             self.camera.close()
+            self.camera = None
             if DEBUG_MODE:
                 print("[Camera] 카메라 종료")
 
 
 # 테스트 코드
 if __name__ == "__main__":
+    import sys
+
     print("카메라 테스트 시작...")
 
-    # 카메라 초기화
-    camera = CameraCapture()
+    # 카메라 초기화 (python camera_capture.py synthetic → 가상 카메라)
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    camera = CameraCapture(source=source)
 
     # 카메라 정보 출력
     info = camera.get_camera_info()
@@ -113,6 +596,22 @@ if __name__ == "__main__":
     else:
         print("✗ 프레임 캡처 실패")
 
+    if camera.lores_enabled:
+        lores = camera.capture_lores_frame()
+        if lores is not None:
+            print(f"✓ lores 프레임 캡처 성공 - Shape: {lores.shape}")
+        else:
+            print("✗ lores 프레임 캡처 실패")
+
+    # 연속 캡처 테스트 (메인 루프가 느릴 때 드롭 집계 확인)
+    for _ in range(5):
+        time.sleep(0.2)
+        if camera.lores_enabled:
+            camera.capture_lores_frame()
+        else:
+            camera.capture_frame()
+    print(f"캡처 통계: {camera.get_capture_stats()}")
+
     # 테스트 이미지 저장
     camera.capture_and_save("/tmp/test_capture.jpg")
 
@@ -0,0 +1,129 @@
+"""
+누룽지 생산량 카운팅 시스템 - 적응형 촬영 간격
+장면이 바뀌는 동안(팬을 채우거나 비우는 중)은 빠르게, 정지해 있으면 점점 느리게 촬영
+
+  - 활동: 모션 게이트가 장면 변화를 감지했거나 감지 개수가 바뀐 프레임
+  - 활동이 있으면 즉시 최소 간격으로, 활동 없는 프레임이 hold_frames 동안 이어지면
+    매 프레임 간격 × backoff (상한 max_interval) → 지수 백오프
+  - 비활성화하면 고정 간격(CAPTURE_INTERVAL) 사용
+"""
+
+import time
+
+from config import (
+    ADAPTIVE_CAPTURE_ENABLED,
+    CAPTURE_INTERVAL_MIN,
+    CAPTURE_INTERVAL_MAX,
+    CAPTURE_BACKOFF_FACTOR,
+    CAPTURE_ACTIVE_HOLD
+)
+
+
+class AdaptiveCaptureInterval:
+    """
+    장면 활동에 따라 촬영 간격 조절 (감지 단계 스레드 1개에서만 update 호출)
+    """
+
+    def __init__(self, enabled=None, min_interval=None, max_interval=None,
+                 backoff=None, hold_frames=None):
+        """
+        Args:
+            enabled (bool): 적응형 간격 사용 여부 (None이면 config 사용)
+            min_interval (float): 활동 중 촬영 간격 (초)
+            max_interval (float): 정지 장면 촬영 간격 상한 (초)
+            backoff (float): 활동이 없을 때 프레임마다 간격에 곱할 배수 (> 1)
+            hold_frames (int): 마지막 활동 후 최소 간격을 유지할 프레임 수
+        """
+        self.enabled = ADAPTIVE_CAPTURE_ENABLED if enabled is None else enabled
+        self.min_interval = min_interval or CAPTURE_INTERVAL_MIN
+        self.max_interval = max_interval or CAPTURE_INTERVAL_MAX
+        self.backoff = backoff or CAPTURE_BACKOFF_FACTOR
+        self.hold_frames = CAPTURE_ACTIVE_HOLD if hold_frames is None else hold_frames
+
+        # 시작 직후는 활동 중으로 간주 (첫 장면을 빠르게 파악)
+        self.interval = self.min_interval
+        self._idle_frames = 0
+
+        # 통계
+        self.frames = 0
+        self.active_frames = 0
+        self.speedups = 0
+        self._seconds_at_min = 0.0
+        self._last_update = None
+
+    def set_range(self, min_interval=None, max_interval=None):
+        """간격 범위 변경 (Firebase deviceSettings) - 현재 간격은 새 범위 안으로 조정"""
+        if min_interval is not None:
+            self.min_interval = min_interval
+        if max_interval is not None:
+            self.max_interval = max_interval
+        self.max_interval = max(self.max_interval, self.min_interval)
+        self.interval = min(max(self.interval, self.min_interval), self.max_interval)
+
+    def update(self, active, now=None):
+        """
+        감지 결과 1프레임 반영
+
+        Args:
+            active (bool): 이번 프레임에 장면 변화 / 개수 변화가 있었는지
+            now (float): 현재 시각 (테스트용)
+
+        Returns:
+            float: 다음 촬영 간격 (초)
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_update is not None and self.interval <= self.min_interval:
+            self._seconds_at_min += now - self._last_update
+        self._last_update = now
+        self.frames += 1
+
+        if active:
+            self.active_frames += 1
+            self._idle_frames = 0
+            if self.interval > self.min_interval:
+                self.speedups += 1
+            self.interval = self.min_interval
+        else:
+            self._idle_frames += 1
+            if self._idle_frames > self.hold_frames:
+                self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval
+
+    def get_stats(self):
+        """
+        간격 통계 반환
+
+        Returns:
+            dict: 현재 간격/촬영 빈도, 범위, 활동 프레임 비율, 가속 횟수, 최소 간격 유지 시간
+        """
+        return {
+            "enabled": self.enabled,
+            "interval": round(self.interval, 3),
+            "rate_fps": round(1.0 / self.interval, 2),
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "active_ratio": round(self.active_frames / self.frames, 3) if self.frames else 0.0,
+            "speedups": self.speedups,
+            "seconds_at_min": round(self._seconds_at_min, 1)
+        }
+
+
+# 테스트 코드: 정지 → 팬 채우기 → 정지 → 팬 비우기 순서로 간격 변화 확인
+if __name__ == "__main__":
+    print("적응형 촬영 간격 테스트 시작...")
+
+    rate = AdaptiveCaptureInterval(enabled=True, min_interval=0.25, max_interval=4.0,
+                                   backoff=1.5, hold_frames=3)
+    scenario = [False] * 15 + [True] * 8 + [False] * 20 + [True] * 4 + [False] * 10
+
+    now = 0.0
+    intervals = []
+    for active in scenario:
+        interval = rate.update(active, now)
+        intervals.append(interval)
+        now += interval
+
+    fixed_frames = int(now / 1.0)
+    print("간격:", " ".join(f"{i:.2f}" for i in intervals))
+    print(f"촬영 {len(scenario)}장 / {now:.1f}초 (고정 1초 간격이면 {fixed_frames}장)")
+    print(f"통계: {rate.get_stats()}")
@@ -10,19 +10,52 @@ sync test: 2026-02-26
 MQTT_BROKER_ADDRESS = "192.168.0.67"  # NAS IP (MQTT 브로커)
 MQTT_BROKER_PORT = 1883
 MQTT_TOPICS = {
-    "count": "nurungji/count",                # 실시간 카운트
+    "count": "nurungji/count",                # 실시간 카운트 (JSON)
+    "count_bin": "nurungji/count/bin",        # 실시간 카운트 (바이너리, wire_format.py)
     "batch_complete": "nurungji/batch_complete",  # 팬 확정
     "status": "nurungji/status",              # 디바이스 상태
     "command": "nurungji/command",            # PC → 라즈베리파이 명령
-    "calibration_image": "nurungji/calibration/image"  # 캘리브레이션 이미지 → PC
+    "calibration_image": "nurungji/calibration/image",  # 캘리브레이션 이미지 → PC (base64 JSON)
+    "calibration_image_bin": "nurungji/calibration/image/jpeg"  # 캘리브레이션 이미지 (헤더 + JPEG)
 }
 
+# 지속 세션: 재연결해도 브로커가 구독(PC 명령)과 미확인 QoS 1 메시지를 유지
+MQTT_CLEAN_SESSION = False
+MQTT_MAX_INFLIGHT = 20          # PUBACK을 기다리는 동시 전송 메시지 수 상한
+
+# 카운트 / 캘리브레이션 이미지 메시지 형식
+#   "binary": count_bin, calibration_image_bin 토픽 (wire_format.py)
+#   "json":   count, calibration_image 토픽 (이전 버전 PC 호환)
+MQTT_WIRE_FORMAT = "binary"
+CALIBRATION_IMAGE_INTERVAL = 3.0  # 캘리브레이션 모드에서 감지 결과 이미지 전송 간격 (초)
+
+# 카운트 전송 정책: 개수/박스가 바뀔 때만 전체 메시지, 그 외에는 하트비트만
+MQTT_COUNT_HEARTBEAT_INTERVAL = 15.0  # 변경이 없을 때 하트비트 간격 (초)
+MQTT_BOX_TOLERANCE = 8                # 이 픽셀 이하로 움직인 박스는 변경으로 보지 않음
+
 # ============================================
 # 카메라 설정
 # ============================================
 CAMERA_RESOLUTION = (1920, 1080)  # 해상도 (너비, 높이)
 CAMERA_FRAMERATE = 30
-CAPTURE_INTERVAL = 1.0  # 초 단위 - 1초마다 촬영
+CAPTURE_INTERVAL = 1.0  # 초 단위 - 1초마다 촬영 (ADAPTIVE_CAPTURE_ENABLED = False일 때)
+
+# 캡처 모드
+#   "video": 비디오 설정으로 연속 스트리밍, 별도 캡처 스레드가 최신 캡처 요청 보관
+#            (배열 변환은 메인 루프가 프레임을 가져갈 때만 → 버려지는 프레임은 복사하지 않음)
+#   "still": 기존 방식 (스틸 설정, 매 루프마다 capture_array() 블로킹 호출)
+CAMERA_CAPTURE_MODE = "video"
+CAMERA_BUFFER_SIZE = 3  # 카메라 버퍼 수 - 1 / 캡처 FPS 통계에 쓰는 최근 프레임 수
+
+# 프레임 소스: "picamera2" (실제 카메라) | "synthetic" (카메라 없는 PC에서 테스트용 가상 프레임)
+CAMERA_SOURCE = "picamera2"
+
+# 저해상도 보조 스트림 (lores)
+# 활성화 시 감지는 lores 그레이스케일(YUV420의 Y 평면)에서 수행하고
+# 바운딩 박스/면적은 메인 스트림 좌표로 환산 (MIN_AREA/MAX_AREA는 계속 메인 해상도 기준)
+# 메인 해상도 프레임은 MJPEG 시청자 / 스냅샷 / 캘리브레이션 이미지가 필요할 때만 lores와 같은 센서 프레임에서 가져옴
+CAMERA_LORES_ENABLED = False
+CAMERA_LORES_RESOLUTION = (480, 270)  # 메인의 1/4 (픽셀 수 1/16)
 
 # ============================================
 # 객체 감지 파라미터 (캘리브레이션 필요)
@@ -38,11 +71,74 @@ MAX_AREA = 90000    # 이것보다 크면 여러 개 겹친 것으로 간주
 MIN_ASPECT_RATIO = 0.5  # 너비/높이
 MAX_ASPECT_RATIO = 2.0
 
+# 관심 영역 (ROI) - 스테인레스 팬 영역만 감지 (메인 스트림 좌표, calibration_tool로 지정)
+#   None                      : 전체 프레임
+#   (x, y, w, h)              : 사각형
+#   [(x1, y1), (x2, y2), ...] : 다각형 (꼭짓점 3개 이상, 바깥 영역은 마스킹)
+DETECTION_ROI = None
+
+# 감지 백엔드
+#   "contours"  : findContours + 윤곽선별 Python 루프 필터링 (기존 방식)
+#   "components": connectedComponentsWithStats 1회 호출 + NumPy 마스크 필터링 (결과는 구조화 배열)
+#                 라벨링 비용이 프레임 크기에 비례해 블롭 수와 무관하게 일정 (1080p 약 6~7ms)
+#                 → 블롭이 적은 평소 프레임은 contours가 더 빠름 (1080p 노이즈 0~2000개: 3~5ms vs 7ms)
+#                   노이즈 블롭이 수천 개 이상 남는 현장(조명/배경 문제)에서만 사용
+DETECTION_BACKEND = "contours"
+
+# ============================================
+# 모션 게이트 (장면 변화가 없으면 감지 생략, 이전 결과 재사용)
+# ============================================
+MOTION_GATE_ENABLED = True
+MOTION_GATE_WIDTH = 96         # 비교용 축소 프레임 너비 (높이는 비율 유지)
+MOTION_PIXEL_DELTA = 25        # 밝기 차이가 이보다 큰 픽셀을 "변화"로 간주
+MOTION_CHANGED_RATIO = 0.002   # 변화 픽셀 비율이 이보다 크면 장면 변화 (누룽지 1개 ≈ 0.7%)
+MOTION_FORCE_EVERY = 10        # 변화가 없어도 N 프레임마다 강제 감지 (안전장치)
+
+# ============================================
+# 적응형 촬영 간격 (capture_rate.py - 장면이 바뀌는 동안은 빠르게, 정지해 있으면 느리게)
+# ============================================
+# 기본은 꺼짐 (CAPTURE_INTERVAL 고정 간격 - Firebase deviceSettings로 지정한 간격이 그대로 적용됨)
+# 켜져 있을 때 CAPTURE_INTERVAL을 지정하면 CAPTURE_INTERVAL_MAX(간격 상한)로 적용
+ADAPTIVE_CAPTURE_ENABLED = False
+CAPTURE_INTERVAL_MIN = 0.25    # 활동 중 촬영 간격 (초) - 모션 / 개수 변화 직후
+CAPTURE_INTERVAL_MAX = 3.0     # 정지 장면 촬영 간격 상한 (초) - 팬 완료 감지 지연의 최대값
+CAPTURE_BACKOFF_FACTOR = 1.5   # 활동이 없을 때 프레임마다 간격에 곱할 배수
+CAPTURE_ACTIVE_HOLD = 4        # 마지막 활동 후 최소 간격을 유지할 프레임 수
+
+# ============================================
+# 파이프라인 (캡처 / 감지 / 전송 단계를 별도 워커 스레드로 분리)
+# ============================================
+# False면 기존처럼 한 스레드에서 순차 실행
+PIPELINE_ENABLED = True
+PIPELINE_QUEUE_SIZE = 2               # 단계 사이 큐 크기 (프레임 단위)
+PIPELINE_DROP_POLICY = "drop_oldest"  # 큐가 가득 찼을 때: "drop_oldest" | "block"
+FIREBASE_EVENT_QUEUE_SIZE = 256       # 팬 완료 이벤트 큐 (유실 방지를 위해 항상 block)
+
 # ============================================
 # 안정화 설정
 # ============================================
 STABILIZATION_WINDOW = 5  # 최근 N개 프레임으로 안정화
 
+# ============================================
+# 팬 완료 판정 (pan_detector.py - Firebase deviceSettings로 변경 가능)
+# ============================================
+PAN_FILL_FRAMES = 3      # 팬이 채워졌다고 판단할 연속 비어 있지 않은 프레임 수
+PAN_EMPTY_FRAMES = 3     # 팬 완료로 판단할 최소 연속 빈 프레임 수 (손 가림 / 글레어 1~2프레임은 무시)
+PAN_EMPTY_SECONDS = 4.0  # 팬 완료로 판단할 빈 구간 최소 시간 (초) - 촬영 간격이 바뀌어도 같은 시간 기준
+PAN_WINDOW = 7           # 팬 갯수 최빈값을 계산할 최근 프레임 수
+PAN_STABLE_FRAMES = 3    # 최빈값으로 인정할 최소 빈도 (이보다 짧게 나온 갯수는 무시, PAN_WINDOW 이하)
+
+# ============================================
+# 객체 추적 (tracker.py - 팬에 놓인 조각 도착 수로 팬 갯수 계산, 겹친 조각 보정)
+# ============================================
+# False면 채워진 동안의 안정된 최대 갯수만 사용
+TRACKING_ENABLED = True
+TRACK_IOU_THRESHOLD = 0.3    # 같은 조각으로 볼 최소 IoU
+TRACK_MAX_DISTANCE = 0.5     # IoU로 못 짝지은 박스의 중심 이동 허용 거리 (박스 대각선 대비)
+TRACK_CONFIRM_FRAMES = 2     # 도착으로 확정할 연속 감지 횟수
+TRACK_MAX_MISSES = 3         # 이보다 오래 가려진 조각은 IoU로만 다시 짝지음 (확정된 조각은 팬 끝까지 유지)
+TRACK_STACK_GROWTH = 1.4     # 추적 중인 박스 면적이 이 배율 이상 커지면 위에 조각이 쌓인 것으로 봄
+
 # ============================================
 # 전력 관리
 # ============================================
@@ -54,6 +150,67 @@ POWER_SAVE_MODE = False     # 전력 절약 모드 (촬영 간격 2배)
 # ============================================
 FIREBASE_DATABASE_URL = "https://zego-87d69-default-rtdb.asia-southeast1.firebasedatabase.app"
 
+# 팬 기록 경로 productionLog/<DEVICE_ID>/ (엣지 디바이스가 여러 대면 장치마다 다르게)
+# 생산량 누적과 같은 PATCH로 팬별 기록을 남겨, 응답을 못 받은 전송을 재시도할 때 중복 누적 방지
+DEVICE_ID = "edge-01"
+
+# 쓰기 지연 큐 (생산량 누적 / 장치 상태를 백그라운드 스레드에서 전송)
+# 미전송 생산량은 생산 저널(JOURNAL_PATH)에 남아 네트워크 단절/재시작에도 유실되지 않음
+FIREBASE_WRITER_ENABLED = True
+FIREBASE_RETRY_BASE = 1.0    # 첫 재시도 대기 (초), 실패할 때마다 2배
+FIREBASE_RETRY_MAX = 60.0    # 최대 재시도 대기 (초)
+FIREBASE_BATCH_WINDOW = 0.2  # 첫 쓰기 후 이 시간 동안 들어온 쓰기를 다중 경로 PATCH 1회로 병합 (초)
+
+# keep-alive 연결 풀 크기 (Firebase 단계 + 쓰기 큐가 동시에 요청할 수 있도록 2 이상)
+FIREBASE_POOL_SIZE = 2
+
+# 스트리밍 리스너 (deviceCommands / activeProduction / deviceSettings 변경을 즉시 수신)
+# 스트림이 끊긴 동안에는 기존 REST 폴링으로 자동 전환
+FIREBASE_STREAMING_ENABLED = True
+
+# ============================================
+# 로컬 생산 저널 (오프라인 대비, SQLite WAL)
+# ============================================
+# 팬 완료를 먼저 로컬에 기록하고 Firebase / MQTT 전달 여부를 따로 관리
+JOURNAL_PATH = "/home/pi/nurungji_journal.db"
+JOURNAL_MAX_BYTES = 20 * 1024 * 1024  # 디스크 예산 (20MB ≈ 수십만 팬)
+JOURNAL_RETENTION_DAYS = 30           # 전달 완료 기록 보관 기간 (일)
+
+# ============================================
+# MJPEG 스트리밍 서버
+# ============================================
+MJPEG_MAX_CLIENTS = 16        # 동시 /stream 시청자 수 상한 (초과 시 503)
+MJPEG_CLIENT_QUEUE_SIZE = 2   # 시청자별 전송 대기 프레임 수 (느린 시청자는 오래된 프레임부터 버림)
+MJPEG_SNAPSHOT_MAX_AGE = 2.0  # /snapshot: 최신 원본이 이보다 오래됐으면 새 프레임 요청 (초)
+MJPEG_SNAPSHOT_WAIT = 3.0     # /snapshot: 새 프레임 대기 최대 시간 (초, 초과 시 있는 프레임 사용)
+MJPEG_SNAPSHOT_HOLD = 10.0    # 스냅샷 요청 후 메인 프레임을 계속 받을 시간 (초, 주기적 스냅샷 폴링용)
+
+# ============================================
+# 실행 방식
+# ============================================
+# "threads": 단계별 워커 스레드 (PIPELINE_ENABLED) + paho / HTTP 서버 스레드
+# "asyncio": 이벤트 루프 1개 (캡처/감지는 전용 스레드, 네트워크/주기 작업은 코루틴) - async_runtime.py
+EDGE_RUNTIME = "threads"
+ASYNC_IO_WORKERS = 4          # asyncio 방식에서 블로킹 Firebase / 저널 호출을 실행할 스레드 수
+
+# ============================================
+# 주기 작업 스케줄러 (scheduler.py)
+# ============================================
+SCHEDULER_WORKERS = 2              # 주기 작업 워커 스레드 수 (캡처/감지와 별도)
+SCHEDULER_JITTER = 0.1             # 예정 시각에 더할 무작위 지연 (간격 대비 비율)
+COMMAND_POLL_INTERVAL = 3          # Firebase deviceCommands 폴링 (스트림 연결 중에는 생략)
+ACTIVE_PRODUCT_POLL_INTERVAL = 30  # Firebase activeProduction 조회 (스트림 연결 중에는 생략)
+STATUS_PUSH_INTERVAL = 30          # Firebase 장치 상태 업데이트
+SETTINGS_REFRESH_INTERVAL = 300    # Firebase deviceSettings 조회 (스트림 연결 중에는 생략)
+MQTT_STATUS_INTERVAL = 60          # MQTT 상태 전송 (이전: 60프레임마다)
+MQTT_REPLAY_INTERVAL = 5           # 저널의 MQTT 미전달 팬 재전송 (팬 완료 / MQTT 재연결 시에는 바로 실행)
+STATS_PRINT_INTERVAL = 10          # 통계 출력 (이전: 10프레임마다)
+
+# ============================================
+# 런타임 지표 (MJPEG 서버의 /metrics, /healthz)
+# ============================================
+HEALTH_FRAME_TIMEOUT = 10.0   # 마지막 캡처 후 이 시간(초)이 지나면 /healthz 503 (촬영 간격의 3배가 더 길면 그 값)
+
 # ============================================
 # 디버그 설정
 # ============================================
@@ -1,22 +1,58 @@
 """
-Firebase REST API 클라이언트 (urllib 내장 라이브러리 사용)
+Firebase REST API 클라이언트 (내장 라이브러리만 사용)
 라즈베리 파이에서 추가 설치 없이 Firebase Realtime Database에 접근
+
+모든 요청은 keep-alive 연결 풀(http_pool)을 공유하므로
+폴링/상태 업데이트마다 TCP/TLS 핸드셰이크를 반복하지 않음
+
+쓰기는 {"경로/키": 값} 형태의 다중 경로 업데이트로 만들어
+루트 PATCH 1회로 묶어서 보낼 수 있음 (production_update / status_update / patch_multi)
 """
 
-import urllib.request
-import urllib.error
+import http.client
+import threading
+import time
+import urllib.parse
 import json
-from config import FIREBASE_DATABASE_URL, DEBUG_MODE
+from config import FIREBASE_DATABASE_URL, FIREBASE_POOL_SIZE, DEVICE_ID, DEBUG_MODE
+from http_pool import HTTPConnectionPool
+
+# 요청 타임아웃 (초)
+HTTP_TIMEOUT = 5
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# 다중 경로 PATCH 통계
+_update_stats = {"requests": 0, "failed": 0, "paths": 0, "bytes": 0}
+_update_stats_lock = threading.Lock()
+
+# 마지막으로 실행한 명령 (processed 플래그 반영 전 재수신 시 중복 실행 방지)
+_last_command_key = None
+
+
+def _get_pool():
+    """공유 연결 풀 (FIREBASE_DATABASE_URL이 바뀌면 새로 생성)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.base_url != FIREBASE_DATABASE_URL:
+            if _pool is not None:
+                _pool.close()
+            _pool = HTTPConnectionPool(FIREBASE_DATABASE_URL, FIREBASE_POOL_SIZE, HTTP_TIMEOUT)
+        return _pool
+
+
+def _firebase_path(path):
+    """REST 경로 생성 (한글 제품명 등 비ASCII 경로는 퍼센트 인코딩)"""
+    return f"/{urllib.parse.quote(path, safe='/')}.json"
 
 
 def _firebase_get(path):
     """Firebase에서 데이터 읽기"""
-    url = f"{FIREBASE_DATABASE_URL}/{path}.json"
     try:
-        with urllib.request.urlopen(url, timeout=5) as response:
-            data = json.loads(response.read().decode())
-            return data
-    except urllib.error.URLError as e:
+        data = _get_pool().request("GET", _firebase_path(path))
+        return json.loads(data.decode())
+    except (OSError, http.client.HTTPException) as e:
         if DEBUG_MODE:
             print(f"[Firebase] GET 오류 ({path}): {e}")
         return None
@@ -26,20 +62,34 @@ def _firebase_get(path):
         return None
 
 
+def _firebase_get_checked(path):
+    """
+    Firebase에서 데이터 읽기 (없는 값과 요청 실패를 구분)
+
+    Returns:
+        tuple: (성공 여부, 값 - 없으면 None)
+    """
+    try:
+        data = _get_pool().request("GET", _firebase_path(path))
+        return True, json.loads(data.decode())
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        if DEBUG_MODE:
+            print(f"[Firebase] GET 오류 ({path}): {e}")
+        return False, None
+
+
 def _firebase_patch(path, data):
     """Firebase에 데이터 부분 업데이트 (PATCH)"""
-    url = f"{FIREBASE_DATABASE_URL}/{path}.json"
     payload = json.dumps(data).encode('utf-8')
-    req = urllib.request.Request(
-        url,
-        data=payload,
-        method='PATCH',
-        headers={'Content-Type': 'application/json'}
-    )
     try:
-        with urllib.request.urlopen(req, timeout=5) as response:
-            return json.loads(response.read().decode())
-    except urllib.error.URLError as e:
+        response = _get_pool().request(
+            "PATCH",
+            _firebase_path(path),
+            body=payload,
+            headers={'Content-Type': 'application/json'}
+        )
+        return json.loads(response.decode())
+    except (OSError, http.client.HTTPException) as e:
         if DEBUG_MODE:
             print(f"[Firebase] PATCH 오류 ({path}): {e}")
         return None
@@ -49,6 +99,16 @@ def _firebase_patch(path, data):
         return None
 
 
+def get_http_stats():
+    """
+    Firebase HTTP 연결 풀 통계
+
+    Returns:
+        dict: 요청/오류 수, 새 연결/재사용 횟수, 지연 시간 히스토그램
+    """
+    return _get_pool().get_stats()
+
+
 def get_active_product():
     """
     Firebase에서 현재 생산 중인 제품명 조회
@@ -62,73 +122,233 @@ def get_active_product():
     return None
 
 
-def increment_production(product_name, count):
+def _is_increment(value):
+    return isinstance(value, dict) and isinstance(value.get(".sv"), dict) \
+        and "increment" in value[".sv"]
+
+
+def flatten_update(path, data):
     """
-    Firebase products/{product_name}/todayProduction 에 count 누적
+    노드 부분 업데이트를 루트 기준 다중 경로 업데이트로 변환
 
     Args:
-        product_name (str): 제품명 (Firebase key)
-        count (int): 추가할 수량
+        path (str): 노드 경로 (예: "edgeDevice")
+        data (dict): 자식 키 → 값
 
     Returns:
-        bool: 성공 여부
+        dict: {"edgeDevice/status": "running", ...}
     """
-    if not product_name or count <= 0:
-        return False
+    prefix = path.strip("/")
+    return {f"{prefix}/{key}" if prefix else key: value for key, value in data.items()}
 
-    # 현재값 읽기
-    current = _firebase_get(f"products/{product_name}/todayProduction")
-    current_val = int(current) if isinstance(current, (int, float)) else 0
-    new_val = current_val + count
 
-    result = _firebase_patch(
-        f"products/{product_name}",
-        {"todayProduction": new_val, "updatedAt": _now_ms()}
-    )
+def merge_updates(target, updates):
+    """
+    다중 경로 업데이트 병합 (같은 경로는 나중 값 우선, 서버 측 increment는 합산)
 
-    if result is not None:
-        if DEBUG_MODE:
-            print(f"[Firebase] {product_name} 금일생산 {current_val} → {new_val} (+{count})")
+    Args:
+        target (dict): 병합 대상 (직접 수정됨)
+        updates (dict): 추가할 다중 경로 업데이트
+
+    Returns:
+        dict: target
+    """
+    for key, value in updates.items():
+        current = target.get(key)
+        if _is_increment(current) and _is_increment(value):
+            total = current[".sv"]["increment"] + value[".sv"]["increment"]
+            target[key] = {".sv": {"increment": total}}
+        else:
+            target[key] = value
+    return target
+
+
+def patch_multi(updates):
+    """
+    다중 경로 업데이트를 루트 PATCH 1회로 전송 (모든 경로가 함께 적용되거나 함께 실패)
+
+    Args:
+        updates (dict): {"경로/키": 값}
+
+    Returns:
+        bool: 성공 여부
+    """
+    if not updates:
         return True
-    return False
+
+    size = len(json.dumps(updates).encode('utf-8'))
+    ok = _firebase_patch("", updates) is not None
+    with _update_stats_lock:
+        _update_stats["requests"] += 1
+        _update_stats["paths"] += len(updates)
+        _update_stats["bytes"] += size
+        if not ok:
+            _update_stats["failed"] += 1
+    return ok
 
 
-def push_device_status(count, cpu_temp, frames_total):
+def get_update_stats():
     """
-    Firebase edgeDevice/ 에 장치 상태 업데이트 (30초마다 호출)
+    다중 경로 PATCH 통계
+
+    Returns:
+        dict: 요청 수, 실패 수, 누적 경로 수, 누적 전송 바이트
+    """
+    with _update_stats_lock:
+        return dict(_update_stats)
+
+
+def production_update(product_name, count):
+    """
+    products/{product_name}/todayProduction 누적 업데이트 (서버 측 원자적 증가)
+
+    서버 측 증가(ServerValue.increment)이므로 웹앱이나 다른 엣지 디바이스가
+    동시에 누적해도 값이 유실되지 않고, updatedAt은 서버 시각으로 기록됨.
+
+    Returns:
+        dict: 다중 경로 업데이트
+    """
+    return flatten_update(f"products/{product_name}", {
+        "todayProduction": {".sv": {"increment": int(count)}},
+        "updatedAt": {".sv": "timestamp"}
+    })
+
+
+def production_day(ts_ms=None):
+    """생산일 "YYYY-MM-DD" (장치 로컬 시간 자정 기준, ts_ms가 None이면 오늘)"""
+    ts = time.time() if ts_ms is None else ts_ms / 1000
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+def production_history_update(product_name, day, count):
+    """
+    products/{product_name}/productionHistory/{day} 누적 업데이트 (서버 측 원자적 증가)
+
+    전날 완료한 팬이 자정(웹앱의 금일생산 초기화) 뒤에 전달될 때 todayProduction 대신 사용
+
+    Returns:
+        dict: 다중 경로 업데이트
+    """
+    return flatten_update(f"products/{product_name}/productionHistory", {
+        day: {".sv": {"increment": int(count)}}
+    })
+
+
+def production_log_key(row):
+    """저널 행의 팬 기록 키 ("<완료 시각 ms>_<저널 id>" - 저널을 새로 만들어 id가 겹쳐도 구분)"""
+    return f"{row['ts']}_{row['id']}"
+
+
+def production_log_update(rows, device_id=None):
+    """
+    productionLog/{device_id}/{키} 팬별 기록 (생산량 누적과 같은 PATCH에 넣으면 함께 적용됨)
+
+    Args:
+        rows (list[dict]): 저널 행 {"id", "ts", "product", "count"}
+        device_id (str): 장치 id (None이면 config.DEVICE_ID)
+
+    Returns:
+        dict: 다중 경로 업데이트
+    """
+    prefix = f"productionLog/{device_id or DEVICE_ID}"
+    return {
+        f"{prefix}/{production_log_key(row)}": {
+            "product": row["product"], "count": row["count"], "ts": row["ts"]
+        }
+        for row in rows
+    }
+
+
+def production_logged(row, device_id=None):
+    """
+    저널 행이 이미 Firebase에 반영되었는지 (팬 기록이 있으면 같은 PATCH의 누적도 적용된 것)
+
+    Returns:
+        bool | None: 반영 여부 (요청 실패 시 None)
+    """
+    ok, data = _firebase_get_checked(
+        f"productionLog/{device_id or DEVICE_ID}/{production_log_key(row)}"
+    )
+    if not ok:
+        return None
+    return data is not None
+
+
+def status_update(count, cpu_temp, frames_total, capture_interval=None):
+    """
+    edgeDevice/ 장치 상태 업데이트 (lastSeen은 서버 시각)
 
     Args:
         count (int): 현재 감지 중인 갯수
         cpu_temp (float | None): CPU 온도 (°C)
         frames_total (int): 누적 처리 프레임 수
+        capture_interval (float | None): 현재 촬영 간격 (초)
+
+    Returns:
+        dict: 다중 경로 업데이트
     """
     data = {
         "status": "running",
-        "lastSeen": _now_ms(),
+        "lastSeen": {".sv": "timestamp"},
         "currentCount": count,
         "framesTotal": frames_total,
     }
     if cpu_temp is not None:
         data["cpuTemp"] = cpu_temp
+    if capture_interval is not None:
+        data["captureInterval"] = round(capture_interval, 3)
+    return flatten_update("edgeDevice", data)
+
+
+def increment_production(product_name, count):
+    """
+    Firebase products/{product_name}/todayProduction 에 count 누적 (요청 1회)
+
+    Args:
+        product_name (str): 제품명 (Firebase key)
+        count (int): 추가할 수량
+
+    Returns:
+        bool: 성공 여부
+    """
+    if not product_name or count <= 0:
+        return False
+
+    if patch_multi(production_update(product_name, count)):
+        if DEBUG_MODE:
+            print(f"[Firebase] {product_name} 금일생산 +{count}")
+        return True
+    return False
 
-    result = _firebase_patch("edgeDevice", data)
+
+def push_device_status(count, cpu_temp, frames_total, capture_interval=None):
+    """
+    Firebase edgeDevice/ 에 장치 상태 업데이트 (30초마다 호출)
+
+    Args:
+        count (int): 현재 감지 중인 갯수
+        cpu_temp (float | None): CPU 온도 (°C)
+        frames_total (int): 누적 처리 프레임 수
+        capture_interval (float | None): 현재 촬영 간격 (초)
+    """
+    ok = patch_multi(status_update(count, cpu_temp, frames_total, capture_interval))
     if DEBUG_MODE:
-        if result is not None:
+        if ok:
             print(f"[Firebase] 장치 상태 업데이트: count={count}, temp={cpu_temp}")
         else:
             print("[Firebase] 장치 상태 업데이트 실패")
-    return result is not None
+    return ok
 
 
 def set_device_stopped():
     """Firebase edgeDevice/ 상태를 stopped로 업데이트"""
-    result = _firebase_patch("edgeDevice", {
+    ok = patch_multi(flatten_update("edgeDevice", {
         "status": "stopped",
-        "lastSeen": _now_ms()
-    })
+        "lastSeen": {".sv": "timestamp"}
+    }))
     if DEBUG_MODE:
         print("[Firebase] 장치 상태: stopped")
-    return result is not None
+    return ok
 
 
 def get_device_settings():
@@ -146,7 +366,7 @@ def get_device_settings():
     return None
 
 
-def poll_command(callback):
+def poll_command(callback, queue_update=None):
     """
     Firebase deviceCommands 노드에서 미처리 명령을 폴링하여 실행.
     메인 루프에서 주기적으로 호출하면 됨 (실시간 리스너 대신 REST 폴링).
@@ -160,11 +380,30 @@ def poll_command(callback):
 
     Args:
         callback (callable): callback(action: str) 형태로 호출됨
+        queue_update (callable): processed 플래그 전송 방식 (handle_command 참고)
+
+    Returns:
+        bool: 처리된 명령이 있으면 True
+    """
+    return handle_command(_firebase_get("deviceCommands"), callback, queue_update)
+
+
+def handle_command(data, callback, queue_update=None):
+    """
+    deviceCommands 노드 값에 미처리 명령이 있으면 processed 표시 후 실행
+    (poll_command와 스트리밍 리스너가 공유)
+
+    Args:
+        data (dict | None): deviceCommands 노드 값
+        callback (callable): callback(action: str) 형태로 호출됨
+        queue_update (callable): queue_update(updates) - processed 플래그를 다른 쓰기와
+            묶어서 보낼 때 사용 (None이면 즉시 PATCH)
 
     Returns:
         bool: 처리된 명령이 있으면 True
     """
-    data = _firebase_get("deviceCommands")
+    global _last_command_key
+
     if not isinstance(data, dict):
         return False
 
@@ -176,8 +415,18 @@ def poll_command(callback):
     if not action:
         return False
 
-    # 즉시 processed 플래그 설정 (중복 실행 방지)
-    _firebase_patch("deviceCommands", {"processed": True})
+    # processed 플래그가 반영되기 전에 같은 명령을 다시 받으면 무시
+    command_key = (action, data.get("timestamp"))
+    if command_key == _last_command_key:
+        return False
+    _last_command_key = command_key
+
+    # processed 플래그 설정 (중복 실행 방지)
+    processed = flatten_update("deviceCommands", {"processed": True})
+    if queue_update is not None:
+        queue_update(processed)
+    else:
+        patch_multi(processed)
 
     try:
         callback(action)
@@ -193,5 +442,52 @@ def poll_command(callback):
 
 def _now_ms():
     """현재 Unix 타임스탬프 (밀리초)"""
-    import time
     return int(time.time() * 1000)
+
+
+# 테스트 코드: 로컬 Firebase 대체 서버에서 동시 누적 정확성 확인
+if __name__ == "__main__":
+    import threading
+    import time
+    from firebase_local_server import LocalFirebaseServer
+
+    WRITERS = 8          # 동시 기록자 수 (웹앱, 엣지 디바이스 여러 대 흉내)
+    PER_WRITER = 50      # 기록자당 누적 횟수
+    expected = WRITERS * PER_WRITER * 3
+
+    def legacy_increment(product_name, count):
+        """기존 방식: GET 후 PATCH (read-modify-write)"""
+        current = _firebase_get(f"products/{product_name}/todayProduction")
+        current_val = int(current) if isinstance(current, (int, float)) else 0
+        return _firebase_patch(
+            f"products/{product_name}",
+            {"todayProduction": current_val + count, "updatedAt": _now_ms()}
+        ) is not None
+
+    def run(increment_fn, product_name):
+        def worker():
+            for _ in range(PER_WRITER):
+                increment_fn(product_name, 3)
+
+        threads = [threading.Thread(target=worker) for _ in range(WRITERS)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+    print("Firebase 동시 누적 테스트 시작...")
+    server = LocalFirebaseServer(port=0, latency=0.002).start()
+    FIREBASE_DATABASE_URL = server.url
+    DEBUG_MODE = False
+
+    for label, fn, product in (("GET+PATCH (기존)", legacy_increment, "legacy"),
+                               ("서버 측 increment", increment_production, "누룽지")):
+        elapsed = run(fn, product)
+        actual = server.database.get(f"products/{product}/todayProduction")
+        print(f"{label}: 기대 {expected}, 실제 {actual}, "
+              f"유실 {expected - actual}, {elapsed:.2f}초")
+
+    print(f"서버 요청 통계: {server.get_stats()}")
+    server.stop()
@@ -0,0 +1,334 @@
+"""
+누룽지 생산량 카운팅 시스템 - Firebase Realtime Database 로컬 대체 서버 (개발/테스트용)
+실제 Firebase 없이 firebase_client의 REST 호출(GET / PUT / PATCH)을 받아 메모리에 저장
+서버 값 {".sv": {"increment": n}}, {".sv": "timestamp"} 지원 (잠금 안에서 원자적으로 처리)
+Accept: text/event-stream GET 요청은 스트리밍(put / patch / keep-alive 이벤트)으로 응답
+
+사용법:
+  python firebase_local_server.py [--port 9000] [--fail-rate 0.3] [--lost-reply-rate 0.1] [--latency 0.05]
+  → config.FIREBASE_DATABASE_URL 을 "http://127.0.0.1:9000" 으로 바꿔서 실행
+
+옵션:
+  --fail-rate       : 요청을 처리하지 않고 503을 반환할 확률 (네트워크 장애 흉내)
+  --lost-reply-rate : 쓰기를 적용한 뒤 응답 없이 연결을 끊을 확률 (응답 유실 흉내)
+  --latency         : 요청마다 추가 지연 (초)
+"""
+
+import argparse
+import json
+import queue
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+DEFAULT_PORT = 9000
+
+
+class LocalDatabase:
+    """JSON 트리 (thread-safe)"""
+
+    def __init__(self, initial=None):
+        self._root = initial if isinstance(initial, dict) else {}
+        self._lock = threading.Lock()
+        self._subscribers = []  # [(경로 parts, queue.Queue)] 스트리밍 구독자
+
+    @staticmethod
+    def _split(path):
+        return [part for part in path.strip("/").split("/") if part]
+
+    def _lookup(self, parts):
+        node = self._root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _assign(self, parts, value):
+        if not parts:
+            self._root = value if isinstance(value, dict) else {}
+            return
+        node = self._root
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = {}
+                node[part] = child
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+    def _resolve(self, parts, value):
+        """서버 값(.sv) 치환 - 잠금을 잡은 상태에서 호출"""
+        if not isinstance(value, dict):
+            return value
+        if ".sv" in value:
+            server_value = value[".sv"]
+            if server_value == "timestamp":
+                return int(time.time() * 1000)
+            if isinstance(server_value, dict) and "increment" in server_value:
+                current = self._lookup(parts)
+                if not isinstance(current, (int, float)) or isinstance(current, bool):
+                    current = 0
+                return current + server_value["increment"]
+            raise ValueError(f"지원하지 않는 서버 값: {server_value}")
+        return {k: self._resolve(parts + self._split(k), v) for k, v in value.items()}
+
+    def _notify(self, event, parts, data):
+        """쓰기 위치와 겹치는 구독자에게 이벤트 전달 - 잠금을 잡은 상태에서 호출"""
+        for sub_parts, events in self._subscribers:
+            if parts[:len(sub_parts)] == sub_parts:
+                relative = "/" + "/".join(parts[len(sub_parts):])
+                events.put((event, relative, json.loads(json.dumps(data))))
+            elif sub_parts[:len(parts)] == parts:
+                value = json.loads(json.dumps(self._lookup(sub_parts)))
+                events.put(("put", "/", value))
+
+    def subscribe(self, path):
+        """
+        스트리밍 구독 등록 (현재 값이 첫 이벤트로 들어 있는 큐 반환)
+        """
+        parts = self._split(path)
+        events = queue.Queue()
+        with self._lock:
+            events.put(("put", "/", json.loads(json.dumps(self._lookup(parts)))))
+            self._subscribers.append((parts, events))
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s[1] is not events]
+
+    def close_streams(self):
+        """모든 스트리밍 연결 종료 (클라이언트 재연결 테스트용)"""
+        with self._lock:
+            for _, events in self._subscribers:
+                events.put(None)
+
+    def get(self, path):
+        with self._lock:
+            return json.loads(json.dumps(self._lookup(self._split(path))))
+
+    def put(self, path, value):
+        parts = self._split(path)
+        with self._lock:
+            value = self._resolve(parts, value)
+            self._assign(parts, value)
+            self._notify("put", parts, value)
+            return value
+
+    def patch(self, path, data):
+        """자식 키 단위 병합 ("a/b" 형태의 다중 경로 키 지원)"""
+        if not isinstance(data, dict):
+            raise ValueError("PATCH 데이터는 객체여야 합니다")
+        base = self._split(path)
+        with self._lock:
+            result = {}
+            for key, value in data.items():
+                parts = base + self._split(key)
+                result[key] = self._resolve(parts, value)
+                self._assign(parts, result[key])
+            self._notify("patch", base, result)
+            return result
+
+
+class FirebaseRequestHandler(BaseHTTPRequestHandler):
+    """/<경로>.json REST 요청 처리"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive (Firebase와 동일하게 연결 유지)
+    disable_nagle_algorithm = True  # 헤더/본문 분할 전송 시 지연 ACK로 40ms 멈추는 현상 방지
+    database = None
+    fail_rate = 0.0
+    lost_reply_rate = 0.0
+    latency = 0.0
+    stream_keepalive = 30.0
+    stats = None
+
+    def _path(self):
+        path = unquote(urlsplit(self.path).path)
+        if not path.endswith(".json"):
+            return None
+        return path[:-len(".json")]
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b"null"
+        return json.loads(raw.decode("utf-8"))
+
+    def _stream(self, path):
+        """text/event-stream 응답 (연결이 끊기거나 서버가 종료할 때까지)"""
+        events = self.database.subscribe(path)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        try:
+            while True:
+                try:
+                    item = events.get(timeout=self.stream_keepalive)
+                except queue.Empty:
+                    self.wfile.write(b"event: keep-alive\ndata: null\n\n")
+                    continue
+                if item is None:
+                    break
+                event, relative, data = item
+                payload = json.dumps({"path": relative, "data": data})
+                self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+        except OSError:
+            pass  # 클라이언트 연결 종료
+        finally:
+            self.database.unsubscribe(events)
+
+    def _handle(self, method):
+        path = self._path()
+        if path is None:
+            self._send_json(404, {"error": "path must end with .json"})
+            return
+
+        if method == "GET" and "text/event-stream" in self.headers.get("Accept", ""):
+            with self.stats["lock"]:
+                self.stats["STREAM"] = self.stats.get("STREAM", 0) + 1
+            self._stream(path)
+            return
+
+        # 요청 본문은 장애 흉내 여부와 무관하게 먼저 읽음 (연결 재사용 대비)
+        try:
+            body = self._read_body() if method in ("PUT", "PATCH") else None
+        except ValueError as e:
+            self._send_json(400, {"error": f"invalid JSON: {e}"})
+            return
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        with self.stats["lock"]:
+            self.stats[method] = self.stats.get(method, 0) + 1
+            if random.random() < self.fail_rate:
+                self.stats["failed"] += 1
+                failed = True
+            else:
+                failed = False
+        if failed:
+            self._send_json(503, {"error": "simulated outage"})
+            return
+
+        try:
+            if method == "GET":
+                result = self.database.get(path)
+            elif method == "PUT":
+                result = self.database.put(path, body)
+            else:
+                result = self.database.patch(path, body)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if method != "GET" and random.random() < self.lost_reply_rate:
+            with self.stats["lock"]:
+                self.stats["lost_replies"] += 1
+            self.close_connection = True  # 적용은 됐지만 클라이언트는 응답을 못 받음
+            return
+        self._send_json(200, result)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def log_message(self, format, *args):
+        pass  # 요청마다 로그 출력하지 않음
+
+
+class LocalFirebaseServer:
+    """
+    로컬 Firebase 대체 서버 (데몬 스레드)
+
+    테스트 코드에서:
+        server = LocalFirebaseServer(port=0).start()
+        firebase_client.FIREBASE_DATABASE_URL = server.url
+    """
+
+    def __init__(self, port=DEFAULT_PORT, fail_rate=0.0, latency=0.0, initial=None,
+                 lost_reply_rate=0.0):
+        self.database = LocalDatabase(initial)
+        self.stats = {"lock": threading.Lock(), "failed": 0, "lost_replies": 0}
+
+        handler = type("Handler", (FirebaseRequestHandler,), {
+            "database": self.database,
+            "fail_rate": fail_rate,
+            "lost_reply_rate": lost_reply_rate,
+            "latency": latency,
+            "stats": self.stats,
+        })
+        self.handler = handler
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_fail_rate(self, fail_rate):
+        """장애 확률 변경 (0이면 정상, 1이면 완전 단절)"""
+        self.handler.fail_rate = fail_rate
+
+    def set_lost_reply_rate(self, lost_reply_rate):
+        """쓰기 적용 후 응답 유실 확률 변경"""
+        self.handler.lost_reply_rate = lost_reply_rate
+
+    def get_stats(self):
+        with self.stats["lock"]:
+            return {k: v for k, v in self.stats.items() if k != "lock"}
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True, name="firebase-local"
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.database.close_streams()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Firebase Realtime Database 로컬 대체 서버")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--lost-reply-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = LocalFirebaseServer(args.port, args.fail_rate, args.latency,
+                                 lost_reply_rate=args.lost_reply_rate).start()
+    print(f"로컬 Firebase 서버 실행 중: {server.url} (장애 확률 {args.fail_rate})")
+    print("종료하려면 Ctrl+C를 누르세요.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        print("\n서버 종료")
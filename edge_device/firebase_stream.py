@@ -0,0 +1,277 @@
+"""
+누룽지 생산량 카운팅 시스템 - Firebase 스트리밍 리스너 (REST Server-Sent Events)
+노드 1개를 text/event-stream으로 구독하여 메모리 미러를 유지하고 변경 시 콜백 호출
+
+  - 폴링 대신 유휴 연결 1개로 변경 사항을 즉시 수신
+  - 연결이 끊기면 지수 백오프로 재연결 (재연결 시 서버가 전체 값을 다시 보내 미러 재동기화)
+  - 서버 keep-alive가 STREAM_READ_TIMEOUT 동안 없으면 끊긴 연결로 보고 재연결
+
+이벤트 형식 (Firebase REST 스트리밍):
+  event: put    data: {"path": "/", "data": {...}}     → path 위치의 값을 교체
+  event: patch  data: {"path": "/", "data": {...}}     → path 아래 자식 키 병합
+  event: keep-alive / cancel / auth_revoked
+"""
+
+import http.client
+import json
+import socket
+import threading
+import time
+import urllib.parse
+
+from config import FIREBASE_DATABASE_URL, DEBUG_MODE
+
+# 읽기 타임아웃 (초) - Firebase는 약 30초마다 keep-alive 이벤트 전송
+STREAM_READ_TIMEOUT = 75
+# 재연결 대기 (초)
+STREAM_RETRY_BASE = 1.0
+STREAM_RETRY_MAX = 60.0
+
+
+def _split(path):
+    return [part for part in path.strip("/").split("/") if part]
+
+
+def apply_event(root, event, path, data):
+    """
+    스트리밍 이벤트를 미러 트리에 적용
+
+    Args:
+        root: 현재 미러 값
+        event (str): "put" | "patch"
+        path (str): 이벤트 경로 (구독 노드 기준)
+        data: 이벤트 데이터
+
+    Returns:
+        적용 후 미러 값
+    """
+    parts = _split(path)
+    if event == "patch":
+        for key, value in (data or {}).items():
+            root = apply_event(root, "put", "/".join(parts + _split(key)), value)
+        return root
+
+    if not parts:
+        return data
+
+    if not isinstance(root, dict):
+        root = {}
+    node = root
+    for part in parts[:-1]:
+        child = node.get(part)
+        if not isinstance(child, dict):
+            child = {}
+            node[part] = child
+        node = child
+    if data is None:
+        node.pop(parts[-1], None)
+    else:
+        node[parts[-1]] = data
+    return root or None
+
+
+class FirebaseStream:
+    """
+    Firebase 노드 스트리밍 구독 (백그라운드 스레드)
+    """
+
+    def __init__(self, path, on_change, base_url=None):
+        """
+        Args:
+            path (str): 구독할 노드 경로 (예: "deviceCommands")
+            on_change (callable): on_change(value) - 노드 값이 바뀔 때마다 전체 값으로 호출
+            base_url (str): 데이터베이스 URL (None이면 config)
+        """
+        self.path = path
+        self.on_change = on_change
+        self.base_url = base_url or FIREBASE_DATABASE_URL
+
+        self._value = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._connected = threading.Event()
+        self._conn = None
+        self._thread = None
+
+        # 통계
+        self.events = 0
+        self.connects = 0
+        self.last_event_at = None
+
+    def start(self):
+        """구독 스레드 시작"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name=f"stream-{self.path}"
+        )
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """구독 종료 (대기 중인 읽기를 끊기 위해 연결을 닫음)"""
+        self._stop_event.set()
+        conn = self._conn
+        if conn is not None and conn.sock is not None:
+            try:
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def is_connected(self):
+        """스트림 연결 및 초기 값 수신 완료 여부"""
+        return self._connected.is_set()
+
+    def wait_connected(self, timeout=None):
+        return self._connected.wait(timeout)
+
+    def get(self):
+        """미러 값 (마지막으로 수신한 노드 전체 값)"""
+        with self._lock:
+            return self._value
+
+    def get_stats(self):
+        return {
+            "path": self.path,
+            "connected": self.is_connected(),
+            "events": self.events,
+            "connects": self.connects,
+            "last_event_at": self.last_event_at
+        }
+
+    # ------------------------------------------------------------------
+
+    def _open(self, url):
+        """스트리밍 요청 → 응답 (307 리다이렉트 1회 허용)"""
+        for _ in range(2):
+            parts = urllib.parse.urlsplit(url)
+            conn_class = (http.client.HTTPSConnection if parts.scheme == "https"
+                          else http.client.HTTPConnection)
+            conn = conn_class(parts.hostname, parts.port, timeout=STREAM_READ_TIMEOUT)
+            self._conn = conn
+            target = parts.path + (f"?{parts.query}" if parts.query else "")
+            conn.request("GET", target, headers={"Accept": "text/event-stream"})
+            response = conn.getresponse()
+            if response.status in (301, 302, 307) and response.getheader("Location"):
+                url = response.getheader("Location")
+                conn.close()
+                continue
+            if response.status != 200:
+                conn.close()
+                raise http.client.HTTPException(f"HTTP {response.status} {response.reason}")
+            return response
+        raise http.client.HTTPException("리다이렉트 횟수 초과")
+
+    def _run(self):
+        quoted = urllib.parse.quote(self.path.strip("/"), safe="/")
+        url = f"{self.base_url}/{quoted}.json"
+        failures = 0
+
+        while not self._stop_event.is_set():
+            try:
+                response = self._open(url)
+                self.connects += 1
+                if DEBUG_MODE:
+                    print(f"[Stream] {self.path} 구독 연결")
+                self._read_events(response)
+                failures = 0
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                if not self._stop_event.is_set() and DEBUG_MODE:
+                    print(f"[Stream] {self.path} 연결 끊김: {e}")
+                failures += 1
+            finally:
+                self._connected.clear()
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+            if self._stop_event.is_set():
+                break
+            delay = min(STREAM_RETRY_MAX, STREAM_RETRY_BASE * (2 ** max(0, failures - 1)))
+            self._stop_event.wait(delay)
+
+    def _read_events(self, response):
+        """이벤트 스트림 읽기 (연결이 끊기면 반환)"""
+        event, data_lines = None, []
+        while not self._stop_event.is_set():
+            line = response.readline()
+            if not line:
+                return  # 서버가 연결 종료
+            line = line.decode("utf-8").rstrip("\r\n")
+
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            elif line == "" and event is not None:
+                self._handle_event(event, "\n".join(data_lines))
+                event, data_lines = None, []
+
+    def _handle_event(self, event, raw):
+        self.last_event_at = time.time()
+        if event == "keep-alive":
+            return
+        if event in ("cancel", "auth_revoked"):
+            raise http.client.HTTPException(f"스트림 종료 이벤트: {event}")
+        if event not in ("put", "patch"):
+            return
+
+        payload = json.loads(raw)
+        with self._lock:
+            self._value = apply_event(self._value, event, payload.get("path", "/"),
+                                      payload.get("data"))
+            value = json.loads(json.dumps(self._value))  # 콜백에는 복사본 전달
+        self.events += 1
+        self._connected.set()
+
+        try:
+            self.on_change(value)
+        except Exception as e:
+            print(f"[Stream] {self.path} 콜백 오류: {e}")
+
+
+# 테스트 코드: 로컬 Firebase 대체 서버로 변경 전달 지연 / 재연결 확인
+if __name__ == "__main__":
+    from firebase_local_server import LocalFirebaseServer
+    import firebase_client
+
+    print("Firebase 스트리밍 테스트 시작...")
+    server = LocalFirebaseServer(port=0).start()
+    firebase_client.FIREBASE_DATABASE_URL = server.url
+    STREAM_RETRY_BASE = 0.1
+
+    received = []
+    arrived = threading.Event()
+
+    def on_command(value):
+        received.append((time.perf_counter(), value))
+        arrived.set()
+
+    stream = FirebaseStream("deviceCommands", on_command, base_url=server.url).start()
+    stream.wait_connected(5)
+
+    # 1) 명령 전달 지연 (폴링 방식은 최대 3초)
+    delays = []
+    for i in range(20):
+        arrived.clear()
+        sent = time.perf_counter()
+        firebase_client._firebase_patch("deviceCommands", {
+            "action": "calibration_start", "timestamp": i, "processed": False
+        })
+        arrived.wait(2)
+        delays.append((received[-1][0] - sent) * 1000)
+    delays.sort()
+    print(f"명령 전달 지연: 중앙값 {delays[len(delays) // 2]:.1f} ms, 최대 {delays[-1]:.1f} ms")
+
+    # 2) 서버 쪽 연결 끊김 → 재연결 후 미러 재동기화
+    server.database.close_streams()
+    time.sleep(0.05)
+    firebase_client._firebase_patch("deviceCommands", {"action": "calibration_stop"})
+    stream.wait_connected(5)
+    time.sleep(0.2)
+    print(f"재연결 후 미러: {stream.get()}")
+    print(f"통계: {stream.get_stats()}")
+
+    stream.stop()
+    server.stop()
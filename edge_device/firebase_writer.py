@@ -0,0 +1,375 @@
+"""
+누룽지 생산량 카운팅 시스템 - Firebase 쓰기 지연 큐 (write-behind)
+팬 완료 생산량 누적 / 장치 상태 업데이트를 백그라운드 스레드에서 Firebase에 기록
+
+  - 생산량 누적은 생산 저널(production_journal, SQLite)에 먼저 기록 → 재시작해도 유실 없음
+  - FIREBASE_BATCH_WINDOW 동안 들어온 쓰기(생산량 누적, 장치 상태, 명령 processed 플래그)를
+    다중 경로 업데이트로 합쳐 루트 PATCH 1회로 전송 (저널의 미전달 팬은 제품 / 생산일별로 합산)
+  - 전날 완료한 팬이 자정 뒤에 전달되면 todayProduction이 아니라 그날의 productionHistory/<날짜>에 누적
+  - 누적과 같은 PATCH에 팬별 기록(productionLog/<DEVICE_ID>/<키>)을 함께 보내므로 둘은 함께 적용됨
+  - 전송 실패 시 지수 백오프로 재시도, 성공하면 저널에 firebase ack 표시
+    응답을 못 받은 전송(타임아웃 / 연결 끊김)은 서버에 이미 적용됐을 수 있으므로, 재시도 전에
+    팬별 기록을 조회해서 반영된 팬은 ack만 하고 다시 누적하지 않음 (재시작 직후에도 같은 확인)
+  - 장치 상태 등 일반 업데이트는 경로별 최신값만 유지 (디스크에 저장하지 않음)
+"""
+
+import os
+import threading
+import time
+
+import firebase_client
+from metrics import registry
+from production_journal import PENDING_LIMIT
+from config import (
+    FIREBASE_RETRY_BASE,
+    FIREBASE_RETRY_MAX,
+    FIREBASE_BATCH_WINDOW,
+    DEBUG_MODE
+)
+
+# 저널 압축(보관 기간/디스크 예산 정리) 주기 (초)
+JOURNAL_COMPACT_INTERVAL = 600
+
+
+class FirebaseWriter:
+    """
+    Firebase 쓰기 전용 백그라운드 워커
+    """
+
+    def __init__(self, journal, retry_base=None, retry_max=None, batch_window=None):
+        """
+        Args:
+            journal (ProductionJournal): 생산 저널 (미전달 팬의 원본)
+            retry_base (float): 첫 재시도 대기 시간 (초)
+            retry_max (float): 최대 재시도 대기 시간 (초)
+            batch_window (float): 첫 쓰기 후 다른 쓰기를 모으는 시간 (초)
+        """
+        self.journal = journal
+        self.retry_base = FIREBASE_RETRY_BASE if retry_base is None else retry_base
+        self.retry_max = FIREBASE_RETRY_MAX if retry_max is None else retry_max
+        self.batch_window = FIREBASE_BATCH_WINDOW if batch_window is None else batch_window
+
+        self._cond = threading.Condition()
+        self._journal_pending = False  # 저널에 미전달 팬이 있을 수 있음
+        self._updates = {}             # 일반 다중 경로 업데이트 {"경로/키": 값} (최신값 유지)
+        self._failures = 0
+        self._next_attempt = 0.0
+        self._verify = False           # 다음 전송 전에 이미 반영된 팬 확인 (워커 스레드 전용)
+        self._last_compact = 0.0
+        self._running = False
+        self._thread = None
+
+        # 통계
+        self.increments_enqueued = 0
+        self.increments_delivered = 0
+        self.requests_sent = 0
+        self.requests_failed = 0
+        self.updates_sent = 0
+        self.already_applied = 0       # 응답을 못 받았지만 서버에 반영돼 있던 팬 (중복 누적 방지)
+
+        pending = self.journal.pending_count("firebase")
+        if pending:
+            print(f"[FirebaseWriter] 저널에 미전달 팬 {pending}건 → 재전송 예정")
+            self._journal_pending = True
+            self._verify = True  # 이전 실행의 마지막 전송이 응답 전에 끊겼을 수 있음
+
+    # ------------------------------------------------------------------
+    # 공개 API (다른 스레드에서 호출, 즉시 반환)
+    # ------------------------------------------------------------------
+
+    def enqueue_increment(self, product_name, count, frame_id=None):
+        """
+        생산량 누적 요청 (저널에 기록 후 즉시 반환)
+
+        Args:
+            product_name (str): 제품명 (Firebase key)
+            count (int): 추가할 수량
+            frame_id (int): 팬 완료를 판단한 프레임 번호
+
+        Returns:
+            int | None: 저널 행 id (등록하지 않았으면 None)
+        """
+        if not product_name or count <= 0:
+            return None
+
+        journal_id = self.journal.record(product_name, count, frame_id)
+        with self._cond:
+            self.increments_enqueued += 1
+            self._journal_pending = True
+            self._cond.notify_all()
+        return journal_id
+
+    def notify_journal(self):
+        """다른 곳에서 저널에 기록한 팬이 있을 때 전송 깨우기"""
+        with self._cond:
+            self._journal_pending = True
+            self._cond.notify_all()
+
+    def enqueue_update(self, updates):
+        """
+        일반 다중 경로 업데이트 요청 (같은 경로의 이전 미전송 값은 덮어씀)
+
+        Args:
+            updates (dict): {"경로/키": 값} (firebase_client.flatten_update 결과)
+        """
+        with self._cond:
+            firebase_client.merge_updates(self._updates, updates)
+            self._cond.notify_all()
+
+    def enqueue_status(self, count, cpu_temp, frames_total, capture_interval=None):
+        """
+        장치 상태 업데이트 요청 (이전 미전송 상태는 덮어씀)
+        """
+        self.enqueue_update(
+            firebase_client.status_update(count, cpu_temp, frames_total, capture_interval)
+        )
+
+    def pending_count(self):
+        """Firebase 미전달 팬 수"""
+        return self.journal.pending_count("firebase")
+
+    def get_stats(self):
+        """
+        쓰기 큐 통계 반환
+
+        Returns:
+            dict: 대기/전송/실패 수, 현재 백오프 (초)
+        """
+        pending = self.pending_count()
+        with self._cond:
+            backoff = max(0.0, self._next_attempt - time.time()) if self._failures else 0.0
+            return {
+                "pending": pending,
+                "enqueued": self.increments_enqueued,
+                "delivered": self.increments_delivered,
+                "requests_sent": self.requests_sent,
+                "requests_failed": self.requests_failed,
+                "updates_sent": self.updates_sent,
+                "already_applied": self.already_applied,
+                "consecutive_failures": self._failures,
+                "backoff_s": round(backoff, 1)
+            }
+
+    # ------------------------------------------------------------------
+    # 워커 스레드
+    # ------------------------------------------------------------------
+
+    def _register_metrics(self):
+        registry.gauge("edge_firebase_pending", "Firebase 미전달 팬 수", fn=self.pending_count)
+        registry.gauge("edge_firebase_consecutive_failures", "Firebase 연속 전송 실패 수",
+                       fn=lambda: self._failures)
+        registry.counter("edge_firebase_requests_failed_total", "Firebase 전송 실패 수",
+                         fn=lambda: self.requests_failed)
+        registry.counter("edge_firebase_already_applied_total",
+                         "응답을 못 받았지만 이미 반영돼 재전송을 생략한 팬 수",
+                         fn=lambda: self.already_applied)
+
+    def start(self):
+        """백그라운드 전송 스레드 시작"""
+        self._register_metrics()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True, name="firebase-writer")
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """
+        전송 스레드 종료 (종료 전 1회 전송 시도, 남은 팬은 저널에 보존)
+        """
+        with self._cond:
+            self._running = False
+            self._next_attempt = 0.0
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        remaining = self.pending_count()
+        if remaining:
+            print(f"[FirebaseWriter] 미전송 {remaining}건 저널에 보존 (다음 실행 시 재전송)")
+
+    def _has_work(self):
+        return self._journal_pending or bool(self._updates)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._running and not (
+                    self._has_work() and time.time() >= self._next_attempt
+                ):
+                    wait = None
+                    if self._has_work():
+                        wait = max(0.0, self._next_attempt - time.time())
+                    self._cond.wait(timeout=wait)
+
+                if not self._running and not self._has_work():
+                    return
+
+                # 같은 틱에 이어서 들어오는 쓰기를 모아서 한 번에 전송
+                if self._failures == 0:
+                    deadline = time.time() + self.batch_window
+                    while self._running and time.time() < deadline:
+                        self._cond.wait(timeout=deadline - time.time())
+
+                self._journal_pending = False
+                updates, self._updates = self._updates, {}
+
+            pending = self.journal.pending("firebase")
+            more = len(pending) >= PENDING_LIMIT
+            if self._verify and pending:
+                pending = self._skip_applied(pending)
+            ok = pending is not None and self._flush(pending, updates)
+
+            with self._cond:
+                if ok:
+                    self._verify = False
+                    self._failures = 0
+                    self._next_attempt = 0.0
+                    if more:
+                        self._journal_pending = True  # 한도만큼 읽었으면 남은 행 계속 전송
+                else:
+                    self._verify = True
+                    self._journal_pending = True
+                    self._failures += 1
+                    backoff = min(self.retry_max, self.retry_base * (2 ** (self._failures - 1)))
+                    self._next_attempt = time.time() + backoff
+                    if DEBUG_MODE:
+                        print(f"[FirebaseWriter] 전송 실패 → {backoff:.1f}초 후 재시도 "
+                              f"(미전송 {len(pending or ())}건)")
+                    # 실패한 일반 업데이트는 되돌려 놓되 그 사이 들어온 새 값이 우선
+                    self._updates = firebase_client.merge_updates(updates, self._updates)
+                if not self._running:
+                    return  # 종료 요청 후에는 1회만 시도
+
+            if ok and time.time() - self._last_compact >= JOURNAL_COMPACT_INTERVAL:
+                self.journal.compact()
+                self._last_compact = time.time()
+
+    def _skip_applied(self, pending):
+        """
+        응답을 못 받은 이전 전송이 서버에 반영됐는지 팬별 기록으로 확인 → 반영된 팬은 ack만 하고 제외
+
+        PATCH 1회는 전체가 함께 적용되고 미전달 팬은 오래된 순으로 보내므로, 반영된 팬은 항상
+        pending의 앞부분 → 첫 팬 1회 조회 (반영돼 있으면 경계를 이분 탐색)
+        타임아웃된 요청이 확인 뒤에야 서버에 도착하는 경우는 막지 못함 (백오프 대기가 그 여유)
+
+        Returns:
+            list | None: 아직 보낼 팬 (확인 요청 실패 시 None)
+        """
+        found = firebase_client.production_logged(pending[0])
+        if not found:
+            return None if found is None else pending
+
+        low, high = 1, len(pending)
+        while low < high:
+            middle = (low + high) // 2
+            found = firebase_client.production_logged(pending[middle])
+            if found is None:
+                return None
+            if found:
+                low = middle + 1
+            else:
+                high = middle
+
+        self._ack([r["id"] for r in pending[:low]])
+        self.already_applied += low
+        print(f"[FirebaseWriter] 응답을 못 받은 전송이 이미 반영됨 → 팬 {low}건 재전송 생략")
+        return pending[low:]
+
+    def _flush(self, pending, updates):
+        """
+        대기 중인 누적(제품 / 생산일별 합산) + 팬별 기록과 일반 업데이트를 루트 PATCH 1회로 전송
+
+        저널 시각(ts)이 오늘이 아닌 팬은 웹앱이 이미 초기화한 todayProduction 대신
+        그날의 productionHistory에 누적한다.
+
+        Returns:
+            bool: 성공 여부 (실패 시 전체를 다음 시도로 미룸)
+        """
+        batch = {}
+        totals = {}
+        today = firebase_client.production_day()
+        for record in pending:
+            key = (record["product"], firebase_client.production_day(record["ts"]))
+            totals[key] = totals.get(key, 0) + record["count"]
+        for (product, day), total in totals.items():
+            if day == today:
+                update = firebase_client.production_update(product, total)
+            else:
+                update = firebase_client.production_history_update(product, day, total)
+            firebase_client.merge_updates(batch, update)
+        batch.update(firebase_client.production_log_update(pending))
+        firebase_client.merge_updates(batch, updates)
+        if not batch:
+            return True
+
+        self.requests_sent += 1
+        if not firebase_client.patch_multi(batch):
+            self.requests_failed += 1
+            return False
+
+        if pending:
+            self._ack([r["id"] for r in pending])
+            if DEBUG_MODE:
+                summary = ", ".join(f"{p} +{t}" + ("" if d == today else f" ({d})")
+                                    for (p, d), t in totals.items())
+                print(f"[FirebaseWriter] 누적 {len(pending)}건 전송: {summary}")
+        self.updates_sent += len(updates)
+        return True
+
+    def _ack(self, ids):
+        """전송 완료 팬을 저널에 firebase ack 표시"""
+        self.journal.ack("firebase", ids)
+        self.increments_delivered += len(ids)
+
+
+# 테스트 코드: 로컬 Firebase 대체 서버로 처리량 / 무손실 / 무중복 전달 확인
+#   (503 장애 30% + 적용 후 응답 유실 20% → 응답을 못 받은 전송의 재시도가 중복 누적되지 않아야 함)
+if __name__ == "__main__":
+    import random
+    import tempfile
+    from firebase_local_server import LocalFirebaseServer
+    from production_journal import ProductionJournal
+
+    print("Firebase 쓰기 큐 테스트 시작...")
+    server = LocalFirebaseServer(port=0, fail_rate=0.3, lost_reply_rate=0.2).start()
+    firebase_client.FIREBASE_DATABASE_URL = server.url
+    firebase_client.DEBUG_MODE = False
+    DEBUG_MODE = False
+
+    journal_path = os.path.join(tempfile.mkdtemp(), "journal.db")
+    products = ["누룽지", "현미누룽지"]
+    expected = {p: 0 for p in products}
+
+    # 1) 장애율 30% 상태에서 전송하다가 중간에 "재시작"
+    journal = ProductionJournal(journal_path)
+    writer = FirebaseWriter(journal, retry_base=0.05, retry_max=0.5).start()
+    start = time.perf_counter()
+    for i in range(200):
+        product = random.choice(products)
+        count = random.randint(1, 20)
+        expected[product] += count
+        writer.enqueue_increment(product, count)
+        time.sleep(0.002)
+        if i == 100:
+            server.set_fail_rate(1.0)  # 완전 단절
+    writer.stop(timeout=1.0)
+    print(f"1차 실행 종료: {writer.get_stats()}")
+
+    journal.close()
+
+    # 2) 네트워크 복구 후 재시작 → 저널의 미전달 팬을 재전송
+    server.set_fail_rate(0.3)
+    journal = ProductionJournal(journal_path)
+    writer = FirebaseWriter(journal, retry_base=0.05, retry_max=0.5).start()
+    while writer.pending_count():
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    writer.stop()
+
+    for product in products:
+        actual = server.database.get(f"products/{product}/todayProduction")
+        result = "OK" if actual == expected[product] else "유실/중복!"
+        print(f"{product}: 기대 {expected[product]}, 실제 {actual} → {result}")
+    print(f"서버 요청 통계: {server.get_stats()}")
+    print(f"다중 경로 PATCH 통계: {firebase_client.get_update_stats()}")
+    print(f"전체 소요 시간: {elapsed:.2f}초, 저널: {journal.get_stats()}")
+    server.stop()
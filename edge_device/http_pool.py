@@ -0,0 +1,247 @@
+"""
+누룽지 생산량 카운팅 시스템 - HTTP keep-alive 연결 풀
+http.client 연결을 재사용하여 요청마다 TCP/TLS 핸드셰이크를 반복하지 않음
+
+  - 호스트 1개 전용, 최대 size개 연결 (초과 요청은 연결이 반납될 때까지 대기)
+  - 유휴 연결은 꺼내기 전에 서버 쪽에서 끊겼는지 확인 (끊겼으면 닫고 새 연결)
+  - 재사용한 연결이 그래도 끊겨 있으면 새 연결로 1회 재시도 - 단, 요청을 다 보낸 뒤의 오류는
+    멱등 메서드(GET / PUT / DELETE)만 재시도 (PATCH 누적 등은 서버에 이미 적용됐을 수 있어 호출자가 판단)
+  - 요청별 처리 시간 히스토그램 / 핸드셰이크 횟수 통계
+"""
+
+import http.client
+import select
+import threading
+import time
+from urllib.parse import urlsplit
+
+from metrics import registry
+from pipeline import LatencyHistogram
+
+# 재사용 연결이 유휴 중 끊겼을 때 나타나는 예외 (새 연결로 재시도 대상)
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+# 응답을 못 받았어도 다시 보내도 되는 메서드 (PATCH / POST는 서버에 이미 적용됐을 수 있음)
+IDEMPOTENT_METHODS = frozenset(("GET", "HEAD", "PUT", "DELETE", "OPTIONS"))
+
+
+def _is_dropped(conn):
+    """유휴 연결이 서버 쪽에서 닫혔는지 (유휴 중 읽을 데이터가 있으면 EOF / 예상 밖 응답)"""
+    if conn.sock is None:
+        return True
+    try:
+        return bool(select.select([conn.sock], [], [], 0)[0])
+    except (OSError, ValueError):
+        return True
+
+
+class HTTPStatusError(http.client.HTTPException):
+    """HTTP 응답 상태 코드 오류 (4xx / 5xx)"""
+
+    def __init__(self, status, reason, body=b""):
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+        self.reason = reason
+        self.body = body
+
+
+class HTTPConnectionPool:
+    """
+    단일 호스트용 keep-alive 연결 풀 (thread-safe)
+    """
+
+    def __init__(self, base_url, size=2, timeout=5.0):
+        """
+        Args:
+            base_url (str): "https://host[:port]" 형태의 기본 URL
+            size (int): 최대 동시 연결 수
+            timeout (float): 연결/응답 대기 시간 (초)
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"지원하지 않는 URL: {base_url}")
+
+        self.base_url = base_url
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip("/")
+        self.size = max(1, size)
+        self.timeout = timeout
+
+        self._idle = []  # 반납된 유휴 연결 (마지막에 반납된 것부터 재사용)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+        # 통계
+        self.histogram = LatencyHistogram()
+        self.requests = 0
+        self.errors = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.reconnects = 0
+
+        labels = {"host": self.host}
+        registry.histogram("edge_http_request_duration_seconds", "HTTP 요청 처리 시간",
+                           labels, histogram=self.histogram)
+        registry.counter("edge_http_request_errors_total", "HTTP 요청 오류 수",
+                         labels, fn=lambda: self.errors)
+        registry.counter("edge_http_connections_opened_total", "새 연결 (핸드셰이크) 수",
+                         labels, fn=lambda: self.connections_opened)
+
+    def _new_connection(self):
+        if self.scheme == "https":
+            conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        with self._lock:
+            self.connections_opened += 1
+        return conn
+
+    def _acquire(self):
+        """연결 1개 확보 → (연결, 재사용 여부)"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("연결 풀 대기 시간 초과")
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if _is_dropped(conn):
+                    conn.close()
+                    continue
+                self.connections_reused += 1
+                return conn, True
+        try:
+            return self._new_connection(), False
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, conn, reusable):
+        with self._lock:
+            if reusable and not self._closed:
+                self._idle.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+        self._slots.release()
+
+    def request(self, method, path, body=None, headers=None):
+        """
+        HTTP 요청 1회
+
+        Args:
+            method (str): "GET" | "PATCH" | ...
+            path (str): 기본 URL 뒤에 붙는 경로 (퍼센트 인코딩된 상태, 쿼리 포함 가능)
+            body (bytes): 요청 본문
+            headers (dict): 추가 헤더
+
+        Returns:
+            bytes: 응답 본문 (2xx)
+
+        Raises:
+            HTTPStatusError: 4xx / 5xx 응답
+            OSError, http.client.HTTPException: 연결 오류 (비멱등 메서드는 서버에 적용됐을 수도 있음)
+        """
+        url = self.base_path + path
+        start = time.perf_counter()
+        try:
+            for attempt in range(2):
+                conn, reused = self._acquire()
+                sent = False
+                try:
+                    conn.request(method, url, body=body, headers=headers or {})
+                    sent = True
+                    response = conn.getresponse()
+                    data = response.read()
+                except STALE_CONNECTION_ERRORS:
+                    self._release(conn, reusable=False)
+                    if reused and attempt == 0 and (not sent or method in IDEMPOTENT_METHODS):
+                        # 유휴 중 서버가 닫은 연결 → 새 연결로 재시도
+                        # (요청을 다 보낸 뒤라면 서버가 처리했을 수 있으므로 멱등 메서드만)
+                        with self._lock:
+                            self.reconnects += 1
+                        continue
+                    raise
+                except BaseException:
+                    self._release(conn, reusable=False)
+                    raise
+
+                self._release(conn, reusable=not response.will_close)
+                if response.status >= 400:
+                    raise HTTPStatusError(response.status, response.reason, data)
+                return data
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            self.histogram.observe(time.perf_counter() - start)
+            with self._lock:
+                self.requests += 1
+
+    def close(self):
+        """유휴 연결 모두 닫기 (사용 중인 연결은 반납 시 닫힘)"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def get_stats(self):
+        """
+        연결 풀 통계 반환
+
+        Returns:
+            dict: 요청/오류 수, 새 연결(핸드셰이크)/재사용 횟수, 지연 시간 히스토그램
+        """
+        with self._lock:
+            stats = {
+                "requests": self.requests,
+                "errors": self.errors,
+                "connections_opened": self.connections_opened,
+                "connections_reused": self.connections_reused,
+                "reconnects": self.reconnects,
+                "idle": len(self._idle)
+            }
+        stats["latency"] = self.histogram.snapshot()
+        return stats
+
+
+# 테스트 코드: 로컬 Firebase 대체 서버에 urlopen vs 연결 풀 비교
+if __name__ == "__main__":
+    import json
+    import urllib.request
+    from firebase_local_server import LocalFirebaseServer
+
+    REQUESTS = 300
+    server = LocalFirebaseServer(port=0).start()
+    print(f"HTTP 연결 풀 테스트 시작... ({server.url}, {REQUESTS}회 GET)")
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        with urllib.request.urlopen(f"{server.url}/deviceCommands.json", timeout=5) as r:
+            json.loads(r.read())
+    urlopen_ms = (time.perf_counter() - start) * 1000 / REQUESTS
+
+    pool = HTTPConnectionPool(server.url, size=2)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        json.loads(pool.request("GET", "/deviceCommands.json"))
+    pool_ms = (time.perf_counter() - start) * 1000 / REQUESTS
+
+    print(f"urlopen (요청마다 새 연결): {urlopen_ms:.2f} ms/요청")
+    print(f"연결 풀 (keep-alive):     {pool_ms:.2f} ms/요청")
+    stats = pool.get_stats()
+    print(f"새 연결 {stats['connections_opened']}회, 재사용 {stats['connections_reused']}회, "
+          f"p95 {stats['latency']['p95_ms']} ms")
+    print("(TLS 환경에서는 새 연결마다 핸드셰이크 비용이 추가되어 차이가 더 커짐)")
+
+    pool.close()
+    server.stop()
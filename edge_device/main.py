@@ -6,16 +6,56 @@
 import time
 import signal
 import sys
+from collections import deque
 from camera_capture import CameraCapture
-from detector import NurungjiDetector
+from detector import NurungjiDetector, normalize_roi
 from mqtt_client import MQTTClient
 from mjpeg_server import MJPEGServer
+from metrics import registry, read_cpu_temperature
+from motion_gate import MotionGate
+from capture_rate import AdaptiveCaptureInterval
+from pan_detector import PanCompleteDetector, EMPTY
+from tracker import ObjectTracker, ARRIVAL_NEW, ARRIVAL_STACKED
+from pipeline import PipelineStage, StageQueue
+from scheduler import Scheduler
 import config
 import firebase_client
-from config import CAPTURE_INTERVAL, DEBUG_MODE, POWER_SAVE_MODE
-
-# Firebase activeProduction 조회 간격 (초)
-ACTIVE_PRODUCT_POLL_INTERVAL = 30
+from firebase_writer import FirebaseWriter
+from firebase_stream import FirebaseStream
+from production_journal import ProductionJournal
+from config import (
+    CAPTURE_INTERVAL,
+    DEBUG_MODE,
+    POWER_SAVE_MODE,
+    PIPELINE_ENABLED,
+    PIPELINE_QUEUE_SIZE,
+    PIPELINE_DROP_POLICY,
+    FIREBASE_EVENT_QUEUE_SIZE,
+    FIREBASE_WRITER_ENABLED,
+    FIREBASE_STREAMING_ENABLED,
+    JOURNAL_PATH,
+    HEALTH_FRAME_TIMEOUT,
+    EDGE_RUNTIME,
+    SCHEDULER_JITTER,
+    COMMAND_POLL_INTERVAL,
+    ACTIVE_PRODUCT_POLL_INTERVAL,
+    STATUS_PUSH_INTERVAL,
+    SETTINGS_REFRESH_INTERVAL,
+    MQTT_STATUS_INTERVAL,
+    MQTT_REPLAY_INTERVAL,
+    STATS_PRINT_INTERVAL,
+    CALIBRATION_IMAGE_INTERVAL
+)
+
+# 감지 단계 스레드에서 적용하는 deviceSettings 항목 (추적 / 팬 판정 상태)
+DETECT_SETTING_KEYS = (
+    'TRACKING_ENABLED',
+    'PAN_FILL_FRAMES',
+    'PAN_EMPTY_FRAMES',
+    'PAN_WINDOW',
+    'PAN_STABLE_FRAMES',
+    'PAN_EMPTY_SECONDS'
+)
 
 
 class NurungjiCounterEdge:
@@ -37,33 +77,52 @@ class NurungjiCounterEdge:
 
         print("[2/3] 객체 감지기 초기화 중...")
         self.detector = NurungjiDetector()
+        self.motion_gate = MotionGate()
+        self.tracker = ObjectTracker()
+        self.capture_rate = AdaptiveCaptureInterval()
+        self._last_detection = (0, [])  # 모션 게이트가 감지를 생략할 때 재사용
 
         print("[3/3] MQTT 클라이언트 초기화 중...")
-        self.mqtt_client = MQTTClient()
-
-        # 연결 대기
-        time.sleep(2)
+        # asyncio 방식은 이벤트 루프가 MQTT 소켓을 구동 (연결 결과도 루프 시작 후 도착)
+        self._async = EDGE_RUNTIME == "asyncio"
+        self._async_runtime = None  # run()에서 생성 (asyncio 방식)
+        self.mqtt_client = MQTTClient(start_loop=not self._async)
+
+        if not self._async:
+            # 연결 대기
+            time.sleep(2)
+
+            if not self.mqtt_client.is_connected():
+                print("\n⚠️  경고: MQTT 브로커에 연결되지 않았습니다.")
+                print("   MQTT 없이 Firebase 모드로 계속 실행합니다.")
+            else:
+                print("\n✓ 모든 시스템 준비 완료")
+
+        # 팬 완료 판정 (연속 빈 프레임 + 안정된 최대 갯수) / 이전 프레임 카운트
+        self.pan_detector = PanCompleteDetector()
+        self._previous_count = 0
+        # 추적 / 팬 판정 설정 변경 대기열 (설정은 다른 스레드에서 들어오고, 감지 단계가 프레임 사이에 적용)
+        self._detect_settings = deque()
 
-        if not self.mqtt_client.is_connected():
-            print("\n⚠️  경고: MQTT 브로커에 연결되지 않았습니다.")
-            print("   MQTT 없이 Firebase 모드로 계속 실행합니다.")
-        else:
-            print("\n✓ 모든 시스템 준비 완료")
+        # 로컬 생산 저널 (팬 완료를 먼저 기록, Firebase / MQTT 전달 여부 관리)
+        self.journal = ProductionJournal(JOURNAL_PATH)
 
-        # 팬 완료 감지용 이전 카운트
-        self._previous_count = 0
+        # Firebase 쓰기 지연 큐 (생산량 누적 / 장치 상태를 백그라운드로 전송)
+        self.firebase_writer = (
+            FirebaseWriter(self.journal).start() if FIREBASE_WRITER_ENABLED else None
+        )
 
         # Firebase activeProduction 캐시
         self._active_product = None
-        self._last_product_poll = 0
 
-        # 장치 상태 주기적 업데이트 (30초마다)
-        self._last_status_push = 0
-        # Firebase deviceSettings 주기적 갱신 (5분마다)
-        self._last_settings_refresh = 0
-        # 누적 프레임 수
+        # 누적 프레임 수 (캡처 / 감지 / 전송 단계별)
         self._frames_total = 0
-        # 동적 촬영 간격 (Firebase 설정 오버라이드 가능)
+        self._frames_processed = 0
+        self._frames_published = 0
+        self._latest_count = 0
+        self._last_frame_at = None
+        self._start_time = time.time()
+        # 고정 촬영 간격 (적응형 간격을 끈 경우, Firebase 설정 오버라이드 가능)
         self._capture_interval = CAPTURE_INTERVAL
 
         # 캘리브레이션 모드 (PC에서 원격으로 켜고 끔)
@@ -73,20 +132,34 @@ class NurungjiCounterEdge:
         # 최신 바운딩 박스 (MJPEG 오버레이용)
         self._latest_boxes = []
 
-        # MJPEG 스트리밍 서버 시작 (데몬 스레드)
+        # MJPEG 스트리밍 서버 시작 (데몬 스레드 / asyncio 방식은 이벤트 루프에서 serve_async)
         self.mjpeg_server = MJPEGServer(
             get_calibration_mode=lambda: self._calibration_mode,
             get_latest_boxes=lambda: self._latest_boxes,
         )
-        self.mjpeg_server.start()
-
-        # Firebase 명령 폴링 간격 (초)
-        self._last_command_poll = 0
-        self._command_poll_interval = 3  # 3초마다 폴링
+        if not self._async:
+            self.mjpeg_server.start()
 
         # MQTT 명령 핸들러 등록
         self.mqtt_client.set_command_handler(self._on_command)
 
+        # 캡처 / 감지 / 전송 / Firebase 단계 구성
+        self._firebase_events = StageQueue("firebase_events", FIREBASE_EVENT_QUEUE_SIZE, "block")
+        self._build_pipeline()
+
+        # 주기 작업 (Firebase 폴링 / 장치 상태 / MQTT 상태 / 통계) - 캡처 경로 밖의 워커 스레드에서 실행
+        self.scheduler = Scheduler()
+        self._register_jobs()
+        self._register_metrics()
+
+        # MQTT 재연결 시 끊긴 동안 저널에 쌓인 팬 완료를 다음 주기까지 기다리지 않고 바로 재전송
+        self.mqtt_client.set_connect_handler(lambda: self.scheduler.trigger("mqtt_replay"))
+
+        # Firebase 스트리밍 리스너 (연결된 동안은 해당 노드 폴링 생략)
+        self._streams = {}
+        if FIREBASE_STREAMING_ENABLED:
+            self._start_streams()
+
         # 시그널 핸들러 설정 (Ctrl+C 처리)
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -120,135 +193,513 @@ class NurungjiCounterEdge:
         else:
             print(f"[명령] 알 수 없는 명령: {action}")
 
-    def _refresh_active_product(self):
-        """
-        Firebase에서 현재 생산 중인 제품명을 주기적으로 조회
-        ACTIVE_PRODUCT_POLL_INTERVAL 초마다 갱신
-        """
-        now = time.time()
-        if now - self._last_product_poll >= ACTIVE_PRODUCT_POLL_INTERVAL:
-            product = firebase_client.get_active_product()
-            if product != self._active_product:
-                if product:
-                    print(f"[Firebase] 생산 시작: {product}")
-                else:
-                    print("[Firebase] 생산 중인 제품 없음")
-            self._active_product = product
-            self._last_product_poll = now
-        return self._active_product
-
-    def _check_batch_complete(self, current_count):
+    def _on_firebase_command(self, action):
+        """Firebase deviceCommands 명령 처리 (action 문자열 → MQTT 명령과 같은 형식)"""
+        self._on_command({"action": action})
+
+    def _start_streams(self):
+        """deviceCommands / activeProduction / deviceSettings 스트리밍 구독 시작"""
+        self._streams = {
+            "deviceCommands": FirebaseStream(
+                "deviceCommands",
+                lambda value: firebase_client.handle_command(
+                    value, self._on_firebase_command, self._queue_firebase_update
+                )
+            ),
+            "activeProduction": FirebaseStream(
+                "activeProduction",
+                lambda value: self._set_active_product(
+                    value.get("product") if isinstance(value, dict) else None
+                )
+            ),
+            "deviceSettings": FirebaseStream(
+                "deviceSettings",
+                lambda value: self._apply_device_settings(value) if isinstance(value, dict) else None
+            ),
+        }
+        for stream in self._streams.values():
+            stream.start()
+
+    def _queue_firebase_update(self, updates):
+        """다중 경로 업데이트를 쓰기 큐에 넣어 다른 쓰기와 묶어서 전송 (쓰기 큐가 없으면 즉시)"""
+        if self.firebase_writer is not None:
+            self.firebase_writer.enqueue_update(updates)
+        else:
+            firebase_client.patch_multi(updates)
+
+    def _stream_connected(self, path):
+        """해당 노드 스트림이 연결되어 있으면 True (폴링 생략)"""
+        stream = self._streams.get(path)
+        return stream is not None and stream.is_connected()
+
+    def _set_active_product(self, product):
+        """생산 중인 제품 캐시 갱신 (폴링 / 스트리밍 공용)"""
+        if isinstance(product, str) and product.strip():
+            product = product.strip()
+        else:
+            product = None
+        if product != self._active_product:
+            if product:
+                print(f"[Firebase] 생산 시작: {product}")
+            else:
+                print("[Firebase] 생산 중인 제품 없음")
+        self._active_product = product
+
+    def _poll_active_product(self):
+        """activeProduction 1회 조회 (스트림 연결 중에는 생략)"""
+        if self._stream_connected("activeProduction"):
+            return
+        self._set_active_product(firebase_client.get_active_product())
+
+    def _check_batch_complete(self, current_count, arrivals=(), now=None):
         """
-        팬 완료 감지: 이전 카운트 > 0 이고 현재 카운트 == 0 이면 팬 1판 완료
+        팬 완료 감지: 빈 프레임이 PAN_EMPTY_FRAMES 이상 연속이고
+        PAN_EMPTY_SECONDS 이상 이어지면 팬 1판 완료 (pan_detector.py)
 
         Args:
             current_count (int): 현재 프레임의 감지 갯수
+            arrivals (list): 이번 프레임의 조각 도착 이벤트 (tracker.py)
+            now (float): 프레임 촬영 시각 (초)
 
         Returns:
-            int: 완료된 팬의 갯수 (0이면 완료 없음)
+            int: 완료된 팬의 갯수 (안정된 최대 갯수와 도착 수 중 큰 값, 0이면 완료 없음)
         """
-        batch_count = 0
-        if self._previous_count > 0 and current_count == 0:
-            batch_count = self._previous_count
-            print(f"\n🍚 팬 완료! 갯수: {batch_count}개")
+        state = self.pan_detector.state
+        batch_count = self.pan_detector.update(current_count, arrivals, now)
+        if self.pan_detector.state == EMPTY and (state != EMPTY or current_count == 0):
+            self.tracker.reset()  # 팬 완료 / 버림 / 빈 팬 → 다음 팬은 새로 추적 (가려진 조각은 팬 끝까지 유지)
+        if batch_count > 0:
+            pan = self.pan_detector.last_pan
+            print(f"\n🍚 팬 완료! 갯수: {batch_count}개 "
+                  f"(최대 표시 {pan['peak']}개, 도착 {pan['arrivals']}건)")
         self._previous_count = current_count
         return batch_count
 
+    def _current_interval(self):
+        """촬영 간격 (적응형 간격 또는 고정 간격, 전력 절약 모드면 2배)"""
+        interval = self.capture_rate.interval if self.capture_rate.enabled else self._capture_interval
+        return interval * (2 if config.POWER_SAVE_MODE else 1)
+
+    def _main_frame_wanted(self):
+        """메인 해상도 프레임이 필요한지 (MJPEG 시청자 / 스냅샷 요청, 캘리브레이션 이미지 전송 시점)"""
+        if self.mjpeg_server.wants_frames():
+            return True
+        return (self._calibration_mode and self.mqtt_client.is_connected()
+                and time.time() - self._last_calib_image >= CALIBRATION_IMAGE_INTERVAL)
+
+    def _capture_step(self, _=None):
+        """
+        [캡처 단계] 프레임 1장 캡처
+
+        Returns:
+            dict | None: {"detect_frame", "frame", "frame_id", "captured_at"} - 캡처 실패 시 None
+        """
+        # lores 활성화 시 감지는 저해상도 프레임, 메인 프레임은 MJPEG/캘리브레이션에 필요할 때만
+        # 같은 캡처 요청에서 추출 (lores를 쓰지 않으면 감지 프레임이 곧 메인 프레임)
+        detect_frame, frame = self.camera.capture_detection_frames(with_main=self._main_frame_wanted())
+
+        if detect_frame is None:
+            print("⚠️  프레임 캡처 실패")
+            return None
+
+        self._frames_total += 1
+        self._last_frame_at = time.time()
+        return {
+            "detect_frame": detect_frame,
+            "frame": frame,
+            "frame_id": self.camera.last_frame_sequence,
+            "captured_at": self.camera.last_frame_timestamp or time.time()
+        }
+
+    def _detect_step(self, item):
+        """
+        [감지 단계] 객체 감지 + 팬 완료 판단
+
+        팬 완료 이벤트는 Firebase 이벤트 큐로 넘기므로 네트워크 지연과 무관하게 판단한다.
+
+        Args:
+            item (dict): _capture_step() 결과
+
+        Returns:
+            dict: 전송 단계로 넘길 결과 {"frame", "count", "boxes", "captured_at"}
+        """
+        self._apply_detect_settings()
+
+        # 장면 변화가 없으면 감지를 생략하고 이전 결과 재사용 (박스는 메인 스트림 좌표)
+        # 새로 감지한 프레임만 추적 (재사용한 결과는 같은 박스라 도착이 없음)
+        arrivals = []
+        if self.motion_gate.should_detect(item["detect_frame"]):
+            start = time.perf_counter()
+            self._last_detection = self.detector.detect(
+                item["detect_frame"], main_size=self.camera.main_size
+            )
+            self._detector_histogram.observe(time.perf_counter() - start)
+            if self.tracker.enabled:
+                arrivals = self.tracker.update(self._last_detection[1])
+        count, bounding_boxes = self._last_detection
+        self._objects_gauge.set(count)
+
+        # 장면 변화 / 개수 변화(팬 채우는 중 / 비우는 중)가 있으면 촬영 간격 단축, 없으면 점점 늘림
+        self.capture_rate.update(self.motion_gate.last_motion or count != self._previous_count)
+        self._latest_boxes = bounding_boxes
+        self._latest_count = count
+        self._frames_processed += 1
+
+        # 팬 완료 감지 → Firebase 이벤트 큐
+        batch_count = self._check_batch_complete(count, arrivals, item["captured_at"])
+        if batch_count > 0:
+            self._batches_counter.inc()
+            self._firebase_events.put({
+                "type": "batch_complete",
+                "count": batch_count,
+                "frame_id": item["frame_id"],
+                "peak": self.pan_detector.last_pan["peak"],
+                "arrivals": self.pan_detector.last_pan["arrivals"]
+            })
+
+        return {
+            "frame": item["frame"],
+            "count": count,
+            "boxes": bounding_boxes,
+            "captured_at": item["captured_at"]
+        }
+
+    def _publish_step(self, result):
+        """
+        [전송 단계] MJPEG 프레임 갱신 + MQTT 전송
+
+        Args:
+            result (dict): _detect_step() 결과
+        """
+        frame = result["frame"]
+        count = result["count"]
+        bounding_boxes = result["boxes"]
+        self._frames_published += 1
+
+        # MJPEG 서버에 최신 프레임 전달
+        if frame is not None:
+            self.mjpeg_server.push_frame(frame, bounding_boxes)
+
+        # MQTT 카운트 전송 (연결이 끊긴 동안에는 최신 카운트만 보관했다가 재연결 시 전송)
+        self.mqtt_client.publish_count(count, bounding_boxes)
+
+        # 캘리브레이션 모드: CALIBRATION_IMAGE_INTERVAL초마다 감지 결과 이미지 전송 (연결된 경우)
+        if self._calibration_mode and frame is not None and self.mqtt_client.is_connected():
+            now = time.time()
+            if now - self._last_calib_image >= CALIBRATION_IMAGE_INTERVAL:
+                self.mqtt_client.publish_calibration_image(frame, count, bounding_boxes)
+                self._last_calib_image = now
+
+    def _record_batch(self, event):
+        """
+        [Firebase 단계] 팬 완료 1건 기록 (저널 + Firebase) 후 MQTT 재전송 작업을 바로 실행
+
+        Args:
+            event (dict): {"type": "batch_complete", "count": int, "frame_id": int}
+        """
+        if event.get("type") != "batch_complete":
+            return
+        batch_count = event["count"]
+        frame_id = event.get("frame_id")
+        active_product = self._active_product
+        if active_product and self.firebase_writer is not None:
+            # 저널 기록 + Firebase 전송 대기열 등록
+            self.firebase_writer.enqueue_increment(active_product, batch_count, frame_id)
+            print(f"   → Firebase 전송 대기열 등록: {active_product} +{batch_count}")
+        else:
+            journal_id = self.journal.record(active_product, batch_count, frame_id)
+            if not active_product:
+                print("   → 생산 중인 제품 없음 (zego 웹앱에서 '생산 시작' 필요)")
+            elif firebase_client.increment_production(active_product, batch_count):
+                self.journal.ack("firebase", [journal_id])
+                print(f"   → Firebase 기록 완료: {active_product} +{batch_count}")
+            else:
+                print(f"   → Firebase 기록 실패 (저널에 보존)")
+        self.scheduler.trigger("mqtt_replay")
+
+    def _replay_journal_to_mqtt(self):
+        """
+        저널에서 MQTT 미전달 팬 완료를 모아 메시지 1개로 전송 (연결된 경우)
+        실패하면 다음 주기(MQTT_REPLAY_INTERVAL)에 재시도
+        """
+        if not self.mqtt_client.is_connected():
+            return
+        pans = self.journal.pending("mqtt")
+        if not pans:
+            return
+
+        if self.mqtt_client.publish_pans(pans):
+            self.journal.ack("mqtt", [pan["id"] for pan in pans])
+            if len(pans) > 1:
+                print(f"[Journal] MQTT 미전달 팬 {len(pans)}건 일괄 전송")
+
+    def _publish_mqtt_status(self):
+        """MQTT 장치 상태 전송 (연결된 경우)"""
+        if self.mqtt_client.is_connected():
+            self.mqtt_client.publish_status(self._get_device_status())
+
+    def _print_stats(self, count):
+        """주기적 통계 출력 (요약 - 상세 지표는 MJPEG 서버의 /metrics)"""
+        elapsed = time.time() - self._start_time
+        fps = self._frames_processed / elapsed if elapsed > 0 else 0.0
+        print(f"\n--- 통계 (프레임 #{self._frames_processed}) ---")
+        print(f"현재 감지: {count}개")
+        print(f"평균 FPS: {fps:.2f} (촬영 간격 {self._current_interval():.2f}초)")
+        print(f"실행 시간: {elapsed:.1f}초")
+        print(f"생산 중 제품: {self._active_product or '없음'}")
+        print(f"팬 완료: {self.pan_detector.completed}판, "
+              f"미전달 Firebase {self.journal.pending_count('firebase')}건 / "
+              f"MQTT {self.journal.pending_count('mqtt')}건")
+
+    def get_pipeline_stats(self):
+        """
+        단계별 처리 시간 히스토그램 및 큐 통계
+
+        Returns:
+            dict: {"stages": {이름: 히스토그램}, "queues": {이름: 큐 통계}}
+        """
+        return {
+            "stages": {name: stage.get_stats() for name, stage in self._stages.items()},
+            "queues": {queue.name: queue.get_stats() for queue in self._queues}
+        }
+
+    def _build_pipeline(self):
+        """
+        캡처 → 감지 → 전송 단계와 Firebase 단계를 큐로 연결
+
+        프레임 큐는 PIPELINE_DROP_POLICY(기본: 가장 오래된 프레임 버림)를 따르고,
+        팬 완료 이벤트 큐는 유실이 없도록 항상 block 정책을 사용한다.
+        """
+        frames = StageQueue("frames", PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        results = StageQueue("results", PIPELINE_QUEUE_SIZE, PIPELINE_DROP_POLICY)
+        self._queues = [frames, results, self._firebase_events]
+
+        self._stages = {
+            "capture": PipelineStage(
+                "capture", self._capture_step,
+                output_queue=frames, interval_fn=self._current_interval
+            ),
+            "detect": PipelineStage(
+                "detect", self._detect_step,
+                input_queue=frames, output_queue=results
+            ),
+            "publish": PipelineStage(
+                "publish", self._publish_step,
+                input_queue=results
+            ),
+            "firebase": PipelineStage(
+                "firebase", self._record_batch,
+                input_queue=self._firebase_events
+            ),
+        }
+
+    def _register_jobs(self):
+        """
+        주기 작업 등록 (스트림 연결 중이면 각 폴링 함수가 조회를 생략)
+
+        우선순위가 낮은 숫자일수록 먼저 실행 - 명령 응답이 가장 급하고 통계 출력이 가장 덜 급함.
+        지터는 간격의 SCHEDULER_JITTER 비율 (여러 작업의 HTTP 요청이 한 순간에 몰리지 않게).
+        """
+        jobs = [
+            # (이름, 함수, 간격(초), 시간 제한(초), 우선순위, 첫 실행 지연(초))
+            ("commands", self._poll_commands, COMMAND_POLL_INTERVAL, 10, 0, 0),
+            ("mqtt_replay", self._replay_journal_to_mqtt, MQTT_REPLAY_INTERVAL, 10, 1, 0),
+            ("active_product", self._poll_active_product, ACTIVE_PRODUCT_POLL_INTERVAL, 10, 1, 0),
+            ("status", lambda: self._push_status(self._latest_count), STATUS_PUSH_INTERVAL, 10, 2, 0),
+            ("mqtt_status", self._publish_mqtt_status, MQTT_STATUS_INTERVAL, 10, 2, MQTT_STATUS_INTERVAL),
+            ("settings", self._refresh_settings, SETTINGS_REFRESH_INTERVAL, 10, 3, 0),
+            ("stats", lambda: self._print_stats(self._latest_count), STATS_PRINT_INTERVAL, 5, 4,
+             STATS_PRINT_INTERVAL),
+        ]
+        for name, fn, interval, timeout, priority, delay in jobs:
+            self.scheduler.add_job(name, fn, interval, jitter=interval * SCHEDULER_JITTER,
+                                   timeout=timeout, priority=priority, delay=delay)
+
+    def _register_metrics(self):
+        """
+        지표 레지스트리 등록 (/metrics, /healthz)
+
+        단계 히스토그램 / 큐 / 캡처 / 저널 값은 조회 시점에 읽고,
+        감지 시간 / 감지 개수 / 팬 완료 수만 감지 단계에서 직접 기록한다.
+        """
+        for name, stage in self._stages.items():
+            registry.histogram("edge_stage_duration_seconds", "파이프라인 단계 처리 시간",
+                               labels={"stage": name}, histogram=stage.histogram)
+            registry.counter("edge_stage_errors_total", "파이프라인 단계 처리 오류 수",
+                             labels={"stage": name}, fn=lambda stage=stage: stage.errors)
+        for queue in self._queues:
+            registry.gauge("edge_queue_depth", "단계 사이 큐 깊이",
+                           labels={"queue": queue.name}, fn=queue.depth)
+            registry.counter("edge_queue_dropped_total", "큐에서 버린 항목 수",
+                             labels={"queue": queue.name}, fn=lambda queue=queue: queue.dropped)
+        if self._async:
+            # asyncio 방식은 results 큐 대신 AsyncEdgeRuntime이 전송 대기 결과를 최신 것으로 교체
+            registry.counter("edge_queue_dropped_total", "큐에서 버린 항목 수", labels={"queue": "results"},
+                             fn=lambda: self._async_runtime.publish_dropped if self._async_runtime else 0)
+
+        registry.counter("edge_frames_captured_total", "카메라 캡처 프레임 수",
+                         fn=lambda: self.camera.get_capture_stats()["frames_captured"])
+        registry.counter("edge_frames_dropped_total", "가져가기 전에 새 프레임으로 대체된 카메라 프레임 수",
+                         fn=lambda: self.camera.get_capture_stats()["frames_dropped"])
+        registry.counter("edge_frames_processed_total", "감지 단계를 거친 프레임 수",
+                         fn=lambda: self._frames_processed)
+        registry.gauge("edge_capture_interval_seconds", "현재 촬영 간격 (적응형 / 전력 절약 반영)",
+                       fn=self._current_interval)
+        self._detector_histogram = registry.histogram("edge_detector_duration_seconds",
+                                                      "객체 감지 시간 (모션 게이트 통과 프레임)")
+        self._objects_gauge = registry.gauge("edge_objects_detected", "현재 프레임 감지 개수")
+        self._batches_counter = registry.counter("edge_batches_completed_total", "팬 완료 감지 수")
+
+        # 감지 단계 구성 요소 - 인스턴스마다 등록하지 않고 여기서 1번만 (재생 / 테스트용 인스턴스와 섞이지 않음)
+        registry.counter("edge_motion_gate_checked_total", "모션 게이트 검사 프레임 수",
+                         fn=lambda: self.motion_gate.frames_checked)
+        registry.counter("edge_motion_gate_skipped_total", "모션 게이트가 감지를 생략한 프레임 수",
+                         fn=lambda: self.motion_gate.frames_skipped)
+        registry.histogram("edge_tracker_duration_seconds", "객체 추적 처리 시간",
+                           histogram=self.tracker.histogram)
+        for kind in (ARRIVAL_NEW, ARRIVAL_STACKED):
+            registry.counter("edge_tracker_arrivals_total", "추적으로 센 조각 도착 수",
+                             labels={"kind": kind}, fn=lambda kind=kind: self.tracker.arrivals[kind])
+        registry.gauge("edge_tracker_active_tracks", "추적 중인 조각 수",
+                       fn=lambda: len(self.tracker.tracks))
+        registry.counter("edge_pans_completed_total", "팬 완료 판정 수",
+                         fn=lambda: self.pan_detector.completed)
+        registry.counter("edge_pans_rejected_total", "안정된 갯수가 없어 버린 팬 수",
+                         fn=lambda: self.pan_detector.rejected)
+        registry.counter("edge_pan_dropouts_total", "팬 완료로 보지 않은 짧은 빈 구간 수",
+                         fn=lambda: self.pan_detector.dropouts)
+
+        for sink in ("firebase", "mqtt"):
+            registry.gauge("edge_journal_pending", "생산 저널 미전달 팬 수", labels={"sink": sink},
+                           fn=lambda sink=sink: self.journal.pending_count(sink))
+        registry.counter("edge_journal_unsent_pans_dropped_total",
+                         "디스크 예산 때문에 전달 전에 지운 팬 수 (생산량 유실)",
+                         fn=lambda: self.journal.unsent_pans_dropped)
+        registry.counter("edge_journal_unsent_count_dropped_total",
+                         "디스크 예산 때문에 전달 전에 지운 누룽지 갯수 (생산량 유실)",
+                         fn=lambda: self.journal.unsent_count_dropped)
+
+        for job in self.scheduler.jobs():
+            labels = {"job": job.name}
+            registry.histogram("edge_job_duration_seconds", "주기 작업 실행 시간",
+                               labels=labels, histogram=job.histogram)
+            registry.counter("edge_job_runs_total", "주기 작업 실행 수",
+                             labels=labels, fn=lambda job=job: job.runs)
+            registry.counter("edge_job_errors_total", "주기 작업 오류 수",
+                             labels=labels, fn=lambda job=job: job.errors)
+            registry.counter("edge_job_skipped_total", "이전 실행이 끝나지 않아 건너뛴 회차 수",
+                             labels=labels, fn=lambda job=job: job.skipped)
+            registry.counter("edge_job_overruns_total", "실행 시간이 간격보다 길었던 횟수",
+                             labels=labels, fn=lambda job=job: job.overruns)
+            registry.counter("edge_job_timeouts_total", "실행 시간이 시간 제한보다 길었던 횟수",
+                             labels=labels, fn=lambda job=job: job.timeouts)
+
+        registry.health_check("capture", self._check_capture_health)
+        registry.health_check("pipeline", self._check_pipeline_health)
+        registry.health_check("scheduler", self._check_scheduler_health)
+
+    def _check_capture_health(self):
+        """헬스 체크: 최근에 프레임을 캡처했는지"""
+        timeout = max(HEALTH_FRAME_TIMEOUT, self._current_interval() * 3)
+        if self._last_frame_at is None:
+            # 시작 직후에는 첫 프레임까지 여유를 둠
+            age = time.time() - self._start_time
+            return age < timeout, "아직 캡처한 프레임 없음"
+        age = time.time() - self._last_frame_at
+        return age < timeout, f"마지막 프레임 {age:.1f}초 전"
+
+    def _check_pipeline_health(self):
+        """헬스 체크: 파이프라인 모드에서 단계 워커 스레드가 모두 살아 있는지"""
+        if self._async or not PIPELINE_ENABLED:
+            return True, "asyncio 실행" if self._async else "순차 실행"
+        if not self.running:
+            return True, "시작 전"
+        dead = [name for name, stage in self._stages.items() if not stage.is_alive()]
+        return not dead, f"중단된 단계: {', '.join(dead)}" if dead else "모든 단계 실행 중"
+
+    def _check_scheduler_health(self):
+        """헬스 체크: 시간 제한을 넘겨 멈춰 있는 주기 작업이 없는지"""
+        stuck = self.scheduler.stuck_jobs()
+        if stuck:
+            return False, "멈춘 작업: " + ", ".join(f"{name} ({seconds}초)" for name, seconds in stuck)
+        return True, f"작업 {len(self.scheduler.jobs())}개"
+
+    def _run_serial(self):
+        """단계를 한 스레드에서 순차 실행 (PIPELINE_ENABLED = False)"""
+        stages = self._stages
+        while self.running:
+            loop_start = time.time()
+            interval = self._current_interval()
+
+            start = time.perf_counter()
+            item = self._capture_step()
+            stages["capture"].histogram.observe(time.perf_counter() - start)
+
+            if item is None:
+                time.sleep(interval)
+                continue
+
+            start = time.perf_counter()
+            result = self._detect_step(item)
+            stages["detect"].histogram.observe(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            self._publish_step(result)
+            stages["publish"].histogram.observe(time.perf_counter() - start)
+
+            while True:
+                event = self._firebase_events.get(timeout=0)
+                if event is None:
+                    break
+                start = time.perf_counter()
+                self._record_batch(event)
+                stages["firebase"].histogram.observe(time.perf_counter() - start)
+
+            # 다음 사이클까지 대기
+            sleep_time = max(0, interval - (time.time() - loop_start))
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+
+    def _run_pipelined(self):
+        """단계별 워커 스레드 실행 (메인 스레드는 종료 신호만 대기)"""
+        for stage in self._stages.values():
+            stage.start()
+
+        while self.running:
+            time.sleep(0.5)
+
     def run(self):
         """
         메인 루프 실행
         """
         self.running = True
-        frame_count = 0
-        start_time = time.time()
+        self._start_time = time.time()
 
-        print(f"\n감지 시작 (간격: {self._capture_interval}초)")
+        if self._async:
+            mode = "asyncio"
+        else:
+            mode = "파이프라인" if PIPELINE_ENABLED else "순차"
+        if self.capture_rate.enabled:
+            interval = (f"적응형 {self.capture_rate.min_interval}~"
+                        f"{self.capture_rate.max_interval}초")
+        else:
+            interval = f"{self._capture_interval}초"
+        print(f"\n감지 시작 (간격: {interval}, 실행 방식: {mode})")
         print("종료하려면 Ctrl+C를 누르세요.\n")
 
-        # 시작 시 즉시 activeProduct 조회 및 deviceSettings 로드
-        self._last_product_poll = 0
-
         try:
-            while self.running:
-                loop_start = time.time()
-                frame_count += 1
-                self._frames_total = frame_count
-
-                # 촬영 간격 (Firebase 설정으로 동적 변경 가능)
-                interval = self._capture_interval * (2 if config.POWER_SAVE_MODE else 1)
-
-                # 1. 카메라로 프레임 캡처
-                frame = self.camera.capture_frame()
-
-                if frame is None:
-                    print("⚠️  프레임 캡처 실패")
-                    time.sleep(interval)
-                    continue
-
-                # 2. 객체 감지
-                count, bounding_boxes = self.detector.detect(frame)
-
-                # 2-1. MJPEG 서버에 최신 프레임 전달
-                self._latest_boxes = bounding_boxes
-                self.mjpeg_server.push_frame(frame, bounding_boxes)
-
-                # 3. MQTT 전송 (연결된 경우)
-                if self.mqtt_client.is_connected():
-                    self.mqtt_client.publish_count(count, bounding_boxes)
-
-                    # 캘리브레이션 모드: 3초마다 감지 결과 이미지 전송
-                    if self._calibration_mode:
-                        now = time.time()
-                        if now - self._last_calib_image >= 3.0:
-                            self.mqtt_client.publish_calibration_image(frame, count, bounding_boxes)
-                            self._last_calib_image = now
-
-                # 4. 팬 완료 감지 → Firebase 업데이트
-                batch_count = self._check_batch_complete(count)
-                if batch_count > 0:
-                    active_product = self._refresh_active_product()
-                    if active_product:
-                        ok = firebase_client.increment_production(active_product, batch_count)
-                        if ok:
-                            print(f"   → Firebase 기록 완료: {active_product} +{batch_count}")
-                        else:
-                            print(f"   → Firebase 기록 실패")
-                    else:
-                        print("   → 생산 중인 제품 없음 (zego 웹앱에서 '생산 시작' 필요)")
-
-                # 5. Firebase activeProduct 주기적 갱신 (팬 완료와 무관하게)
-                self._refresh_active_product()
-
-                # 6. Firebase에 장치 상태 주기적 업데이트 (30초마다)
-                self._push_status_if_needed(count)
-
-                # 7. Firebase deviceSettings 주기적 갱신 (5분마다)
-                self._refresh_settings_if_needed()
-
-                # 7-1. Firebase deviceCommands 폴링 (3초마다)
-                self._poll_firebase_commands()
-
-                # 8. 통계 출력 (10초마다)
-                if frame_count % 10 == 0:
-                    elapsed = time.time() - start_time
-                    fps = frame_count / elapsed
-                    print(f"\n--- 통계 (프레임 #{frame_count}) ---")
-                    print(f"현재 감지: {count}개")
-                    print(f"평균 FPS: {fps:.2f}")
-                    print(f"실행 시간: {elapsed:.1f}초")
-                    print(f"생산 중 제품: {self._active_product or '없음'}")
-
-                # 9. MQTT 상태 전송 (1분마다)
-                if frame_count % 60 == 0 and self.mqtt_client.is_connected():
-                    status = self._get_device_status()
-                    self.mqtt_client.publish_status(status)
-
-                # 10. 다음 사이클까지 대기
-                loop_duration = time.time() - loop_start
-                sleep_time = max(0, interval - loop_duration)
-
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+            # 주기 작업은 시작 즉시 1회 실행 (activeProduct / deviceSettings 조회)
+            # asyncio 방식은 이벤트 루프가 스케줄러를 구동
+            if self._async:
+                from async_runtime import AsyncEdgeRuntime
+                self._async_runtime = AsyncEdgeRuntime(self)
+                self._async_runtime.run()
+            elif PIPELINE_ENABLED:
+                self.scheduler.start()
+                self._run_pipelined()
+            else:
+                self.scheduler.start()
+                self._run_serial()
 
         except KeyboardInterrupt:
             print("\n\n사용자가 중단함")
@@ -275,41 +726,64 @@ class NurungjiCounterEdge:
         }
 
         # CPU 온도 (라즈베리 파이 전용)
-        try:
-            with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
-                temp = float(f.read()) / 1000.0
-                status["cpu_temperature"] = round(temp, 1)
-        except:
-            status["cpu_temperature"] = None
+        status["cpu_temperature"] = read_cpu_temperature()
 
         status["battery_level"] = 100
 
+        capture_stats = self.camera.get_capture_stats()
+        status["frames_captured"] = capture_stats["frames_captured"]
+        status["frames_dropped"] = capture_stats["frames_dropped"]
+        status["last_frame_timestamp"] = capture_stats["last_frame_timestamp"]
+
+        gate_stats = self.motion_gate.get_stats()
+        status["motion_skip_ratio"] = gate_stats["skip_ratio"]
+        status["motion_gate_ms"] = gate_stats["gate_cost_ms"]
+
+        interval = self._current_interval()
+        status["capture_interval"] = round(interval, 3)
+        status["capture_rate_fps"] = round(1.0 / interval, 2)
+        status["adaptive_capture"] = self.capture_rate.enabled
+
+        pipeline_stats = self.get_pipeline_stats()
+        for name, stats in pipeline_stats["stages"].items():
+            status[f"{name}_p95_ms"] = stats["p95_ms"]
+        status["pipeline_dropped"] = sum(
+            q["dropped"] for q in pipeline_stats["queues"].values()
+        )
+
+        status["firebase_pending"] = self.journal.pending_count("firebase")
+        status["mqtt_pending"] = self.journal.pending_count("mqtt")
+        status["mqtt_queue_depth"] = self.mqtt_client.get_queue_stats()["depth"]
+
+        http_stats = firebase_client.get_http_stats()
+        status["firebase_p95_ms"] = http_stats["latency"]["p95_ms"]
+        status["firebase_connections"] = http_stats["connections_opened"]
+
         return status
 
-    def _push_status_if_needed(self, current_count):
-        """30초마다 Firebase에 장치 상태 업데이트"""
-        now = time.time()
-        if now - self._last_status_push >= 30:
-            status_info = self._get_device_status()
-            cpu_temp = status_info.get("cpu_temperature")
-            firebase_client.push_device_status(current_count, cpu_temp, self._frames_total)
-            self._last_status_push = now
-
-    def _poll_firebase_commands(self):
-        """3초마다 Firebase deviceCommands 노드를 폴링하여 명령 처리"""
-        now = time.time()
-        if now - self._last_command_poll >= self._command_poll_interval:
-            firebase_client.poll_command(self._on_command)
-            self._last_command_poll = now
-
-    def _refresh_settings_if_needed(self):
-        """5분마다 Firebase deviceSettings를 읽어서 runtime config에 적용"""
-        now = time.time()
-        if now - self._last_settings_refresh >= 300:
-            settings = firebase_client.get_device_settings()
-            if settings:
-                self._apply_device_settings(settings)
-            self._last_settings_refresh = now
+    def _push_status(self, current_count):
+        """Firebase에 장치 상태 1회 업데이트 (쓰기 큐가 있으면 대기열 등록)"""
+        status_info = self._get_device_status()
+        cpu_temp = status_info.get("cpu_temperature")
+        interval = status_info["capture_interval"]
+        if self.firebase_writer is not None:
+            self.firebase_writer.enqueue_status(current_count, cpu_temp, self._frames_total, interval)
+        else:
+            firebase_client.push_device_status(current_count, cpu_temp, self._frames_total, interval)
+
+    def _poll_commands(self):
+        """deviceCommands 1회 폴링 (스트림 연결 중에는 생략)"""
+        if self._stream_connected("deviceCommands"):
+            return
+        firebase_client.poll_command(self._on_firebase_command, self._queue_firebase_update)
+
+    def _refresh_settings(self):
+        """deviceSettings 1회 조회 후 적용 (스트림 연결 중에는 생략)"""
+        if self._stream_connected("deviceSettings"):
+            return
+        settings = firebase_client.get_device_settings()
+        if settings:
+            self._apply_device_settings(settings)
 
     def _apply_device_settings(self, settings):
         """Firebase deviceSettings를 runtime config에 오버라이드"""
@@ -333,12 +807,52 @@ class NurungjiCounterEdge:
                 config.MAX_AREA = val
                 changed.append(f"MAX_AREA={val}")
 
+        if 'DETECTION_ROI' in settings:
+            try:
+                val = normalize_roi(settings['DETECTION_ROI'])
+            except ValueError as e:
+                print(f"[설정] DETECTION_ROI 무시 (형식 오류): {e}")
+            else:
+                if config.DETECTION_ROI != val:
+                    config.DETECTION_ROI = val
+                    changed.append(f"DETECTION_ROI={val}")
+
         if 'CAPTURE_INTERVAL' in settings:
             val = float(settings['CAPTURE_INTERVAL'])
             if self._capture_interval != val:
                 self._capture_interval = val
                 changed.append(f"CAPTURE_INTERVAL={val}")
 
+        if 'ADAPTIVE_CAPTURE_ENABLED' in settings:
+            val = bool(settings['ADAPTIVE_CAPTURE_ENABLED'])
+            if self.capture_rate.enabled != val:
+                self.capture_rate.enabled = val
+                changed.append(f"ADAPTIVE_CAPTURE_ENABLED={val}")
+
+        for key, attr in (('CAPTURE_INTERVAL_MIN', 'min_interval'),
+                          ('CAPTURE_INTERVAL_MAX', 'max_interval')):
+            if key in settings:
+                val = float(settings[key])
+                if getattr(self.capture_rate, attr) != val:
+                    self.capture_rate.set_range(**{attr: val})
+                    changed.append(f"{key}={val}")
+
+        # 적응형 간격 사용 중에는 운영자가 지정한 CAPTURE_INTERVAL을 버리지 않고 간격 상한으로 적용
+        # (CAPTURE_INTERVAL_MAX를 함께 지정하면 그 값 우선)
+        if (self.capture_rate.enabled and 'CAPTURE_INTERVAL' in settings
+                and 'CAPTURE_INTERVAL_MAX' not in settings
+                and self.capture_rate.max_interval != self._capture_interval):
+            self.capture_rate.set_range(max_interval=self._capture_interval)
+            print(f"[설정] 적응형 촬영 간격 사용 중 → CAPTURE_INTERVAL {self._capture_interval}초를 "
+                  f"간격 상한으로 적용")
+            changed.append(f"CAPTURE_INTERVAL_MAX={self._capture_interval}")
+
+        # 추적 / 팬 판정 상태는 감지 단계만 건드리므로 그 스레드에서 프레임 사이에 적용
+        # (update 도중 reset / 파라미터 변경으로 추적 박스가 어긋나거나 팬이 빠지지 않도록)
+        detect_settings = {key: settings[key] for key in DETECT_SETTING_KEYS if key in settings}
+        if detect_settings:
+            self._detect_settings.append(detect_settings)
+
         if 'POWER_SAVE_MODE' in settings:
             val = bool(settings['POWER_SAVE_MODE'])
             if config.POWER_SAVE_MODE != val:
@@ -346,10 +860,39 @@ class NurungjiCounterEdge:
                 changed.append(f"POWER_SAVE_MODE={val}")
 
         if changed:
+            # 감지 파라미터가 바뀌었으므로 다음 프레임은 반드시 다시 감지
+            self.motion_gate.force_next()
             print(f"[설정] Firebase 설정 적용: {', '.join(changed)}")
-        elif DEBUG_MODE:
+        elif DEBUG_MODE and not detect_settings:
             print("[설정] Firebase 설정 변경 없음")
 
+    def _apply_detect_settings(self):
+        """[감지 단계] 대기 중인 추적 / 팬 판정 설정 적용 (감지 단계 스레드에서 프레임 사이에만 호출)"""
+        while self._detect_settings:
+            settings = self._detect_settings.popleft()
+            changed = []
+
+            if 'TRACKING_ENABLED' in settings:
+                val = bool(settings['TRACKING_ENABLED'])
+                if self.tracker.enabled != val:
+                    self.tracker.enabled = val
+                    self.tracker.reset()
+                    changed.append(f"TRACKING_ENABLED={val}")
+
+            try:
+                changed += ["PAN_" + name.upper() for name in self.pan_detector.set_params(
+                    fill_frames=settings.get('PAN_FILL_FRAMES'),
+                    empty_frames=settings.get('PAN_EMPTY_FRAMES'),
+                    window=settings.get('PAN_WINDOW'),
+                    stable_frames=settings.get('PAN_STABLE_FRAMES'),
+                    empty_seconds=settings.get('PAN_EMPTY_SECONDS')
+                )]
+            except (TypeError, ValueError) as e:
+                print(f"[설정] 팬 판정 설정 무시 (형식 오류): {e}")
+
+            if changed:
+                print(f"[설정] Firebase 설정 적용 (감지 단계): {', '.join(changed)}")
+
     def stop(self):
         """
         시스템 종료
@@ -358,9 +901,26 @@ class NurungjiCounterEdge:
 
         self.running = False
 
+        # 파이프라인 단계 / 주기 작업 종료
+        for stage in getattr(self, '_stages', {}).values():
+            stage.stop()
+        if hasattr(self, 'scheduler'):
+            self.scheduler.stop()
+
+        # Firebase 스트리밍 구독 종료
+        for stream in getattr(self, '_streams', {}).values():
+            stream.stop()
+
+        # 미전송 Firebase 쓰기 1회 시도 (남은 항목은 저널에 보존)
+        if getattr(self, 'firebase_writer', None) is not None:
+            self.firebase_writer.stop()
+
         # Firebase에 종료 상태 업데이트
         firebase_client.set_device_stopped()
 
+        if hasattr(self, 'journal'):
+            self.journal.close()
+
         # 컴포넌트 정리
         if hasattr(self, 'camera'):
             self.camera.close()
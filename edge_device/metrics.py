@@ -0,0 +1,246 @@
+"""
+누룽지 생산량 카운팅 시스템 - 런타임 지표 레지스트리
+각 모듈이 카운터 / 게이지 / 지연 시간 히스토그램을 기록하고,
+MJPEG 서버가 /metrics (Prometheus 텍스트 형식) 와 /healthz 로 내보냄
+
+  - 카운터 / 게이지는 값을 직접 기록하거나, 조회 시점에 호출할 함수(fn)를 등록
+    (기존 get_stats() 값을 그대로 쓰는 모듈은 fn 사용 → 기록 비용 없음)
+  - 히스토그램은 pipeline.LatencyHistogram을 그대로 사용 (기존 단계/HTTP 히스토그램을 등록 가능)
+  - 같은 이름 + 라벨로 다시 요청하면 같은 객체 반환 (fn / histogram을 넘기면 기존 항목 교체)
+  - 헬스 체크: fn() → (정상 여부, 설명) - 하나라도 실패하면 /healthz 503
+"""
+
+import threading
+import time
+
+from pipeline import LatencyHistogram
+
+PROCESS_START = time.time()
+
+
+def read_cpu_temperature():
+    """
+    CPU 온도 (라즈베리 파이 전용)
+
+    Returns:
+        float | None: 섭씨 온도 (읽을 수 없으면 None)
+    """
+    try:
+        with open("/sys/class/thermal/thermal_zone0/temp", "r") as f:
+            return round(float(f.read()) / 1000.0, 1)
+    except (OSError, ValueError):
+        return None
+
+
+class Counter:
+    """누적 카운터 (thread-safe)"""
+
+    def __init__(self, fn=None):
+        self._value = 0
+        self._fn = fn
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        if self._fn is not None:
+            return self._fn()
+        return self._value
+
+
+class Gauge(Counter):
+    """현재 값 (thread-safe)"""
+
+    def set(self, value):
+        self._value = value
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+
+class MetricsRegistry:
+    """
+    프로세스 내 지표 저장소 (thread-safe)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}  # 이름 → {"type", "help", "series": {라벨 튜플: 객체}} (등록 순서 유지)
+        self._health_checks = {}
+
+    def _get(self, kind, name, description, labels, create, replace=False):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            family = self._families.setdefault(
+                name, {"type": kind, "help": description, "series": {}}
+            )
+            if family["type"] != kind:
+                raise ValueError(f"지표 종류 불일치: {name} ({family['type']} ≠ {kind})")
+            series = family["series"]
+            if key not in series or replace:
+                series[key] = create()
+            return series[key]
+
+    def counter(self, name, description, labels=None, fn=None):
+        """
+        카운터 등록 / 조회
+
+        Args:
+            name (str): 지표 이름 (Prometheus 규칙: 단위 + _total)
+            description (str): 설명 (# HELP)
+            labels (dict): 라벨
+            fn (callable): 조회 시 값을 반환하는 함수 (None이면 inc()로 기록)
+
+        Returns:
+            Counter
+        """
+        return self._get("counter", name, description, labels, lambda: Counter(fn),
+                         replace=fn is not None)
+
+    def gauge(self, name, description, labels=None, fn=None):
+        """
+        게이지 등록 / 조회 (인자는 counter()와 같음)
+
+        Returns:
+            Gauge
+        """
+        return self._get("gauge", name, description, labels, lambda: Gauge(fn),
+                         replace=fn is not None)
+
+    def histogram(self, name, description, labels=None, histogram=None):
+        """
+        지연 시간 히스토그램 등록 / 조회 (내보낼 때 밀리초 → 초 단위로 변환)
+
+        Args:
+            histogram (LatencyHistogram): 이미 기록 중인 히스토그램 (같은 이름 + 라벨은 교체)
+
+        Returns:
+            LatencyHistogram
+        """
+        if histogram is None:
+            return self._get("histogram", name, description, labels, LatencyHistogram)
+        return self._get("histogram", name, description, labels, lambda: histogram, replace=True)
+
+    def health_check(self, name, fn):
+        """
+        헬스 체크 등록
+
+        Args:
+            name (str): 체크 이름
+            fn (callable): () → (bool 정상 여부, 설명)
+        """
+        with self._lock:
+            self._health_checks[name] = fn
+
+    def health(self):
+        """
+        헬스 체크 실행
+
+        Returns:
+            tuple: (전체 정상 여부, {이름: {"ok", "detail"}})
+        """
+        with self._lock:
+            checks = list(self._health_checks.items())
+        results = {}
+        for name, fn in checks:
+            try:
+                ok, detail = fn()
+            except Exception as e:
+                ok, detail = False, f"체크 오류: {e}"
+            results[name] = {"ok": bool(ok), "detail": detail}
+        return all(r["ok"] for r in results.values()), results
+
+    def render(self):
+        """
+        Prometheus 텍스트 형식 (version 0.0.4)
+
+        Returns:
+            str: /metrics 응답 본문
+        """
+        with self._lock:
+            families = [(name, dict(family), list(family["series"].items()))
+                        for name, family in self._families.items()]
+
+        lines = []
+        for name, family, series in families:
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['type']}")
+            for key, metric in series:
+                if family["type"] == "histogram":
+                    lines.extend(_render_histogram(name, key, metric.snapshot()))
+                    continue
+                try:
+                    value = metric.value
+                except Exception:
+                    continue  # 조회 함수 오류 → 이번 수집에서만 생략
+                if value is None:
+                    continue
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + list(extra or [])
+    if not pairs:
+        return ""
+    body = ",".join(
+        f'{k}="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def _render_histogram(name, key, snapshot):
+    lines = []
+    for bound, cumulative in snapshot["buckets"].items():
+        le = "+Inf" if bound == "+Inf" else _format_value(bound / 1000.0)
+        lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(snapshot['sum_ms'] / 1000.0)}")
+    lines.append(f"{name}_count{_format_labels(key)} {snapshot['count']}")
+    return lines
+
+
+# 전역 레지스트리 (각 모듈이 import해서 기록)
+registry = MetricsRegistry()
+
+registry.gauge("edge_cpu_temperature_celsius", "CPU 온도", fn=read_cpu_temperature)
+registry.gauge("edge_uptime_seconds", "프로세스 실행 시간", fn=lambda: round(time.time() - PROCESS_START, 1))
+
+
+# 테스트 코드: 지표 기록 후 Prometheus 텍스트 출력 + 기록 비용 측정
+if __name__ == "__main__":
+    print("지표 레지스트리 테스트 시작...")
+
+    frames = registry.counter("edge_demo_frames_total", "처리한 프레임 수")
+    depth = registry.gauge("edge_demo_queue_depth", "큐 깊이", labels={"queue": "frames"})
+    latency = registry.histogram("edge_demo_duration_seconds", "처리 시간", labels={"stage": "detect"})
+    registry.gauge("edge_demo_queue_depth", "큐 깊이", labels={"queue": "results"}, fn=lambda: 3)
+    registry.health_check("demo", lambda: (frames.value > 0, f"프레임 {frames.value}"))
+
+    ROUNDS = 100000
+    start = time.perf_counter()
+    for i in range(ROUNDS):
+        frames.inc()
+        depth.set(i % 4)
+        latency.observe((i % 50) / 1000.0)
+    cost_us = (time.perf_counter() - start) * 1e6 / ROUNDS
+
+    start = time.perf_counter()
+    text = registry.render()
+    render_ms = (time.perf_counter() - start) * 1000
+
+    print(text)
+    print(f"헬스 체크: {registry.health()}")
+    print(f"기록 비용 (카운터 + 게이지 + 히스토그램): {cost_us:.2f} us/프레임")
+    print(f"/metrics 생성: {render_ms:.2f} ms ({len(text)} bytes)")
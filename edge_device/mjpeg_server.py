@@ -5,56 +5,321 @@
 엔드포인트:
   GET /stream   → multipart/x-mixed-replace MJPEG 스트림
   GET /snapshot → 최신 프레임 JPEG 1장
+  GET /metrics  → 런타임 지표 (Prometheus 텍스트 형식, metrics.registry)
+  GET /healthz  → 헬스 체크 JSON (실패한 체크가 있으면 503)
+
+쿼리 파라미터 (선택, 예: /stream?w=640&q=50&fps=2):
+  w   - 출력 너비 (px, 비율 유지 축소 / 원본보다 크면 원본 크기)
+  q   - JPEG 품질 (10~95, 기본 75)
+  fps - 시청자별 최대 전송 속도 (/stream 전용, 기본 제한 없음)
+
+인코딩은 필요할 때만 (시청자가 없으면 push_frame은 원본 프레임 참조만 저장):
+  - 시청자가 있으면 전송 스레드가 새 프레임마다 (w, q) 조합별로 1회 인코딩 → 같은 조합의 시청자에게 같은 JPEG 전달
+  - fps 제한으로 이번 프레임을 받을 시청자가 없는 조합은 인코딩하지 않음
+  - /snapshot 은 요청 시 최신 원본 프레임에서 인코딩 (같은 프레임 / 같은 조합이면 캐시 재사용)
+
+원본 프레임도 필요할 때만 (lores 감지 모드에서 메인 해상도 추출 비용 절약):
+  - 캡처 쪽은 wants_frames()가 True일 때만 메인 프레임을 추출해 push_frame (시청자 있음 / 최근 스냅샷 요청)
+  - /snapshot 은 최신 원본이 MJPEG_SNAPSHOT_MAX_AGE초보다 오래됐으면 새 프레임을 요청하고 잠시 대기
+
+요청마다 별도 스레드 (ThreadingHTTPServer) - 스트림 시청 중에도 다른 요청이 막히지 않음
+시청자별 전송 큐는 가득 차면 오래된 프레임을 버림 (느린 시청자가 다른 시청자/캡처를 막지 않음)
+
+asyncio 실행 방식 (EDGE_RUNTIME = "asyncio")에서는 start() 대신 serve_async()로
+같은 엔드포인트를 이벤트 루프의 코루틴으로 제공 (시청자/요청마다 스레드를 만들지 않음)
 """
 
+import asyncio
 import io
+import json
 import threading
 import time
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 import cv2
 import numpy as np
 
+from config import (
+    MJPEG_MAX_CLIENTS,
+    MJPEG_CLIENT_QUEUE_SIZE,
+    MJPEG_SNAPSHOT_MAX_AGE,
+    MJPEG_SNAPSHOT_WAIT,
+    MJPEG_SNAPSHOT_HOLD
+)
+from metrics import registry
+from pipeline import StageQueue
+
 MJPEG_PORT = 8080
 STREAM_BOUNDARY = b"--mjpeg-boundary"
 
+DEFAULT_QUALITY = 75
+MIN_WIDTH = 64
+QUALITY_RANGE = (10, 95)
+MAX_FPS = 30.0
+
+
+def parse_variant(query):
+    """
+    쿼리 문자열 → 스트림 변형 (잘못된 값은 기본값, 범위 밖 값은 범위 안으로 조정)
+
+    Args:
+        query (str): URL 쿼리 문자열 (예: "w=640&q=50&fps=2")
+
+    Returns:
+        tuple: (width | None, quality, fps | None) - width None이면 원본 크기, fps None이면 제한 없음
+    """
+    params = parse_qs(query)
+
+    def number(name, cast):
+        try:
+            return cast(params[name][0])
+        except (KeyError, IndexError, ValueError):
+            return None
+
+    width = number("w", int)
+    if width is not None:
+        width = max(width, MIN_WIDTH)
+
+    quality = number("q", int)
+    quality = DEFAULT_QUALITY if quality is None else min(max(quality, QUALITY_RANGE[0]), QUALITY_RANGE[1])
+
+    fps = number("fps", float)
+    if fps is not None:
+        fps = min(fps, MAX_FPS) if fps > 0 else None
+
+    return width, quality, fps
+
+
+class StreamClient:
+    """시청자 1명 - 전송 큐 + 요청한 변형 (width, quality) + 전송 간격"""
+
+    def __init__(self, name, width=None, quality=DEFAULT_QUALITY, fps=None):
+        self.queue = StageQueue(name, MJPEG_CLIENT_QUEUE_SIZE, drop_policy="drop_oldest")
+        self.variant = (width, quality)
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_due = 0.0
+        self.wakeup = None  # asyncio 실행 방식: 새 JPEG가 들어오면 호출 (전송 코루틴 깨우기)
+
+    def due(self, now):
+        """이번 프레임을 받을 차례인지 (fps 제한) - 차례면 다음 전송 시각 예약"""
+        if now < self.next_due:
+            return False
+        self.next_due += self.interval
+        if self.next_due <= now:
+            # 처음 / 오래 밀림 → 몰아 보내지 않도록 현재 시각 기준으로 다시 예약
+            self.next_due = now + self.interval
+        return True
+
 
 class FrameBuffer:
-    """최신 프레임(JPEG bytes)을 thread-safe하게 보관"""
+    """
+    최신 원본 프레임 참조 + 인코딩된 JPEG 캐시를 thread-safe하게 보관
+
+    push_frame(캡처 스레드)은 참조만 바꾸고, JPEG 인코딩은 get_jpeg()를 호출한
+    전송 스레드 / 스냅샷 핸들러에서 프레임당 (width, quality, overlay) 조합별 1회만 수행한다.
+    """
 
     def __init__(self):
         self._lock = threading.Lock()
-        self._jpeg = None
         self._condition = threading.Condition(self._lock)
+        self._encode_lock = threading.Lock()
+        self._frame = None       # (frame, boxes) 최신 원본
+        self._sequence = 0       # 원본 프레임 번호
+        self._frame_time = None  # 최신 원본을 받은 시각 (monotonic)
+        self._wanted_until = 0.0  # 스냅샷 요청 후 원본 프레임을 계속 받을 시각 (monotonic)
+        self._jpegs = {}         # 최신 프레임의 JPEG 캐시 {(width, quality, overlay): jpeg}
+        self._jpegs_sequence = -1
+        self._clients = []       # 시청자 (StreamClient)
+        self.viewers = 0
+        self.max_clients = MJPEG_MAX_CLIENTS
+
+        # 통계: 시청자 수별 프레임 수 / CPU 사용 시간
+        self.frames_pushed = 0
+        self.encodes = 0
+        self._encodes_by_variant = {}
+        self.client_frames_dropped = 0  # 연결이 끝난 시청자들의 누적 버림 수
+        self.clients_rejected = 0
+        self._clients_total = 0
+        self._cpu_by_viewers = {}
+        self.encode_histogram = registry.histogram("edge_mjpeg_encode_duration_seconds",
+                                                   "MJPEG JPEG 인코딩 시간")
+        registry.gauge("edge_mjpeg_viewers", "MJPEG 스트림 시청자 수", fn=lambda: self.viewers)
+        registry.counter("edge_mjpeg_encodes_total", "MJPEG JPEG 인코딩 횟수", fn=lambda: self.encodes)
+
+    def _account(self, cpu_seconds, frames=0, encodes=0):
+        """시청자 수별 CPU 시간 누적 - 잠금을 잡은 상태에서 호출"""
+        entry = self._cpu_by_viewers.setdefault(
+            self.viewers, {"frames": 0, "encodes": 0, "cpu_ms": 0.0}
+        )
+        entry["frames"] += frames
+        entry["encodes"] += encodes
+        entry["cpu_ms"] += cpu_seconds * 1000
 
-    def update(self, jpeg_bytes):
+    def update(self, frame, boxes):
+        """최신 원본 프레임 교체 (인코딩하지 않음)"""
+        start = time.thread_time()
         with self._condition:
-            self._jpeg = jpeg_bytes
+            self._frame = (frame, boxes)
+            self._frame_time = time.monotonic()
+            self._sequence += 1
+            self.frames_pushed += 1
             self._condition.notify_all()
+            self._account(time.thread_time() - start, frames=1)
 
-    def get_latest(self):
-        with self._lock:
-            return self._jpeg
+    def get_jpeg(self, overlay, width=None, quality=DEFAULT_QUALITY):
+        """
+        최신 프레임의 JPEG (같은 프레임 / 같은 조합이면 캐시 재사용)
+
+        Args:
+            overlay (bool): 바운딩 박스 오버레이 여부
+            width (int): 출력 너비 (None이면 원본 크기)
+            quality (int): JPEG 품질
+
+        Returns:
+            bytes | None: JPEG bytes (아직 프레임이 없으면 None)
+        """
+        key = (width, quality, overlay)
+        with self._encode_lock:
+            with self._lock:
+                if self._frame is None:
+                    return None
+                if self._jpegs_sequence != self._sequence:
+                    self._jpegs = {}  # 새 프레임 → 이전 프레임의 변형 전부 폐기
+                    self._jpegs_sequence = self._sequence
+                elif key in self._jpegs:
+                    return self._jpegs[key]
+                frame, boxes = self._frame
+                sequence = self._sequence
+
+            start = time.thread_time()
+            wall_start = time.perf_counter()
+            jpeg = encode_frame(frame, boxes, overlay, width, quality)
+            cpu = time.thread_time() - start
+            self.encode_histogram.observe(time.perf_counter() - wall_start)
+
+            with self._lock:
+                if jpeg and self._jpegs_sequence == sequence:
+                    self._jpegs[key] = jpeg
+                self.encodes += 1
+                variant = f"{width or 'full'}/q{quality}"
+                self._encodes_by_variant[variant] = self._encodes_by_variant.get(variant, 0) + 1
+                self._account(cpu, encodes=1)
+            return jpeg
+
+    def wants_frames(self):
+        """원본 프레임이 필요한지 (시청자가 있거나 최근 스냅샷 요청이 있었음)"""
+        return self.viewers > 0 or time.monotonic() < self._wanted_until
+
+    def request_fresh(self, max_age=MJPEG_SNAPSHOT_MAX_AGE, timeout=MJPEG_SNAPSHOT_WAIT):
+        """
+        스냅샷용 최신 원본 확보 - max_age초보다 오래됐으면 새 프레임을 요청하고 최대 timeout초 대기
+        (시간 초과 시 있는 프레임 그대로 사용, 요청 후 MJPEG_SNAPSHOT_HOLD초 동안은 계속 원본을 받음)
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._wanted_until = now + MJPEG_SNAPSHOT_HOLD
+            if self._frame_time is not None and now - self._frame_time <= max_age:
+                return
+            sequence = self._sequence
+            self._condition.wait_for(lambda: self._sequence != sequence, timeout=timeout)
+
+    def wait_for_next(self, last_sequence, timeout=5.0):
+        """
+        last_sequence 이후의 새 프레임 대기
 
-    def wait_for_next(self, timeout=5.0):
+        Returns:
+            int: 최신 프레임 번호 (시간 초과 시 last_sequence 그대로)
+        """
         with self._condition:
-            self._condition.wait(timeout=timeout)
-            return self._jpeg
+            self._condition.wait_for(lambda: self._sequence != last_sequence, timeout=timeout)
+            return self._sequence
+
+    def register_client(self, width=None, quality=DEFAULT_QUALITY, fps=None):
+        """
+        시청자 등록
+
+        Args:
+            width (int): 출력 너비 (None이면 원본 크기)
+            quality (int): JPEG 품질
+            fps (float): 최대 전송 속도 (None이면 새 프레임마다)
+
+        Returns:
+            StreamClient | None: 시청자 (시청자 수 상한 초과 시 None)
+        """
+        with self._lock:
+            if len(self._clients) >= self.max_clients:
+                self.clients_rejected += 1
+                return None
+            self._clients_total += 1
+            client = StreamClient(f"mjpeg-client-{self._clients_total}", width, quality, fps)
+            self._clients.append(client)
+            self.viewers = len(self._clients)
+            return client
+
+    def unregister_client(self, client):
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+            self.viewers = len(self._clients)
+            self.client_frames_dropped += client.queue.dropped
+
+    def due_clients(self, now):
+        """
+        이번 프레임을 받을 시청자를 변형별로 묶음 (fps 제한으로 건너뛰는 시청자 제외)
+
+        Returns:
+            dict: {(width, quality): [StreamClient, ...]}
+        """
+        groups = {}
+        with self._lock:
+            for client in self._clients:
+                if client.due(now):
+                    groups.setdefault(client.variant, []).append(client)
+        return groups
+
+    def get_stats(self):
+        """
+        시청자 수 / 인코딩 횟수 / 시청자 수별 CPU 사용 시간
+
+        Returns:
+            dict: by_viewers[n] = {"frames", "encodes", "cpu_ms", "cpu_ms_per_frame"}
+        """
+        with self._lock:
+            by_viewers = {}
+            for viewers, entry in sorted(self._cpu_by_viewers.items()):
+                by_viewers[viewers] = dict(entry)
+                by_viewers[viewers]["cpu_ms"] = round(entry["cpu_ms"], 2)
+                by_viewers[viewers]["cpu_ms_per_frame"] = (
+                    round(entry["cpu_ms"] / entry["frames"], 3) if entry["frames"] else None
+                )
+            return {
+                "viewers": self.viewers,
+                "frames_pushed": self.frames_pushed,
+                "encodes": self.encodes,
+                "encodes_by_variant": dict(self._encodes_by_variant),
+                "frames_dropped": self.client_frames_dropped + sum(c.queue.dropped for c in self._clients),
+                "clients_rejected": self.clients_rejected,
+                "by_viewers": by_viewers
+            }
 
 
 # 전역 프레임 버퍼 (mjpeg_server 모듈 내에서 공유)
 frame_buffer = FrameBuffer()
 
 
-def encode_frame(frame, boxes, show_overlay):
+def encode_frame(frame, boxes, show_overlay, width=None, quality=DEFAULT_QUALITY):
     """
     numpy RGB 프레임을 JPEG bytes로 인코딩.
     show_overlay=True 이면 바운딩 박스 + 개수 오버레이 추가.
+    width가 원본보다 작으면 비율을 유지해 축소한 뒤 오버레이를 그림 (박스 좌표도 같은 비율로 변환).
 
     Args:
         frame (numpy.ndarray): RGB 이미지
         boxes (list): 감지된 바운딩 박스 목록
         show_overlay (bool): 오버레이 표시 여부
+        width (int): 출력 너비 (None이면 원본 크기)
+        quality (int): JPEG 품질
 
     Returns:
         bytes | None: JPEG bytes
@@ -63,25 +328,33 @@ def encode_frame(frame, boxes, show_overlay):
         return None
 
     try:
+        # 축소 먼저 (색 변환/인코딩할 픽셀 수 감소)
+        scale = 1.0
+        if width and width < frame.shape[1]:
+            scale = width / frame.shape[1]
+            height = max(1, round(frame.shape[0] * scale))
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
         # RGB → BGR (OpenCV)
         bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
 
-        if show_overlay and boxes:
+        if show_overlay and len(boxes):
             for obj in boxes:
-                x, y, w, h = obj["x"], obj["y"], obj["w"], obj["h"]
+                x, y = int(obj["x"] * scale), int(obj["y"] * scale)
+                w, h = int(obj["w"] * scale), int(obj["h"] * scale)
                 cv2.rectangle(bgr, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                label = f"{obj.get('area', '')} px²"
+                label = f"{obj['area']} px²"
                 cv2.putText(bgr, label, (x, max(y - 6, 10)),
                             cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1,
                             cv2.LINE_AA)
 
         if show_overlay:
-            count_text = f"Count: {len(boxes) if boxes else 0}"
+            count_text = f"Count: {len(boxes)}"
             cv2.putText(bgr, count_text, (10, 36),
                         cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 2,
                         cv2.LINE_AA)
 
-        ok, buf = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, 75])
+        ok, buf = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
         if not ok:
             return None
         return buf.tobytes()
@@ -103,26 +376,39 @@ class MJPEGHandler(BaseHTTPRequestHandler):
         pass
 
     def do_GET(self):
-        if self.path in ("/stream", "/stream/"):
-            self._handle_stream()
-        elif self.path in ("/snapshot", "/snapshot/"):
-            self._handle_snapshot()
+        url = urlsplit(self.path)
+        variant = parse_variant(url.query)
+        if url.path in ("/stream", "/stream/"):
+            self._handle_stream(*variant)
+        elif url.path in ("/snapshot", "/snapshot/"):
+            self._handle_snapshot(*variant[:2])
+        elif url.path == "/metrics":
+            self._send_body(200, "text/plain; version=0.0.4; charset=utf-8",
+                            registry.render().encode("utf-8"))
+        elif url.path == "/healthz":
+            ok, checks = registry.health()
+            body = json.dumps({"status": "ok" if ok else "fail", "checks": checks}, ensure_ascii=False)
+            self._send_body(200 if ok else 503, "application/json; charset=utf-8", body.encode("utf-8"))
         else:
             self.send_error(404)
 
-    def _handle_stream(self):
-        self.send_response(200)
-        self.send_header("Content-Type",
-                         f"multipart/x-mixed-replace; boundary=mjpeg-boundary")
-        self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
-        self.send_header("Access-Control-Allow-Origin", "*")
-        self.end_headers()
+    def _handle_stream(self, width, quality, fps):
+        client = frame_buffer.register_client(width, quality, fps)
+        if client is None:
+            self.send_error(503, "Too many stream clients")
+            return
 
         try:
+            self.send_response(200)
+            self.send_header("Content-Type",
+                             f"multipart/x-mixed-replace; boundary=mjpeg-boundary")
+            self.send_header("Cache-Control", "no-cache, no-store, must-revalidate")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+
             while True:
-                jpeg = frame_buffer.wait_for_next(timeout=5.0)
+                jpeg = client.queue.get(timeout=5.0)
                 if jpeg is None:
-                    time.sleep(0.1)
                     continue
 
                 header = (
@@ -137,9 +423,20 @@ class MJPEGHandler(BaseHTTPRequestHandler):
                     break
         except Exception:
             pass
+        finally:
+            frame_buffer.unregister_client(client)
+
+    def _send_body(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
 
-    def _handle_snapshot(self):
-        jpeg = frame_buffer.get_latest()
+    def _handle_snapshot(self, width, quality):
+        frame_buffer.request_fresh()
+        jpeg = frame_buffer.get_jpeg(self.get_calibration_mode(), width, quality)
         if jpeg is None:
             self.send_error(503, "No frame available yet")
             return
@@ -178,6 +475,13 @@ class MJPEGServer:
         self._get_latest_boxes = get_latest_boxes or (lambda: [])
         self._server = None
         self._thread = None
+        self._broadcaster = None
+        self._stop_event = threading.Event()
+        # asyncio 실행 방식
+        self._loop = None
+        self._executor = None
+        self._frame_event = None
+        self._async_server = None
 
     def start(self):
         """백그라운드 스레드에서 HTTP 서버 시작"""
@@ -189,34 +493,309 @@ class MJPEGServer:
         MJPEGHandler.get_latest_boxes = staticmethod(get_boxes)
 
         try:
-            self._server = HTTPServer(("0.0.0.0", MJPEG_PORT), MJPEGHandler)
+            self._server = ThreadingHTTPServer(("0.0.0.0", MJPEG_PORT), MJPEGHandler)
+            self._server.daemon_threads = True
             self._thread = threading.Thread(
                 target=self._server.serve_forever,
                 daemon=True,
                 name="mjpeg-server"
             )
             self._thread.start()
+            self._stop_event.clear()
+            self._broadcaster = threading.Thread(
+                target=self._broadcast_loop,
+                daemon=True,
+                name="mjpeg-broadcast"
+            )
+            self._broadcaster.start()
             print(f"[MJPEG] 스트리밍 서버 시작 → http://0.0.0.0:{MJPEG_PORT}/stream")
+            print(f"[MJPEG] 런타임 지표 → http://0.0.0.0:{MJPEG_PORT}/metrics, /healthz")
         except OSError as e:
             print(f"[MJPEG] 서버 시작 실패 (포트 {MJPEG_PORT} 사용 중?): {e}")
 
+    def _broadcast_loop(self):
+        """[전송 스레드] 새 프레임마다 이번에 받을 시청자의 변형별로 1회 인코딩 후 전달"""
+        sequence = 0
+        while not self._stop_event.is_set():
+            latest = frame_buffer.wait_for_next(sequence, timeout=0.5)
+            if latest == sequence:
+                continue
+            sequence = latest
+            if frame_buffer.viewers == 0:
+                continue
+            overlay = self._get_calibration_mode()
+            for (width, quality), clients in frame_buffer.due_clients(time.monotonic()).items():
+                jpeg = frame_buffer.get_jpeg(overlay, width, quality)
+                if jpeg:
+                    for client in clients:
+                        client.queue.put(jpeg)
+
     def push_frame(self, frame, boxes=None):
         """
         최신 프레임을 버퍼에 업데이트 (메인 루프에서 매 캡처 후 호출)
+        원본 참조만 저장하고 JPEG 인코딩은 시청자/스냅샷 요청이 있을 때 핸들러 스레드에서 수행
 
         Args:
             frame (numpy.ndarray): RGB 이미지
-            boxes (list): 감지된 바운딩 박스 목록 (None 이면 빈 리스트)
+            boxes (list | numpy.ndarray): 감지된 바운딩 박스 목록 (None 이면 빈 리스트)
         """
         if frame is None:
             return
-        overlay = self._get_calibration_mode()
-        jpeg = encode_frame(frame, boxes or [], overlay)
-        if jpeg:
-            frame_buffer.update(jpeg)
+        frame_buffer.update(frame, boxes if boxes is not None else [])
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._frame_event.set)
+
+    def wants_frames(self):
+        """
+        메인 해상도 프레임을 push_frame 해야 하는지 (시청자 / 최근 스냅샷 요청이 없으면 추출 생략 가능)
+
+        Returns:
+            bool: FrameBuffer.wants_frames() 참고
+        """
+        return frame_buffer.wants_frames()
+
+    def get_stats(self):
+        """
+        스트리밍 통계 (시청자가 없을 때 CPU 사용이 0에 가까운지 확인용)
+
+        Returns:
+            dict: FrameBuffer.get_stats() 참고
+        """
+        return frame_buffer.get_stats()
 
     def stop(self):
         """서버 종료"""
+        self._stop_event.set()
         if self._server:
             self._server.shutdown()
             print("[MJPEG] 서버 종료")
+        if self._async_server is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._async_server.close)
+
+    # ------------------------------------------------------------------
+    # asyncio 실행 방식
+    # ------------------------------------------------------------------
+
+    async def serve_async(self, executor=None):
+        """
+        [asyncio 실행 방식] 실행 중인 이벤트 루프에서 HTTP 서버 + 전송 코루틴 실행 (취소될 때까지)
+
+        Args:
+            executor (concurrent.futures.Executor): JPEG 인코딩 / 지표 수집용 (None이면 루프 기본값)
+        """
+        self._loop = asyncio.get_running_loop()
+        self._executor = executor
+        self._frame_event = asyncio.Event()
+        try:
+            self._async_server = await asyncio.start_server(self._handle_async, "0.0.0.0", MJPEG_PORT)
+        except OSError as e:
+            print(f"[MJPEG] 서버 시작 실패 (포트 {MJPEG_PORT} 사용 중?): {e}")
+            return
+        port = self._async_server.sockets[0].getsockname()[1]
+        print(f"[MJPEG] 스트리밍 서버 시작 (asyncio) → http://0.0.0.0:{port}/stream")
+        print(f"[MJPEG] 런타임 지표 → http://0.0.0.0:{port}/metrics, /healthz")
+
+        broadcaster = asyncio.ensure_future(self._broadcast_async())
+        try:
+            async with self._async_server:
+                await self._async_server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            broadcaster.cancel()
+            self._loop = None
+            print("[MJPEG] 서버 종료")
+
+    async def _run_blocking(self, fn, *args):
+        return await self._loop.run_in_executor(self._executor, fn, *args)
+
+    async def _broadcast_async(self):
+        """[전송 코루틴] _broadcast_loop()와 같은 동작 - 인코딩만 executor에서 수행"""
+        while True:
+            await self._frame_event.wait()
+            self._frame_event.clear()
+            if frame_buffer.viewers == 0:
+                continue
+            overlay = self._get_calibration_mode()
+            for (width, quality), clients in frame_buffer.due_clients(time.monotonic()).items():
+                jpeg = await self._run_blocking(frame_buffer.get_jpeg, overlay, width, quality)
+                if not jpeg:
+                    continue
+                for client in clients:
+                    client.queue.put(jpeg)
+                    if client.wakeup is not None:
+                        client.wakeup()
+
+    async def _handle_async(self, reader, writer):
+        """[요청 코루틴] 요청 1개 처리 (MJPEGHandler.do_GET 과 같은 경로)"""
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+            while True:  # 헤더는 사용하지 않음
+                line = await asyncio.wait_for(reader.readline(), timeout=10)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2 or parts[0] != "GET":
+                await self._write_response(writer, 405, "text/plain", b"Method Not Allowed")
+                return
+
+            url = urlsplit(parts[1])
+            variant = parse_variant(url.query)
+            if url.path in ("/stream", "/stream/"):
+                await self._stream_async(writer, *variant)
+            elif url.path in ("/snapshot", "/snapshot/"):
+                await self._run_blocking(frame_buffer.request_fresh)
+                jpeg = await self._run_blocking(
+                    frame_buffer.get_jpeg, self._get_calibration_mode(), *variant[:2]
+                )
+                if jpeg is None:
+                    await self._write_response(writer, 503, "text/plain", b"No frame available yet")
+                else:
+                    await self._write_response(writer, 200, "image/jpeg", jpeg)
+            elif url.path == "/metrics":
+                text = await self._run_blocking(registry.render)
+                await self._write_response(writer, 200, "text/plain; version=0.0.4; charset=utf-8",
+                                           text.encode("utf-8"))
+            elif url.path == "/healthz":
+                ok, checks = await self._run_blocking(registry.health)
+                body = json.dumps({"status": "ok" if ok else "fail", "checks": checks}, ensure_ascii=False)
+                await self._write_response(writer, 200 if ok else 503,
+                                           "application/json; charset=utf-8", body.encode("utf-8"))
+            else:
+                await self._write_response(writer, 404, "text/plain", b"Not Found")
+        except (asyncio.TimeoutError, ConnectionError, OSError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write_response(self, writer, status, content_type, body):
+        reason = {200: "OK", 404: "Not Found", 405: "Method Not Allowed",
+                  503: "Service Unavailable"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + body
+        )
+        await writer.drain()
+
+    async def _stream_async(self, writer, width, quality, fps):
+        client = frame_buffer.register_client(width, quality, fps)
+        if client is None:
+            await self._write_response(writer, 503, "text/plain", b"Too many stream clients")
+            return
+
+        ready = asyncio.Event()
+        client.wakeup = ready.set
+        try:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: multipart/x-mixed-replace; boundary=mjpeg-boundary\r\n"
+                b"Cache-Control: no-cache, no-store, must-revalidate\r\n"
+                b"Access-Control-Allow-Origin: *\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            await writer.drain()
+            while True:
+                await ready.wait()
+                ready.clear()
+                while True:
+                    jpeg = client.queue.get(timeout=0)
+                    if jpeg is None:
+                        break
+                    writer.write(
+                        STREAM_BOUNDARY + b"\r\n"
+                        b"Content-Type: image/jpeg\r\n"
+                        b"Content-Length: " + str(len(jpeg)).encode() + b"\r\n\r\n"
+                        + jpeg + b"\r\n"
+                    )
+                    # 느린 시청자는 여기서만 기다림 (그동안 들어온 프레임은 전송 큐에서 오래된 것부터 버림)
+                    await writer.drain()
+        finally:
+            frame_buffer.unregister_client(client)
+
+
+# 테스트 코드: 동시 시청자 12명 (원본 8명 중 1명은 느린 시청자, 640px q50 4명 중 1명은 2fps 제한)
+#             + 스트리밍 중 스냅샷 응답 확인
+if __name__ == "__main__":
+    import urllib.error
+    import urllib.request
+
+    MJPEG_PORT = 0  # 빈 포트 사용
+    CLIENTS = 12
+    FRAMES = 50
+    server = MJPEGServer()
+    server.start()
+    url = f"http://127.0.0.1:{server._server.server_address[1]}"
+    frame = np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8)
+
+    print(f"MJPEG 다중 시청자 테스트 시작... (1920x1080, 시청자 {CLIENTS}명, {FRAMES}프레임)")
+
+    # 시청자 0명: 참조만 교체
+    for _ in range(10):
+        server.push_frame(frame, [])
+        time.sleep(0.02)
+
+    stop = threading.Event()
+    received = [0] * CLIENTS
+    received_bytes = [0] * CLIENTS
+    queries = [""] * 8 + ["?w=640&q=50"] * 3 + ["?w=640&q=50&fps=2"]
+
+    def watch(index, slow):
+        try:
+            stream = urllib.request.urlopen(f"{url}/stream{queries[index]}", timeout=5)
+            while not stop.is_set():
+                line = stream.readline()
+                if not line:
+                    break
+                if line.startswith(b"Content-Length:"):
+                    stream.readline()
+                    received_bytes[index] += len(stream.read(int(line.split(b":")[1])))
+                    received[index] += 1
+                    if slow:
+                        time.sleep(0.5)  # 느린 시청자
+            stream.close()
+        except (OSError, ValueError):
+            pass
+
+    watchers = [threading.Thread(target=watch, args=(i, i == 0), daemon=True)
+                for i in range(CLIENTS)]
+    for t in watchers:
+        t.start()
+    time.sleep(0.5)
+
+    snapshot_ms = []
+    for i in range(FRAMES):
+        server.push_frame(frame, [])
+        if i % 10 == 0:
+            start = time.perf_counter()
+            urllib.request.urlopen(f"{url}/snapshot", timeout=5).read()
+            snapshot_ms.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.05)
+    time.sleep(0.5)
+
+    # 상한 초과 시청자는 503
+    frame_buffer.max_clients = CLIENTS
+    try:
+        urllib.request.urlopen(f"{url}/stream", timeout=5)
+        rejected = "아니오"
+    except urllib.error.HTTPError as e:
+        rejected = f"예 (HTTP {e.code})"
+
+    stats = server.get_stats()
+    print(f"프레임 {stats['frames_pushed']}, 인코딩 {stats['encodes']}회 "
+          f"(시청자 수와 무관하게 프레임당 변형별 1회: {stats['encodes_by_variant']})")
+    print(f"시청자별 수신 프레임: 원본 {min(received[1:8])}~{max(received[1:8])}, "
+          f"느린 시청자 {received[0]} (버림 {stats['frames_dropped']}), "
+          f"640px {min(received[8:11])}~{max(received[8:11])}, 640px 2fps {received[11]}")
+    print(f"프레임당 크기: 원본 {received_bytes[1] // max(received[1], 1) / 1024:.0f} KB, "
+          f"640px q50 {received_bytes[8] // max(received[8], 1) / 1024:.0f} KB")
+    print(f"스트리밍 중 스냅샷 응답: 최대 {max(snapshot_ms):.1f} ms")
+    print(f"상한 초과 연결 거부: {rejected}")
+    for viewers, entry in stats["by_viewers"].items():
+        print(f"시청자 {viewers}명: 프레임당 CPU {entry['cpu_ms_per_frame']} ms")
+
+    stop.set()
+    server.stop()
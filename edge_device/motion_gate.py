@@ -0,0 +1,156 @@
+"""
+누룽지 생산량 카운팅 시스템 - 모션 게이트 모듈
+축소 프레임 차분으로 장면 변화를 싸게 판단하여, 변화가 없으면 객체 감지를 생략
+"""
+
+import time
+
+import cv2
+from config import (
+    MOTION_GATE_ENABLED,
+    MOTION_GATE_WIDTH,
+    MOTION_PIXEL_DELTA,
+    MOTION_CHANGED_RATIO,
+    MOTION_FORCE_EVERY
+)
+
+
+class MotionGate:
+    """
+    프레임 변화 감지 게이트
+
+    마지막으로 감지를 수행한 프레임(기준 프레임)과 현재 프레임을 축소해서 비교하고,
+    밝기가 크게 바뀐 픽셀 비율이 임계값 이하이면 감지를 생략하도록 알려준다.
+    기준 프레임은 감지를 수행할 때만 갱신하므로 느린 변화도 누적되어 잡힌다.
+    """
+
+    def __init__(self, enabled=None, width=None, pixel_delta=None,
+                 changed_ratio=None, force_every=None):
+        """
+        Args:
+            enabled (bool): 게이트 사용 여부 (None이면 config 사용, False면 항상 감지)
+            width (int): 비교용 축소 프레임 너비
+            pixel_delta (int): 변화 픽셀 판단 밝기 차이
+            changed_ratio (float): 장면 변화 판단 변화 픽셀 비율
+            force_every (int): 변화가 없어도 N 프레임마다 강제 감지
+        """
+        self.enabled = MOTION_GATE_ENABLED if enabled is None else enabled
+        self.width = width or MOTION_GATE_WIDTH
+        self.pixel_delta = pixel_delta or MOTION_PIXEL_DELTA
+        self.changed_ratio = changed_ratio if changed_ratio is not None else MOTION_CHANGED_RATIO
+        self.force_every = force_every or MOTION_FORCE_EVERY
+
+        self._reference = None
+        self._frames_since_detect = 0
+        self._force_next = False
+
+        # 통계
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.last_changed_ratio = None
+        self.last_motion = False  # 직전 프레임에서 장면 변화를 감지했는지 (강제 감지는 제외)
+        self._gate_seconds = 0.0
+
+    def _downsample(self, frame):
+        """
+        비교용 축소 그레이스케일 프레임 생성 (스트라이드 샘플링 - 리사이즈보다 저렴)
+
+        Args:
+            frame (numpy.ndarray): RGB 또는 그레이스케일 프레임
+
+        Returns:
+            numpy.ndarray: 축소 그레이스케일 프레임
+        """
+        step = max(frame.shape[1] // self.width, 1)
+        small = frame[::step, ::step]
+        if small.ndim == 3:
+            small = small[:, :, 1]  # G 채널 ≈ 휘도 (색 변환 생략)
+        return small.copy()
+
+    def should_detect(self, frame):
+        """
+        현재 프레임에 대해 감지를 수행해야 하는지 판단
+
+        True를 반환하면 현재 프레임이 새 기준 프레임이 된다.
+
+        Args:
+            frame (numpy.ndarray): 감지에 사용할 프레임
+
+        Returns:
+            bool: True면 감지 수행, False면 이전 감지 결과 재사용
+        """
+        if not self.enabled or frame is None:
+            return True
+
+        start = time.perf_counter()
+        self.frames_checked += 1
+        self.last_motion = False
+
+        small = self._downsample(frame)
+        detect = (
+            self._force_next
+            or self._reference is None
+            or self._reference.shape != small.shape
+            or self._frames_since_detect + 1 >= self.force_every
+        )
+
+        if not detect:
+            diff = cv2.absdiff(small, self._reference)
+            changed = cv2.countNonZero(
+                cv2.threshold(diff, self.pixel_delta, 255, cv2.THRESH_BINARY)[1]
+            )
+            self.last_changed_ratio = changed / diff.size
+            detect = self.last_motion = self.last_changed_ratio > self.changed_ratio
+
+        if detect:
+            self._reference = small
+            self._frames_since_detect = 0
+            self._force_next = False
+        else:
+            self._frames_since_detect += 1
+            self.frames_skipped += 1
+
+        self._gate_seconds += time.perf_counter() - start
+        return detect
+
+    def force_next(self):
+        """다음 프레임은 변화 여부와 관계없이 감지 (설정 변경 시 등)"""
+        self._force_next = True
+
+    def get_stats(self):
+        """
+        게이트 통계 반환
+
+        Returns:
+            dict: 검사/생략 프레임 수, 생략 비율, 평균 게이트 비용(ms)
+        """
+        checked = self.frames_checked
+        return {
+            "enabled": self.enabled,
+            "frames_checked": checked,
+            "frames_skipped": self.frames_skipped,
+            "skip_ratio": round(self.frames_skipped / checked, 3) if checked else 0.0,
+            "gate_cost_ms": round(self._gate_seconds / checked * 1000, 3) if checked else 0.0,
+            "last_changed_ratio": self.last_changed_ratio
+        }
+
+
+# 테스트 코드
+if __name__ == "__main__":
+    import numpy as np
+
+    print("모션 게이트 테스트 시작...")
+
+    gate = MotionGate(enabled=True)
+    frame = np.full((1080, 1920, 3), 40, dtype=np.uint8)
+
+    results = []
+    for i in range(30):
+        if i == 12:
+            frame = frame.copy()
+            frame[400:520, 100:220] = 220  # 누룽지 1개 추가
+        results.append(gate.should_detect(frame))
+
+    print(f"감지 수행 프레임: {[i for i, r in enumerate(results) if r]}")
+    print(f"통계: {gate.get_stats()}")
+    print("모션 게이트 테스트 완료")
@@ -1,18 +1,36 @@
 """
 누룽지 생산량 카운팅 시스템 - MQTT 클라이언트 모듈
 라즈베리 파이에서 PC로 감지 결과 전송
+
+연결이 끊긴 동안의 메시지 (의도적으로 메시지 종류별로 나눔):
+  - 카운트: 메모리에 최신 1개만 보관 (깊이 0/1) → 재연결 시 전송. 지난 카운트는 PC에 쓸모가 없어
+    쌓아 두지 않고, 재시작 후에는 의미 없는 값이라 디스크에도 남기지 않음
+  - 팬 완료(batch_complete): 이 모듈의 대기열이 아니라 생산 저널(production_journal, SQLite)의
+    mqtt_acked 컬럼이 디스크 대기열 역할 (크기는 JOURNAL_MAX_BYTES로 제한).
+    재연결 시 연결 핸들러가 저널 재전송을 바로 실행해 끊긴 동안의 팬을 publish_pans()로 다시 보내고,
+    PUBACK을 받아야 ack 표시 → 재시작해도 MQTT로 재전송됨 (Firebase 쪽 전달과 무관)
+  - 상태 / 캘리브레이션 이미지: 최선 노력 전달 (끊긴 동안에는 보내지 않음)
 """
 
 import paho.mqtt.client as mqtt
 import json
+import threading
 import time
 import base64
 import cv2
 import numpy as np
+from detector import boxes_to_dicts
+from publish_policy import CountPublishPolicy, SEND_HEARTBEAT
+from wire_format import encode_count, encode_image
+from pipeline import StageQueue, PipelineStage
+from metrics import registry
 from config import (
     MQTT_BROKER_ADDRESS,
     MQTT_BROKER_PORT,
     MQTT_TOPICS,
+    MQTT_WIRE_FORMAT,
+    MQTT_CLEAN_SESSION,
+    MQTT_MAX_INFLIGHT,
     DEBUG_MODE
 )
 
@@ -22,18 +40,100 @@ class MQTTClient:
     MQTT 통신 클라이언트 클래스
     """
 
-    def __init__(self):
-        """MQTT 클라이언트 초기화"""
+    def __init__(self, start_loop=True):
+        """
+        MQTT 클라이언트 초기화
+
+        Args:
+            start_loop (bool): paho 네트워크 스레드(loop_start) 시작 여부
+                               (False면 호출자가 소켓 읽기/쓰기를 구동 - asyncio 실행 방식)
+        """
         self.client = None
+        self._start_loop = start_loop
         self.connected = False
         self._command_handler = None
+        self._connect_handler = None
+        # 카운트 전송 정책 (변경 시 전체 메시지, 그 외에는 하트비트만)
+        self.count_policy = CountPublishPolicy()
+        self._count_lock = threading.Lock()
+        # 연결이 끊긴 동안의 최신 카운트 1개 (재연결 시 전송) - 메모리에만 보관 (모듈 설명 참고)
+        # 팬 완료는 생산 저널이 디스크 대기열 → 재연결 시 _connect_handler가 publish_pans()로 재전송
+        self._offline_count = None
+        self._offline_lock = threading.Lock()
+        # 전송 확인(QoS 0 송신 완료 / QoS 1 PUBACK) 대기 중인 메시지 id - _publish에서 추가, on_publish에서 제거
+        # on_publish가 publish() 반환보다 먼저 올 수 있으므로 먼저 온 확인은 _acked에 잠시 보관
+        self._inflight = set()
+        self._acked = set()
+        self._inflight_lock = threading.Lock()
+        self._flush_pending = set()
+        self._flush_started = None
+        self.session_present = False
+        # 통계
+        self.offline_queued = 0
+        self.offline_dropped = 0
+        self.flushes = 0
+        self.last_flush_messages = 0
+        self.last_flush_ms = None
+        # 캘리브레이션 이미지 인코딩 워커 (최신 프레임 1장만 보관, 밀린 프레임은 버림)
+        self._calibration_queue = StageQueue("calibration", maxsize=1, drop_policy="drop_oldest")
+        self._calibration_stage = PipelineStage(
+            "calibration", self._send_calibration_image, input_queue=self._calibration_queue
+        )
+        self._calibration_stage.start()
         self._initialize_client()
+        self._register_metrics()
+
+    def _register_metrics(self):
+        """지표 레지스트리에 연결 상태 / 대기열 / 전송 정책 값 등록 (조회 시점에 읽음)"""
+        registry.gauge("edge_mqtt_connected", "MQTT 브로커 연결 여부", fn=lambda: self.connected)
+        registry.gauge("edge_mqtt_inflight", "전송 확인(QoS 0 송신 / QoS 1 PUBACK) 대기 중인 메시지 수",
+                       fn=self._inflight_count)
+        registry.gauge("edge_mqtt_offline_queue_depth", "재연결 시 전송할 오프라인 카운트 수 (0 또는 1)",
+                       fn=lambda: int(self._offline_count is not None))
+        registry.counter("edge_mqtt_offline_dropped_total", "연결이 끊긴 동안 새 카운트로 대체된 카운트 수",
+                         fn=lambda: self.offline_dropped)
+        for kind in ("changes", "heartbeats", "suppressed"):
+            registry.counter("edge_mqtt_count_messages_total", "카운트 전송 정책 결정 수 (변경/하트비트/생략)",
+                             labels={"kind": kind},
+                             fn=lambda kind=kind: getattr(self.count_policy, kind))
+        registry.histogram("edge_stage_duration_seconds", "파이프라인 단계 처리 시간",
+                           labels={"stage": "calibration"}, histogram=self._calibration_stage.histogram)
+        registry.gauge("edge_queue_depth", "단계 사이 큐 깊이", labels={"queue": "calibration"},
+                       fn=self._calibration_queue.depth)
+
+    def _inflight_count(self):
+        """전송 확인 대기 메시지 수 (_publish로 발행한 메시지 기준)"""
+        with self._inflight_lock:
+            return len(self._inflight)
+
+    def _publish(self, topic, payload, qos):
+        """
+        메시지 발행 + 전송 확인 대기 목록에 추가 (모든 발행은 이 함수를 거침)
+
+        paho는 PUBACK 처리 중 내부 잠금을 잡은 채 on_publish를 부르므로
+        publish() 호출은 _inflight_lock 밖에서 함
+
+        Returns:
+            MQTTMessageInfo: paho 발행 결과
+        """
+        info = self.client.publish(topic=topic, payload=payload, qos=qos)
+        # QoS 1 메시지는 연결이 끊겨 있어도(MQTT_ERR_NO_CONN) paho가 보관했다가 재연결 시 전송
+        if info.rc == mqtt.MQTT_ERR_SUCCESS or (qos > 0 and info.rc == mqtt.MQTT_ERR_NO_CONN):
+            with self._inflight_lock:
+                if info.mid in self._acked:
+                    self._acked.discard(info.mid)
+                else:
+                    self._inflight.add(info.mid)
+        return info
 
     def _initialize_client(self):
         """MQTT 클라이언트 설정 및 연결"""
         try:
             # 클라이언트 생성
-            self.client = mqtt.Client(client_id="nurungji_edge_device")
+            # 고정 client id + 지속 세션 → 재연결 시 브로커가 구독과 미확인 메시지를 유지
+            self.client = mqtt.Client(client_id="nurungji_edge_device",
+                                      clean_session=MQTT_CLEAN_SESSION)
+            self.client.max_inflight_messages_set(MQTT_MAX_INFLIGHT)
 
             # 콜백 설정
             self.client.on_connect = self._on_connect
@@ -48,7 +148,8 @@ class MQTTClient:
             self.client.connect(MQTT_BROKER_ADDRESS, MQTT_BROKER_PORT, keepalive=60)
 
             # 백그라운드 네트워크 루프 시작
-            self.client.loop_start()
+            if self._start_loop:
+                self.client.loop_start()
 
         except Exception as e:
             print(f"[MQTT] 오류: 클라이언트 초기화 실패 - {e}")
@@ -63,11 +164,22 @@ class MQTTClient:
         """
         if rc == 0:
             self.connected = True
-            # PC로부터 명령 수신을 위해 command 토픽 구독
-            client.subscribe(MQTT_TOPICS["command"])
+            self.session_present = bool(flags.get("session present"))
+            # (재)연결 직후에는 PC가 현재 상태를 바로 받도록 다음 카운트를 전체 메시지로 전송
+            # (전송 단계의 decide()와 같은 잠금 - 판단 도중에 상태가 초기화되지 않도록)
+            with self._count_lock:
+                self.count_policy.reset()
+            # PC로부터 명령 수신을 위해 command 토픽 구독 (QoS 1 → 끊긴 동안 온 명령은 브로커가 보관)
+            client.subscribe(MQTT_TOPICS["command"], qos=1)
             if DEBUG_MODE:
-                print(f"[MQTT] ✓ 브로커 연결 성공")
+                print(f"[MQTT] ✓ 브로커 연결 성공 (기존 세션: {'있음' if self.session_present else '없음'})")
                 print(f"[MQTT] 명령 수신 구독: {MQTT_TOPICS['command']}")
+            self._flush_offline()
+            if self._connect_handler:
+                try:
+                    self._connect_handler()
+                except Exception as e:
+                    print(f"[MQTT] 연결 핸들러 오류: {e}")
         else:
             self.connected = False
             print(f"[MQTT] ✗ 연결 실패 - 코드: {rc}")
@@ -89,6 +201,78 @@ class MQTTClient:
         if DEBUG_MODE:
             print(f"[MQTT] 메시지 전송 완료 - ID: {mid}")
 
+        with self._inflight_lock:
+            if mid in self._inflight:
+                self._inflight.discard(mid)
+            else:
+                self._acked.add(mid)
+
+        # 재연결 후 대기열 전송이 모두 확인되면 소요 시간 기록
+        with self._offline_lock:
+            if self._flush_started is None or mid not in self._flush_pending:
+                return
+            self._flush_pending.discard(mid)
+            if self._flush_pending:
+                return
+            self.last_flush_ms = round((time.perf_counter() - self._flush_started) * 1000, 1)
+            self._flush_started = None
+        print(f"[MQTT] 오프라인 대기열 {self.last_flush_messages}건 전송 완료 ({self.last_flush_ms} ms)")
+
+    def _enqueue_offline(self, send):
+        """
+        연결이 끊긴 동안의 최신 카운트 보관 (이전에 보관한 카운트는 버림)
+
+        Args:
+            send (callable): 재연결 시 호출할 함수 → MQTTMessageInfo
+        """
+        with self._offline_lock:
+            if self._offline_count is not None:
+                self.offline_dropped += 1
+            self._offline_count = send
+            self.offline_queued += 1
+
+    def _flush_offline(self):
+        """보관한 카운트 전송 (연결 콜백에서 호출)"""
+        with self._offline_lock:
+            send, self._offline_count = self._offline_count, None
+        if send is None:
+            return
+
+        start = time.perf_counter()
+        mids = set()
+        try:
+            info = send()
+        except Exception as e:
+            print(f"[MQTT] 오류: 대기열 전송 실패 - {e}")
+            info = None
+        if info is not None and info.rc == mqtt.MQTT_ERR_SUCCESS:
+            mids.add(info.mid)
+
+        with self._offline_lock:
+            self.flushes += 1
+            self.last_flush_messages = 1
+            self._flush_pending |= mids
+            self._flush_started = start if self._flush_pending else None
+
+    def get_queue_stats(self):
+        """
+        오프라인 대기열 통계
+
+        Returns:
+            dict: 대기 중 카운트 수(0/1), 누적 보관/대체 수, 마지막 재연결 전송 건수/소요 시간
+        """
+        with self._offline_lock:
+            return {
+                "depth": int(self._offline_count is not None),
+                "queued": self.offline_queued,
+                "dropped": self.offline_dropped,
+                "flushes": self.flushes,
+                "last_flush_messages": self.last_flush_messages,
+                "last_flush_ms": self.last_flush_ms,
+                "session_present": self.session_present,
+                "inflight": self._inflight_count()
+            }
+
     def _on_message(self, client, userdata, msg):
         """
         메시지 수신 콜백 (PC로부터 명령 수신)
@@ -112,81 +296,125 @@ class MQTTClient:
         """
         self._command_handler = callback
 
+    def set_connect_handler(self, callback):
+        """
+        (재)연결 핸들러 등록 - 생산 저널의 MQTT 미전달 팬 재전송 요청용
+
+        Args:
+            callback (callable): 연결 성공 시 호출할 함수 (인자 없음, 네트워크 스레드에서 호출되므로
+                                 전송 자체는 하지 말고 작업 요청만)
+        """
+        self._connect_handler = callback
+
     def publish_count(self, count, bounding_boxes):
         """
-        감지된 누룽지 개수 전송
+        감지된 누룽지 개수 전송 (변경 시에만 전체 메시지, 그 외에는 주기적 하트비트)
+        연결이 끊긴 동안에는 최신 카운트 1개만 보관했다가 재연결 시 전송
 
         Args:
             count (int): 감지된 개수
-            bounding_boxes (list): 바운딩 박스 리스트
+            bounding_boxes (list | numpy.ndarray): 바운딩 박스 목록 (dict 리스트 또는 구조화 배열)
 
         Returns:
-            bool: 전송 성공 여부
+            bool: 전송 성공 여부 (정책상 전송을 생략한 경우 True, 대기열 보관은 False)
         """
         if not self.connected:
-            print("[MQTT] 오류: 브로커에 연결되지 않음")
+            self._enqueue_offline(lambda: self._send_count(count, bounding_boxes))
             return False
 
         try:
-            # 페이로드 생성
-            payload = {
-                "timestamp": time.time(),
-                "count": count,
-                "stable_count": count,  # Phase 2에서 안정화 로직 추가 예정
-                "boxes": bounding_boxes
-            }
+            info = self._send_count(count, bounding_boxes)
+            return info is None or info.rc == mqtt.MQTT_ERR_SUCCESS
 
-            # JSON 직렬화
-            message = json.dumps(payload, ensure_ascii=False)
+        except Exception as e:
+            print(f"[MQTT] 오류: 카운트 전송 실패 - {e}")
+            return False
 
-            # 발행
-            result = self.client.publish(
-                topic=MQTT_TOPICS["count"],
-                payload=message,
-                qos=1  # 최소 1회 전달 보장
-            )
+    def _send_count(self, count, bounding_boxes):
+        """
+        카운트 메시지 발행 (전송 단계 / 재연결 콜백 양쪽에서 호출)
 
-            if DEBUG_MODE:
-                print(f"[MQTT] 카운트 전송: {count}개")
+        Returns:
+            MQTTMessageInfo | None: 정책상 전송을 생략하면 None
+        """
+        with self._count_lock:
+            decision = self.count_policy.decide(count, bounding_boxes)
+            if decision is None:
+                return None
+
+            seq = self.count_policy.next_seq()
+            heartbeat = decision == SEND_HEARTBEAT
+            # 하트비트는 개수 + 순번만 (유실돼도 다음 하트비트가 대신하므로 QoS 0)
+            qos = 0 if heartbeat else 1
+
+            if MQTT_WIRE_FORMAT == "binary":
+                # 고정 헤더 + 박스 레코드 (구조화 배열에서 바로 직렬화)
+                topic = MQTT_TOPICS["count_bin"]
+                message = encode_count(seq, time.time(), count, bounding_boxes,
+                                       stable_count=count, heartbeat=heartbeat)
+            else:
+                topic = MQTT_TOPICS["count"]
+                if heartbeat:
+                    payload = {"timestamp": time.time(), "seq": seq, "count": count, "heartbeat": True}
+                else:
+                    payload = {
+                        "timestamp": time.time(),
+                        "seq": seq,
+                        "count": count,
+                        "stable_count": count,  # Phase 2에서 안정화 로직 추가 예정
+                        "boxes": boxes_to_dicts(bounding_boxes)
+                    }
+                # JSON 직렬화
+                message = json.dumps(payload, ensure_ascii=False)
 
-            return result.rc == mqtt.MQTT_ERR_SUCCESS
+            # 발행
+            result = self._publish(topic, message, qos)
 
-        except Exception as e:
-            print(f"[MQTT] 오류: 카운트 전송 실패 - {e}")
-            return False
+            if DEBUG_MODE and decision != SEND_HEARTBEAT:
+                print(f"[MQTT] 카운트 전송: {count}개 (#{seq})")
 
-    def publish_batch_complete(self, final_count):
+        return result
+
+    def publish_pans(self, pans, timeout=5.0):
         """
-        팬 가득참 신호 전송
+        생산 저널의 팬 완료 기록 전송 (batch_complete 토픽)
+        오프라인 동안 쌓인 기록도 메시지 1개로 일괄 전송
 
         Args:
-            final_count (int): 확정된 개수
+            pans (list[dict]): 저널 행 {"id", "ts", "product", "count", "frame_id"}
+            timeout (float): 브로커 수신 확인(PUBACK) 대기 시간 (초)
 
         Returns:
-            bool: 전송 성공 여부
+            bool: 브로커 수신 확인까지 성공 여부 (성공해야 저널에 ack 표시)
         """
-        if not self.connected:
-            print("[MQTT] 오류: 브로커에 연결되지 않음")
+        if not self.connected or not pans:
             return False
 
         try:
             payload = {
                 "timestamp": time.time(),
-                "final_count": final_count
+                "final_count": sum(pan["count"] for pan in pans),
+                "pans": [
+                    {
+                        "id": pan["id"],
+                        "timestamp": pan["ts"] / 1000.0,
+                        "final_count": pan["count"],
+                        "product": pan["product"],
+                        "frame_id": pan["frame_id"]
+                    }
+                    for pan in pans
+                ]
             }
 
-            message = json.dumps(payload, ensure_ascii=False)
-
-            result = self.client.publish(
-                topic=MQTT_TOPICS["batch_complete"],
-                payload=message,
-                qos=1
-            )
+            info = self._publish(MQTT_TOPICS["batch_complete"], json.dumps(payload, ensure_ascii=False), qos=1)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                return False
+            info.wait_for_publish(timeout)
 
             if DEBUG_MODE:
-                print(f"[MQTT] 팬 확정 전송: {final_count}개")
+                print(f"[MQTT] 팬 확정 전송: {len(pans)}건, 합계 {payload['final_count']}개")
 
-            return result.rc == mqtt.MQTT_ERR_SUCCESS
+            return info.is_published()
 
         except Exception as e:
             print(f"[MQTT] 오류: 팬 확정 전송 실패 - {e}")
@@ -213,11 +441,7 @@ class MQTTClient:
 
             message = json.dumps(payload, ensure_ascii=False)
 
-            result = self.client.publish(
-                topic=MQTT_TOPICS["status"],
-                payload=message,
-                qos=0  # 상태는 최선 노력 전달
-            )
+            result = self._publish(MQTT_TOPICS["status"], message, qos=0)  # 상태는 최선 노력 전달
 
             return result.rc == mqtt.MQTT_ERR_SUCCESS
 
@@ -227,63 +451,81 @@ class MQTTClient:
 
     def publish_calibration_image(self, frame, count, boxes):
         """
-        캘리브레이션용 감지 결과 이미지 전송 (PC에서 실시간 확인용)
+        캘리브레이션용 감지 결과 이미지 전송 요청 (PC에서 실시간 확인용)
+        변환/리사이즈/JPEG 인코딩은 워커 스레드에서 처리하고 바로 반환
 
         Args:
             frame: 카메라 프레임 (numpy array, RGB)
             count (int): 감지된 개수
-            boxes (list): 바운딩 박스 리스트
+            boxes (list | numpy.ndarray): 바운딩 박스 목록
 
         Returns:
-            bool: 전송 성공 여부
+            bool: 요청 등록 여부 (이전 요청이 아직 대기 중이면 새 프레임으로 교체)
         """
         if not self.connected:
             return False
+        self._calibration_queue.put((frame, count, boxes, time.time()))
+        return True
 
-        try:
-            # BGR로 변환 후 640x360으로 리사이즈 (전송 크기 최적화)
-            vis_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
-            vis_frame = cv2.resize(vis_frame, (640, 360))
-
-            # 바운딩 박스 그리기 (리사이즈 비율 적용)
-            orig_h, orig_w = frame.shape[:2]
-            scale_x = 640 / orig_w
-            scale_y = 360 / orig_h
-            for box in boxes:
-                x = int(box['x'] * scale_x)
-                y = int(box['y'] * scale_y)
-                w = int(box['w'] * scale_x)
-                h = int(box['h'] * scale_y)
-                cv2.rectangle(vis_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-            # 개수 텍스트 오버레이
-            cv2.putText(vis_frame, f"Count: {count}", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-
-            # JPEG 압축 후 base64 인코딩
-            _, buffer = cv2.imencode('.jpg', vis_frame, [cv2.IMWRITE_JPEG_QUALITY, 50])
-            image_b64 = base64.b64encode(buffer).decode('utf-8')
-
-            payload = {
-                "timestamp": time.time(),
+    def _send_calibration_image(self, item):
+        """[캘리브레이션 워커] 박스 그리기 + JPEG 인코딩 + 전송"""
+        frame, count, boxes, timestamp = item
+        if not self.connected:
+            return None
+
+        # BGR로 변환 후 640x360으로 리사이즈 (전송 크기 최적화)
+        width, height = 640, 360
+        vis_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        vis_frame = cv2.resize(vis_frame, (width, height))
+
+        # 바운딩 박스 그리기 (리사이즈 비율 적용)
+        orig_h, orig_w = frame.shape[:2]
+        scale_x = width / orig_w
+        scale_y = height / orig_h
+        for box in boxes:
+            x = int(box['x'] * scale_x)
+            y = int(box['y'] * scale_y)
+            w = int(box['w'] * scale_x)
+            h = int(box['h'] * scale_y)
+            cv2.rectangle(vis_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+
+        # 개수 텍스트 오버레이
+        cv2.putText(vis_frame, f"Count: {count}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+        _, buffer = cv2.imencode('.jpg', vis_frame, [cv2.IMWRITE_JPEG_QUALITY, 50])
+
+        if MQTT_WIRE_FORMAT == "binary":
+            # 작은 고정 헤더 + JPEG 원본 (base64 없음)
+            topic = MQTT_TOPICS["calibration_image_bin"]
+            message = encode_image(timestamp, count, buffer, width, height)
+        else:
+            topic = MQTT_TOPICS["calibration_image"]
+            message = json.dumps({
+                "timestamp": timestamp,
                 "count": count,
-                "image": image_b64
-            }
+                "image": base64.b64encode(buffer).decode('utf-8')
+            })
 
-            result = self.client.publish(
-                topic=MQTT_TOPICS["calibration_image"],
-                payload=json.dumps(payload),
-                qos=0
-            )
+        result = self._publish(topic, message, qos=0)
 
-            if DEBUG_MODE:
-                print(f"[MQTT] 캘리브레이션 이미지 전송: {count}개, {len(image_b64)} bytes")
+        if DEBUG_MODE:
+            print(f"[MQTT] 캘리브레이션 이미지 전송: {count}개, {len(message)} bytes")
 
-            return result.rc == mqtt.MQTT_ERR_SUCCESS
+        if result.rc != mqtt.MQTT_ERR_SUCCESS:
+            print(f"[MQTT] 오류: 캘리브레이션 이미지 전송 실패 - 코드: {result.rc}")
+        return None
 
-        except Exception as e:
-            print(f"[MQTT] 오류: 캘리브레이션 이미지 전송 실패 - {e}")
-            return False
+    def get_calibration_stats(self):
+        """
+        캘리브레이션 이미지 워커 통계
+
+        Returns:
+            dict: 인코딩+전송 시간 히스토그램, 교체(버려진) 프레임 수
+        """
+        stats = self._calibration_stage.get_stats()
+        stats["dropped"] = self._calibration_queue.get_stats()["dropped"]
+        return stats
 
     def is_connected(self):
         """
@@ -296,6 +538,7 @@ class MQTTClient:
 
     def disconnect(self):
         """MQTT 클라이언트 종료"""
+        self._calibration_stage.stop()
         if self.client is not None:
             self.client.loop_stop()
             self.client.disconnect()
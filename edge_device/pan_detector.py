@@ -0,0 +1,323 @@
+"""
+누룽지 생산량 카운팅 시스템 - 팬 완료 판정 (디바운스 + 히스테리시스 상태 기계)
+프레임 1장이 0을 읽었다고 팬 완료로 보지 않고, 빈 프레임이 연속으로 이어져야 완료로 판정
+
+  - 비어 있음(EMPTY) → 채워짐(FILLED): 0이 아닌 프레임이 fill_frames 연속
+  - 채워짐 → 완료: 0인 프레임이 empty_frames 이상 연속이고 빈 구간이 empty_seconds 이상 이어짐
+    (중간에 0이 아닌 프레임이 오면 다시 셈, 시간 기준이라 적응형 촬영 간격이 짧아져도 판정 시간은 같음)
+  - 완료 갯수: 채워진 동안 최근 window 프레임 최빈값의 최댓값
+    (최빈값이 stable_frames 이상 나온 경우만 인정 → 한두 프레임짜리 글레어 / 손 가림 값은 무시)
+  - 객체 추적(tracker.py)의 도착 이벤트를 함께 넘기면 팬마다 모아 두고,
+    완료 갯수 = 안정된 최대 갯수 + 쌓임 도착 수 (도착 수 이하) → 쌓여서 한 프레임에 덜 보인 조각 보정
+    (새 조각 도착은 안정된 최대 갯수를 넘기지 못함 - 가림 / 재등장으로 부풀려진 도착이 생산량을 올리지 않도록)
+  - 최빈값은 값별 빈도 + 빈도별 값 집합으로 관리 → 프레임당 O(1) 갱신
+"""
+
+import time
+from collections import deque
+
+from config import PAN_FILL_FRAMES, PAN_EMPTY_FRAMES, PAN_EMPTY_SECONDS, PAN_WINDOW, PAN_STABLE_FRAMES
+from tracker import ARRIVAL_STACKED
+
+# 상태
+EMPTY = "empty"
+FILLED = "filled"
+
+
+class RollingMode:
+    """
+    최근 size개 값의 최빈값 (동률이면 큰 값) - 추가 / 제거 O(1)
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._values = deque()
+        self._freq = {}        # 값 → 창 안의 빈도
+        self._by_freq = {}     # 빈도 → 그 빈도를 가진 값 집합
+        self.max_freq = 0
+
+    def _move(self, value, old, new):
+        if old:
+            bucket = self._by_freq[old]
+            bucket.discard(value)
+            if not bucket:
+                del self._by_freq[old]
+        if new:
+            self._by_freq.setdefault(new, set()).add(value)
+            self._freq[value] = new
+        else:
+            del self._freq[value]
+
+    def push(self, value):
+        """값 추가 (창이 가득 차면 가장 오래된 값 제거)"""
+        if len(self._values) == self.size:
+            oldest = self._values.popleft()
+            freq = self._freq[oldest]
+            self._move(oldest, freq, freq - 1)
+            if freq == self.max_freq and self.max_freq not in self._by_freq:
+                self.max_freq -= 1
+        self._values.append(value)
+        freq = self._freq.get(value, 0)
+        self._move(value, freq, freq + 1)
+        self.max_freq = max(self.max_freq, freq + 1)
+
+    def mode(self):
+        """
+        Returns:
+            tuple: (최빈값, 빈도) - 비어 있으면 (None, 0)
+        """
+        if not self.max_freq:
+            return None, 0
+        # 최고 빈도 값 집합은 동률일 때만 2개 이상 (크기 ≤ size)
+        return max(self._by_freq[self.max_freq]), self.max_freq
+
+
+class PanCompleteDetector:
+    """
+    프레임별 감지 갯수로 팬 완료를 판정 (감지 단계 스레드 1개에서만 update 호출)
+    """
+
+    def __init__(self, fill_frames=None, empty_frames=None, window=None, stable_frames=None,
+                 empty_seconds=None):
+        """
+        Args:
+            fill_frames (int): 팬이 채워졌다고 판단할 연속 비어 있지 않은 프레임 수
+            empty_frames (int): 팬 완료로 판단할 최소 연속 빈 프레임 수 (K)
+            window (int): 최빈값을 계산할 최근 프레임 수
+            stable_frames (int): 최빈값으로 인정할 최소 빈도 (window보다 크면 window로 맞춤)
+            empty_seconds (float): 팬 완료로 판단할 빈 구간 최소 시간 (초)
+        """
+        self.fill_frames = fill_frames or PAN_FILL_FRAMES
+        self.empty_frames = empty_frames or PAN_EMPTY_FRAMES
+        self.empty_seconds = PAN_EMPTY_SECONDS if empty_seconds is None else empty_seconds
+        self.window = window or PAN_WINDOW
+        self.stable_frames = min(stable_frames or PAN_STABLE_FRAMES, self.window)
+
+        self.state = EMPTY
+        self.peak = 0             # 이번 팬의 안정된 최대 갯수
+        self.arrivals = []        # 이번 팬의 도착 이벤트 (tracker.py)
+        self.last_pan = None      # 마지막 완료 팬 {"count", "peak", "arrivals", "stacked"}
+        self._streak = 0          # EMPTY: 연속 비어 있지 않은 프레임 / FILLED: 연속 빈 프레임
+        self._empty_since = None  # FILLED: 지금 빈 구간의 첫 빈 프레임 시각
+        self._pending = []        # EMPTY에서 채워짐 확정 전까지의 갯수
+        self._pending_arrivals = []
+        self._mode = None
+
+        # 통계
+        self.completed = 0
+        self.rejected = 0         # 채워졌지만 안정된 갯수가 없어 버린 팬 (글레어 / 손 가림)
+        self.dropouts = 0         # 채워진 동안 완료 기준 미만으로 끝난 빈 구간 (오판 방지한 횟수)
+        self.false_starts = 0     # fill_frames에 못 미치고 끝난 비어 있지 않은 구간
+
+    def set_params(self, fill_frames=None, empty_frames=None, window=None, stable_frames=None,
+                   empty_seconds=None):
+        """
+        판정 파라미터 변경 (Firebase deviceSettings) - window는 다음 팬부터 적용
+        stable_frames가 window보다 크면 어떤 갯수도 안정되지 못하므로 window로 맞춤
+
+        Returns:
+            list: 바뀐 항목 ["이름=값", ...]
+        """
+        changed = []
+        for name, value in (("fill_frames", fill_frames), ("empty_frames", empty_frames),
+                            ("window", window), ("stable_frames", stable_frames)):
+            if value is not None and int(value) > 0 and getattr(self, name) != int(value):
+                setattr(self, name, int(value))
+                changed.append(f"{name}={int(value)}")
+        if empty_seconds is not None and float(empty_seconds) >= 0 \
+                and self.empty_seconds != float(empty_seconds):
+            self.empty_seconds = float(empty_seconds)
+            changed.append(f"empty_seconds={self.empty_seconds}")
+        if self.stable_frames > self.window:
+            print(f"[팬 판정] stable_frames({self.stable_frames})가 window({self.window})보다 커서 "
+                  f"{self.window}로 맞춤")
+            self.stable_frames = self.window
+            changed = [item for item in changed if not item.startswith("stable_frames=")]
+            changed.append(f"stable_frames={self.window}")
+        return changed
+
+    def update(self, count, arrivals=(), now=None):
+        """
+        프레임 1장의 감지 갯수 반영
+
+        Args:
+            count (int): 현재 프레임의 감지 갯수
+            arrivals (list): 이번 프레임의 도착 이벤트 (ObjectTracker.update 결과)
+            now (float): 프레임 촬영 시각 (초, None이면 time.monotonic())
+
+        Returns:
+            int: 완료된 팬의 갯수 (0이면 완료 없음)
+        """
+        if self.state == EMPTY:
+            if count > 0:
+                self._pending.append(count)
+                self._pending_arrivals.extend(arrivals)
+                self._streak += 1
+                if self._streak >= self.fill_frames:
+                    self._start_pan()
+            else:
+                if self._pending:
+                    self.false_starts += 1
+                self._pending = []
+                self._pending_arrivals = []
+                self._streak = 0
+            return 0
+
+        self.arrivals.extend(arrivals)
+        self._observe(count)
+        if count > 0:
+            if self._streak:
+                self.dropouts += 1
+            self._streak = 0
+            return 0
+
+        if now is None:
+            now = time.monotonic()
+        if not self._streak:
+            self._empty_since = now
+        self._streak += 1
+        if self._streak < self.empty_frames or now - self._empty_since < self.empty_seconds:
+            return 0
+        return self._finish_pan()
+
+    def _start_pan(self):
+        self.state = FILLED
+        self.peak = 0
+        self.arrivals, self._pending_arrivals = self._pending_arrivals, []
+        self._mode = RollingMode(self.window)
+        pending, self._pending = self._pending, []
+        self._streak = 0
+        for count in pending:
+            self._observe(count)
+
+    def _observe(self, count):
+        self._mode.push(count)
+        value, freq = self._mode.mode()
+        if freq >= min(self.stable_frames, self.window) and value > self.peak:
+            self.peak = value
+
+    def _finish_pan(self):
+        # 안정된 갯수가 한 번도 없었으면 도착 이벤트가 있어도 팬으로 보지 않음 (손 / 글레어)
+        # 도착 수는 쌓임 도착만큼만 안정된 최대 갯수에 더함 (새 조각 도착 수는 가려졌다 다시 보이면 부풀 수 있음)
+        stacked = sum(1 for arrival in self.arrivals if arrival["kind"] == ARRIVAL_STACKED)
+        extra = min(stacked, max(len(self.arrivals) - self.peak, 0))
+        batch_count = self.peak + extra if self.peak > 0 else 0
+        if batch_count > 0:
+            self.completed += 1
+            self.last_pan = {"count": batch_count, "peak": self.peak,
+                             "arrivals": len(self.arrivals), "stacked": stacked}
+        else:
+            self.rejected += 1
+        self.state = EMPTY
+        self.peak = 0
+        self.arrivals = []
+        self._streak = 0
+        self._empty_since = None
+        self._mode = None
+        return batch_count
+
+    def get_stats(self):
+        """
+        판정 통계 반환
+
+        Returns:
+            dict: 현재 상태 / 안정 최대 갯수 / 도착 수, 완료 / 버림 / 짧은 빈 구간 / 짧은 채움 구간 수,
+                  마지막 완료 팬, 파라미터
+        """
+        return {
+            "state": self.state,
+            "peak": self.peak,
+            "arrivals": len(self.arrivals),
+            "last_pan": self.last_pan,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "dropouts": self.dropouts,
+            "false_starts": self.false_starts,
+            "fill_frames": self.fill_frames,
+            "empty_frames": self.empty_frames,
+            "empty_seconds": self.empty_seconds,
+            "window": self.window,
+            "stable_frames": self.stable_frames
+        }
+
+
+def naive_batches(counts):
+    """기존 판정 (이전 프레임 > 0 이고 현재 프레임 == 0이면 완료) - 비교용"""
+    batches = []
+    previous = 0
+    for count in counts:
+        if previous > 0 and count == 0:
+            batches.append(previous)
+        previous = count
+    return batches
+
+
+def replay(counts, interval=1.0, **params):
+    """
+    기록된 갯수 시퀀스를 다시 재생해서 판정 결과 확인
+
+    Args:
+        counts (list): 프레임별 감지 갯수
+        interval (float): 프레임 간격 (초)
+        **params: PanCompleteDetector 파라미터
+
+    Returns:
+        tuple: (완료된 팬 갯수 리스트, 판정 통계)
+    """
+    detector = PanCompleteDetector(**params)
+    batches = []
+    for i, count in enumerate(counts):
+        batch = detector.update(count, now=i * interval)
+        if batch:
+            batches.append(batch)
+    return batches, detector.get_stats()
+
+
+def load_counts(path):
+    """갯수 시퀀스 파일 읽기 (공백 / 쉼표 / 줄바꿈 구분 정수, # 주석)"""
+    counts = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.split("#", 1)[0]
+            counts.extend(int(token) for token in line.replace(",", " ").split())
+    return counts
+
+
+# 테스트 코드: 기록된 시퀀스 재생 → 기존 판정과 비교
+#   python pan_detector.py               내장 시퀀스 (기대값 검증)
+#   python pan_detector.py counts.txt    파일의 시퀀스 재생
+if __name__ == "__main__":
+    import sys
+
+    print("팬 완료 판정 테스트 시작...")
+
+    # (이름, 프레임별 갯수, 기대 결과)
+    recorded = [
+        ("정상 팬 2판",
+         [0, 0, 3, 7, 12, 12, 12, 12, 12, 0, 0, 0, 0, 0, 0,
+          5, 10, 14, 14, 14, 14, 14, 14, 0, 0, 0, 0, 0], [12, 14]),
+        ("손 가림 (중간에 0 두 프레임)",
+         [0, 8, 15, 18, 18, 18, 0, 0, 18, 18, 18, 18, 0, 0, 0, 0, 0, 0], [18]),
+        ("글레어 (갯수 튐 1프레임)",
+         [0, 10, 16, 16, 16, 31, 16, 16, 16, 16, 0, 0, 0, 0, 0, 0], [16]),
+        ("오탐 1프레임 (빈 팬에 1)",
+         [0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0], []),
+        ("꺼내는 중 줄어듦",
+         [0, 6, 20, 20, 20, 20, 20, 17, 12, 6, 2, 0, 0, 0, 0, 0, 0], [20]),
+    ]
+
+    if len(sys.argv) > 1:
+        recorded = [(path, load_counts(path), None) for path in sys.argv[1:]]
+
+    ok = True
+    for name, counts, expected in recorded:
+        batches, stats = replay(counts)
+        result = "" if expected is None else (" ✓" if batches == expected else f" ✗ (기대 {expected})")
+        ok = ok and (expected is None or batches == expected)
+        print(f"[{name}] 프레임 {len(counts)}장")
+        print(f"   기존 판정: {naive_batches(counts)}")
+        print(f"   새 판정:   {batches}{result}")
+        print(f"   통계: 짧은 빈 구간 {stats['dropouts']}, 짧은 채움 구간 {stats['false_starts']}, "
+              f"버린 팬 {stats['rejected']}")
+
+    print("팬 완료 판정 테스트 완료" + ("" if ok else " - 기대값 불일치"))
@@ -0,0 +1,308 @@
+"""
+누룽지 생산량 카운팅 시스템 - 파이프라인 모듈
+캡처 / 감지 / 전송 단계를 각각의 워커 스레드로 실행하고 크기 제한 큐로 연결
+
+구성 요소:
+  StageQueue       → 크기 제한 큐 (가득 차면 가장 오래된 항목 버림 또는 대기)
+  LatencyHistogram → 단계별 처리 시간 히스토그램
+  PipelineStage    → 입력 큐에서 꺼내 핸들러 실행 후 출력 큐로 전달하는 워커 스레드
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+
+# 지연 시간 히스토그램 버킷 상한 (밀리초)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class StageQueue:
+    """
+    단계 사이를 연결하는 크기 제한 큐 (thread-safe)
+
+    drop_policy:
+      "drop_oldest" → 가득 차면 가장 오래된 항목을 버리고 새 항목 추가 (생산자 비차단)
+      "block"       → 가득 차면 자리가 날 때까지 대기 (항목 유실 없음)
+    """
+
+    def __init__(self, name, maxsize, drop_policy="drop_oldest"):
+        """
+        Args:
+            name (str): 큐 이름 (통계 표시용)
+            maxsize (int): 최대 항목 수
+            drop_policy (str): "drop_oldest" | "block"
+        """
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.drop_policy = drop_policy
+        self._items = deque()
+        self._cond = threading.Condition()
+
+        # 통계
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item, timeout=None):
+        """
+        항목 추가
+
+        Args:
+            item: 추가할 항목 (None 불가 - get()의 시간 초과 표시로 사용)
+            timeout (float): block 정책에서 대기 최대 시간 (None이면 무한 대기)
+
+        Returns:
+            bool: 추가 성공 여부 (block 정책에서 시간 초과 시 False)
+        """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.drop_policy == "drop_oldest":
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    ok = self._cond.wait_for(
+                        lambda: len(self._items) < self.maxsize, timeout
+                    )
+                    if not ok:
+                        self.dropped += 1
+                        return False
+
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """
+        항목 꺼내기
+
+        Args:
+            timeout (float): 대기 최대 시간 (None이면 무한 대기)
+
+        Returns:
+            항목, 시간 초과 시 None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def depth(self):
+        """현재 대기 중인 항목 수"""
+        with self._cond:
+            return len(self._items)
+
+    def get_stats(self):
+        """
+        큐 통계 반환
+
+        Returns:
+            dict: 현재 깊이, 누적 추가/버림 수
+        """
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "put": self.put_count,
+                "dropped": self.dropped
+            }
+
+
+class LatencyHistogram:
+    """
+    처리 시간 히스토그램 (thread-safe, 고정 버킷)
+    """
+
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        """
+        Args:
+            buckets_ms (tuple): 버킷 상한 목록 (밀리초, 오름차순)
+        """
+        self.buckets_ms = tuple(buckets_ms)
+        self._counts = [0] * (len(self.buckets_ms) + 1)  # 마지막 칸은 +Inf
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        처리 시간 1건 기록
+
+        Args:
+            seconds (float): 처리 시간 (초)
+        """
+        ms = seconds * 1000.0
+        index = bisect.bisect_left(self.buckets_ms, ms)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum_ms += ms
+            self._count += 1
+            if ms > self._max_ms:
+                self._max_ms = ms
+
+    def _percentile_locked(self, q):
+        if self._count == 0:
+            return None
+        rank = q * self._count
+        cumulative = 0
+        for index, count in enumerate(self._counts):
+            cumulative += count
+            if cumulative >= rank:
+                if index < len(self.buckets_ms):
+                    return min(float(self.buckets_ms[index]), round(self._max_ms, 1))
+                return round(self._max_ms, 1)
+        return round(self._max_ms, 1)
+
+    def percentile(self, q):
+        """
+        분위수 근사값 (해당 버킷 상한)
+
+        Args:
+            q (float): 0~1 사이 분위
+
+        Returns:
+            float | None: 밀리초 (기록 없으면 None)
+        """
+        with self._lock:
+            return self._percentile_locked(q)
+
+    def snapshot(self):
+        """
+        히스토그램 스냅샷 반환
+
+        Returns:
+            dict: count, sum_ms, max_ms, p50_ms, p95_ms, buckets (상한 → 누적 개수)
+        """
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets_ms + ("+Inf",), self._counts):
+                cumulative += count
+                buckets[bound] = cumulative
+
+            return {
+                "count": self._count,
+                "sum_ms": round(self._sum_ms, 3),
+                "max_ms": round(self._max_ms, 3),
+                "p50_ms": self._percentile_locked(0.5),
+                "p95_ms": self._percentile_locked(0.95),
+                "buckets": buckets
+            }
+
+
+class PipelineStage:
+    """
+    파이프라인 단계 워커 스레드
+
+    입력 큐가 없으면 소스 단계로 동작하여 interval_fn() 간격으로 핸들러를 반복 호출한다.
+    핸들러 반환값이 None이 아니면 출력 큐로 전달한다.
+    """
+
+    def __init__(self, name, handler, input_queue=None, output_queue=None,
+                 interval_fn=None, idle_timeout=0.5):
+        """
+        Args:
+            name (str): 단계 이름
+            handler (callable): handler(item) → 결과 (소스 단계는 handler(None))
+            input_queue (StageQueue): 입력 큐 (None이면 소스 단계)
+            output_queue (StageQueue): 출력 큐 (None이면 결과 버림)
+            interval_fn (callable): 소스 단계 반복 간격(초)을 반환하는 함수
+            idle_timeout (float): 입력 대기 최대 시간 (종료 확인 주기)
+        """
+        self.name = name
+        self.handler = handler
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.interval_fn = interval_fn
+        self.idle_timeout = idle_timeout
+
+        self.histogram = LatencyHistogram()
+        self.errors = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """워커 스레드 시작"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            daemon=True,
+            name=f"stage-{self.name}"
+        )
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """워커 스레드 종료 (현재 처리 중인 항목은 끝까지 처리)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            item = None
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=self.idle_timeout)
+                if item is None:
+                    continue
+
+            start = time.perf_counter()
+            try:
+                result = self.handler(item)
+            except Exception as e:
+                self.errors += 1
+                result = None
+                print(f"[Pipeline] {self.name} 단계 오류: {e}")
+            elapsed = time.perf_counter() - start
+            self.histogram.observe(elapsed)
+
+            if result is not None and self.output_queue is not None:
+                self.output_queue.put(result)
+
+            # 소스 단계: 다음 주기까지 대기
+            if self.input_queue is None and self.interval_fn is not None:
+                self._stop_event.wait(max(0.0, self.interval_fn() - elapsed))
+
+    def get_stats(self):
+        """
+        단계 통계 반환
+
+        Returns:
+            dict: 처리 시간 히스토그램 스냅샷 + 오류 수
+        """
+        stats = self.histogram.snapshot()
+        stats["errors"] = self.errors
+        return stats
+
+
+# 테스트 코드
+if __name__ == "__main__":
+    print("파이프라인 테스트 시작...")
+
+    frames = StageQueue("frames", maxsize=2, drop_policy="drop_oldest")
+    counter = {"n": 0}
+
+    def produce(_):
+        counter["n"] += 1
+        return counter["n"]
+
+    def slow_consume(item):
+        time.sleep(0.05)  # 느린 소비자 → 오래된 프레임은 버려짐
+        return None
+
+    source = PipelineStage("capture", produce, output_queue=frames, interval_fn=lambda: 0.01)
+    sink = PipelineStage("detect", slow_consume, input_queue=frames)
+    source.start()
+    sink.start()
+    time.sleep(1.0)
+    source.stop()
+    sink.stop()
+
+    print(f"큐 통계: {frames.get_stats()}")
+    print(f"감지 단계: {sink.get_stats()}")
+    print("파이프라인 테스트 완료")
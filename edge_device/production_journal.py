@@ -0,0 +1,291 @@
+"""
+누룽지 생산량 카운팅 시스템 - 로컬 생산 저널 (SQLite, WAL 모드)
+팬 완료를 네트워크 상태와 무관하게 먼저 로컬에 기록하고, 전송처별 ack 컬럼으로 전달 여부 관리
+
+  - pans 테이블: 팬 완료 1건 = 1행 (시각, 제품, 갯수, 프레임 번호)
+  - firebase_acked / mqtt_acked: 전송처별 전달 완료 표시
+  - 재전송: 미전달 행을 한 번에 모아서 전송 (Firebase는 FirebaseWriter가 제품별 합산 PATCH 1회,
+    MQTT는 전송 단계가 팬 목록 메시지 1개로 전송)
+  - 디스크 예산: 보관 기간이 지난 전달 완료 행 삭제, 예산 초과 시 오래된 행부터 삭제
+    (미전달 행까지 지워야 하면 잃어버린 팬 / 갯수를 경고로 남기고 통계 / 지표로 노출)
+"""
+
+import os
+import sqlite3
+import threading
+import time
+
+from config import JOURNAL_MAX_BYTES, JOURNAL_RETENTION_DAYS
+
+# 전송처 이름 → ack 컬럼
+SINKS = {
+    "firebase": "firebase_acked",
+    "mqtt": "mqtt_acked",
+}
+
+# 한 번에 읽는 미전달 행 수 상한 (메시지/요청 크기 제한)
+PENDING_LIMIT = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,            -- 팬 완료 시각 (Unix ms)
+    product TEXT,                   -- 생산 중 제품 (없으면 NULL → Firebase 전송 대상 아님)
+    count INTEGER NOT NULL,
+    frame_id INTEGER,               -- 팬 완료를 판단한 프레임 번호
+    firebase_acked INTEGER NOT NULL DEFAULT 0,
+    mqtt_acked INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS pans_firebase_pending ON pans (id) WHERE firebase_acked = 0;
+CREATE INDEX IF NOT EXISTS pans_mqtt_pending ON pans (id) WHERE mqtt_acked = 0;
+"""
+
+
+class ProductionJournal:
+    """
+    팬 완료 저널 (thread-safe, 연결 1개 공유)
+    """
+
+    def __init__(self, path, max_bytes=None, retention_days=None):
+        """
+        Args:
+            path (str): 데이터베이스 파일 경로 (":memory:" 가능)
+            max_bytes (int): 디스크 예산 (바이트, WAL 포함)
+            retention_days (float): 전달 완료 행 보관 기간 (일)
+        """
+        self.path = os.path.expanduser(path)
+        self.max_bytes = JOURNAL_MAX_BYTES if max_bytes is None else max_bytes
+        self.retention_days = JOURNAL_RETENTION_DAYS if retention_days is None else retention_days
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory and self.path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        # auto_vacuum은 테이블 생성 전에 설정해야 적용됨 (압축 후 파일 크기 반환용)
+        self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        # 팬 기록은 드물고 유실되면 안 되므로 커밋마다 디스크 동기화
+        self._db.execute("PRAGMA synchronous = FULL")
+        self._db.executescript(SCHEMA)
+
+        # 통계
+        self.rows_deleted = 0
+        self.unsent_pans_dropped = 0    # 디스크 예산 때문에 전달 전에 지운 팬 수
+        self.unsent_count_dropped = 0   # 그 팬들의 누룽지 갯수 합
+
+    def record(self, product, count, frame_id=None, ts=None):
+        """
+        팬 완료 1건 기록
+
+        Args:
+            product (str | None): 생산 중 제품
+            count (int): 팬 갯수
+            frame_id (int): 프레임 번호
+            ts (int): 완료 시각 (Unix ms, None이면 현재)
+
+        Returns:
+            int: 저널 행 id
+        """
+        ts = int(time.time() * 1000) if ts is None else int(ts)
+        # 제품이 없으면 Firebase에 기록할 곳이 없으므로 바로 전달 완료 처리
+        firebase_acked = 0 if product else 1
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO pans (ts, product, count, frame_id, firebase_acked) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (ts, product, int(count), frame_id, firebase_acked)
+            )
+            return cursor.lastrowid
+
+    def pending(self, sink, limit=PENDING_LIMIT):
+        """
+        미전달 행 조회 (오래된 순)
+
+        Args:
+            sink (str): "firebase" | "mqtt"
+            limit (int): 최대 행 수
+
+        Returns:
+            list[dict]: {"id", "ts", "product", "count", "frame_id"}
+        """
+        column = SINKS[sink]
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, ts, product, count, frame_id FROM pans "
+                f"WHERE {column} = 0 ORDER BY id LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"id": r[0], "ts": r[1], "product": r[2], "count": r[3], "frame_id": r[4]}
+            for r in rows
+        ]
+
+    def pending_count(self, sink):
+        """미전달 행 수"""
+        column = SINKS[sink]
+        with self._lock:
+            return self._db.execute(
+                f"SELECT COUNT(*) FROM pans WHERE {column} = 0"
+            ).fetchone()[0]
+
+    def ack(self, sink, ids):
+        """
+        전달 완료 표시
+
+        Args:
+            sink (str): "firebase" | "mqtt"
+            ids (list[int]): 저널 행 id 목록
+        """
+        if not ids:
+            return
+        column = SINKS[sink]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                f"UPDATE pans SET {column} = 1 WHERE id = ?",
+                [(i,) for i in ids]
+            )
+            self._db.execute("COMMIT")
+
+    def size_bytes(self):
+        """데이터베이스 + WAL 파일 크기"""
+        if self.path == ":memory:":
+            with self._lock:
+                page_count = self._db.execute("PRAGMA page_count").fetchone()[0]
+                page_size = self._db.execute("PRAGMA page_size").fetchone()[0]
+            return page_count * page_size
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += os.path.getsize(self.path + suffix)
+            except OSError:
+                pass
+        return total
+
+    def compact(self):
+        """
+        보관 기간이 지난 전달 완료 행 삭제 + 디스크 예산 유지
+
+        예산을 넘으면 전달 완료 행을 오래된 순으로 더 지우고,
+        그래도 넘으면 (장기간 오프라인) 미전달 행도 오래된 순으로 삭제하고,
+        잃어버린 팬 / 갯수를 경고로 남긴다 (unsent_pans_dropped / unsent_count_dropped).
+
+        Returns:
+            int: 삭제한 행 수
+        """
+        done = " AND ".join(f"{column} = 1" for column in SINKS.values())
+        cutoff = int((time.time() - self.retention_days * 86400) * 1000)
+        deleted = 0
+        dropped_pans = dropped_count = 0
+
+        with self._lock:
+            deleted += self._db.execute(
+                f"DELETE FROM pans WHERE {done} AND ts < ?", (cutoff,)
+            ).rowcount
+            self._reclaim()
+
+        for condition in (done, "1"):
+            while self.size_bytes() > self.max_bytes:
+                with self._lock:
+                    chunk = f"SELECT id FROM pans WHERE {condition} ORDER BY id LIMIT 500"
+                    unsent, pieces = self._db.execute(
+                        f"SELECT COUNT(*), COALESCE(SUM(count), 0) FROM pans "
+                        f"WHERE id IN ({chunk}) AND NOT ({done})"
+                    ).fetchone()
+                    removed = self._db.execute(
+                        f"DELETE FROM pans WHERE id IN ({chunk})"
+                    ).rowcount
+                    self._reclaim()
+                if removed == 0:
+                    break
+                dropped_pans += unsent
+                dropped_count += pieces
+                deleted += removed
+
+        if dropped_pans:
+            self.unsent_pans_dropped += dropped_pans
+            self.unsent_count_dropped += dropped_count
+            print(f"[Journal] ⚠️ 디스크 예산 초과 - 전달 전 팬 {dropped_pans}건 (누룽지 {dropped_count}개) "
+                  f"기록 삭제 → 이 생산량은 Firebase / MQTT에 반영되지 않음")
+
+        self.rows_deleted += deleted
+        return deleted
+
+    def _reclaim(self):
+        """빈 페이지 반환 + WAL 비우기 - 잠금을 잡은 상태에서 호출"""
+        self._db.execute("PRAGMA incremental_vacuum")
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def get_stats(self):
+        """
+        저널 통계 반환
+
+        Returns:
+            dict: 전체 행 수, 전송처별 미전달 수, 파일 크기
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT COUNT(*) FROM pans").fetchone()[0]
+        stats = {"rows": rows, "size_bytes": self.size_bytes(), "deleted": self.rows_deleted,
+                 "unsent_pans_dropped": self.unsent_pans_dropped,
+                 "unsent_count_dropped": self.unsent_count_dropped}
+        for sink in SINKS:
+            stats[f"{sink}_pending"] = self.pending_count(sink)
+        return stats
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# 테스트 코드: 하루치 미전달 기록의 일괄 재전송 비용 확인
+if __name__ == "__main__":
+    import tempfile
+    import firebase_client
+    from firebase_local_server import LocalFirebaseServer
+
+    PANS = 2000  # 하루 생산 팬 수 (넉넉히)
+    path = os.path.join(tempfile.mkdtemp(), "journal.db")
+    journal = ProductionJournal(path, max_bytes=5 * 1024 * 1024)
+
+    print(f"생산 저널 테스트 시작... ({path})")
+    start = time.perf_counter()
+    expected = {}
+    for i in range(PANS):
+        product = "누룽지" if i % 3 else "현미누룽지"
+        expected[product] = expected.get(product, 0) + 5
+        journal.record(product, 5, frame_id=i * 40)
+    record_ms = (time.perf_counter() - start) * 1000 / PANS
+    print(f"기록: {PANS}건, {record_ms:.2f} ms/건 (WAL + synchronous=FULL)")
+
+    # 오프라인 동안 쌓인 기록을 한 번에 재전송 (제품별 합산 → 다중 경로 PATCH 1회)
+    server = LocalFirebaseServer(port=0).start()
+    firebase_client.FIREBASE_DATABASE_URL = server.url
+    firebase_client.DEBUG_MODE = False
+
+    start = time.perf_counter()
+    rows = journal.pending("firebase")
+    totals = {}
+    for row in rows:
+        totals[row["product"]] = totals.get(row["product"], 0) + row["count"]
+    updates = {}
+    for product, total in totals.items():
+        firebase_client.merge_updates(updates, firebase_client.production_update(product, total))
+    if firebase_client.patch_multi(updates):
+        journal.ack("firebase", [row["id"] for row in rows])
+    replay_s = time.perf_counter() - start
+
+    for product, total in expected.items():
+        actual = server.database.get(f"products/{product}/todayProduction")
+        print(f"{product}: 기대 {total}, 실제 {actual}")
+    print(f"재전송: {len(rows)}건 → 요청 {server.get_stats().get('PATCH', 0)}회, {replay_s:.2f}초")
+
+    journal.ack("mqtt", [row["id"] for row in journal.pending("mqtt")])
+    journal.retention_days = 0
+    print(f"압축 전: {journal.get_stats()}")
+    journal.compact()
+    print(f"압축 후: {journal.get_stats()}")
+
+    journal.close()
+    server.stop()
@@ -0,0 +1,161 @@
+"""
+누룽지 생산량 카운팅 시스템 - MQTT 카운트 전송 정책 (변경 시 전송 + 하트비트)
+매 캡처마다 같은 내용을 보내지 않고, 바뀐 경우에만 전체 메시지를 보냄
+
+  - 변경: 개수가 바뀌었거나 박스가 허용 오차보다 많이 움직임 → 즉시 전체 메시지 (QoS 1)
+  - 하트비트: 변경이 없으면 heartbeat_interval마다 개수만 담은 작은 메시지 (QoS 0)
+  - 변경 직후 settle_frames 동안은 매 프레임 하트비트 (PC의 중앙값 안정화 윈도우가 새 값으로 채워지도록)
+  - 모든 메시지에 순번(seq)을 붙여 PC가 누락을 감지
+"""
+
+import time
+
+from config import MQTT_COUNT_HEARTBEAT_INTERVAL, MQTT_BOX_TOLERANCE, STABILIZATION_WINDOW
+
+# 결정 결과
+SEND_CHANGE = "change"
+SEND_HEARTBEAT = "heartbeat"
+
+
+def _within(old, new, tolerance):
+    return all(abs(int(old[field]) - int(new[field])) <= tolerance
+               for field in ("x", "y", "w", "h"))
+
+
+def boxes_changed(previous, current, tolerance):
+    """
+    박스 목록 변경 여부 (이번 박스마다 허용 오차 안의 이전 박스를 하나씩 짝지음)
+
+    Args:
+        previous (list | numpy.ndarray): 마지막으로 보낸 박스 목록 (dict 리스트 또는 구조화 배열)
+        current (list | numpy.ndarray): 이번 박스 목록
+        tolerance (int): 허용 오차 (픽셀)
+
+    Returns:
+        bool: 박스 수가 다르거나 짝이 없는 박스가 하나라도 있으면 True
+    """
+    if len(previous) != len(current):
+        return True
+    unmatched = list(previous)
+    for new in current:
+        for i, old in enumerate(unmatched):
+            if _within(old, new, tolerance):
+                del unmatched[i]
+                break
+        else:
+            return True
+    return False
+
+
+class CountPublishPolicy:
+    """
+    카운트 메시지 전송 여부 결정 (전송 단계 스레드 1개에서만 호출)
+    """
+
+    def __init__(self, heartbeat_interval=None, box_tolerance=None, settle_frames=None):
+        """
+        Args:
+            heartbeat_interval (float): 변경이 없을 때 하트비트 간격 (초)
+            box_tolerance (int): 박스 이동 허용 오차 (픽셀)
+            settle_frames (int): 변경 직후 매 프레임 하트비트를 보낼 프레임 수
+        """
+        self.heartbeat_interval = (MQTT_COUNT_HEARTBEAT_INTERVAL if heartbeat_interval is None
+                                   else heartbeat_interval)
+        self.box_tolerance = MQTT_BOX_TOLERANCE if box_tolerance is None else box_tolerance
+        self.settle_frames = (STABILIZATION_WINDOW - 1 if settle_frames is None
+                              else settle_frames)
+
+        self.seq = 0
+        self._last_count = None
+        self._last_boxes = None
+        self._last_sent_at = 0.0
+        self._settle_remaining = 0
+
+        # 통계
+        self.changes = 0
+        self.heartbeats = 0
+        self.suppressed = 0
+
+    def decide(self, count, boxes, now=None):
+        """
+        이번 결과를 보낼지 결정
+
+        Args:
+            count (int): 감지된 개수
+            boxes (list | numpy.ndarray): 박스 목록 (dict 리스트 또는 OBJECT_DTYPE 구조화 배열)
+            now (float): 현재 시각 (None이면 time.monotonic())
+
+        Returns:
+            str | None: SEND_CHANGE | SEND_HEARTBEAT | None (전송 생략)
+        """
+        now = time.monotonic() if now is None else now
+
+        if (self._last_count is None or count != self._last_count
+                or boxes_changed(self._last_boxes, boxes, self.box_tolerance)):
+            self._last_count = count
+            self._last_boxes = boxes
+            self._settle_remaining = self.settle_frames
+            self.changes += 1
+            return SEND_CHANGE
+
+        if self._settle_remaining > 0 or now - self._last_sent_at >= self.heartbeat_interval:
+            self._settle_remaining = max(0, self._settle_remaining - 1)
+            self.heartbeats += 1
+            return SEND_HEARTBEAT
+
+        self.suppressed += 1
+        return None
+
+    def next_seq(self, now=None):
+        """전송 직전 호출 - 순번 증가 + 마지막 전송 시각 기록"""
+        self._last_sent_at = time.monotonic() if now is None else now
+        self.seq += 1
+        return self.seq
+
+    def reset(self):
+        """다음 결과를 무조건 전체 메시지로 보내도록 초기화 (재연결 시)"""
+        self._last_count = None
+        self._last_boxes = None
+
+    def get_stats(self):
+        """
+        전송 정책 통계 반환
+
+        Returns:
+            dict: 변경/하트비트/생략 횟수, 생략 비율
+        """
+        total = self.changes + self.heartbeats + self.suppressed
+        return {
+            "seq": self.seq,
+            "changes": self.changes,
+            "heartbeats": self.heartbeats,
+            "suppressed": self.suppressed,
+            "sent_ratio": round((self.changes + self.heartbeats) / total, 3) if total else 0.0
+        }
+
+
+# 테스트 코드: 정상 상태(같은 결과 반복)에서 전송량 감소 확인
+if __name__ == "__main__":
+    import random
+
+    FRAMES = 3600  # 1초 간격 1시간
+    policy = CountPublishPolicy()
+    boxes = [{"x": 100 + 120 * i, "y": 200, "w": 80, "h": 60} for i in range(12)]
+
+    print(f"카운트 전송 정책 테스트 시작... ({FRAMES}프레임, 1초 간격)")
+    sent = 0
+    for t in range(FRAMES):
+        # 감지 흔들림 (±3px), 10분마다 누룽지 1개 추가
+        count = 12 + t // 600
+        jittered = [
+            {k: v + random.randint(-3, 3) for k, v in box.items()}
+            for box in boxes[:12]
+        ] + [{"x": 100 + 120 * i, "y": 400, "w": 80, "h": 60} for i in range(count - 12)]
+        decision = policy.decide(count, jittered, now=float(t))
+        if decision is not None:
+            policy.next_seq(now=float(t))
+            sent += 1
+
+    stats = policy.get_stats()
+    print(f"전송 {sent}회 / {FRAMES}프레임 (변경 {stats['changes']}, 하트비트 {stats['heartbeats']})")
+    print(f"감소율: {(1 - sent / FRAMES) * 100:.1f}%")
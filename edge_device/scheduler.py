@@ -0,0 +1,338 @@
+"""
+누룽지 생산량 카운팅 시스템 - 주기 작업 스케줄러
+Firebase 폴링 / 장치 상태 / MQTT 상태 / 통계 출력 같은 주기 작업을 캡처 경로 밖의 워커 스레드에서 실행
+
+  - 작업마다 간격(interval), 지터(jitter), 시간 제한(timeout), 우선순위(priority) 지정
+  - 예정 시각은 간격 기준으로 계산 (실행 시간만큼 밀리지 않음), 두 번째 회차부터 0~jitter초 무작위 추가
+    → 같은 간격의 작업이 같은 순간에 몰리지 않음
+  - 실행할 작업이 여러 개면 우선순위(숫자가 작을수록 먼저)대로 워커에 배정
+  - 이전 실행이 끝나지 않았는데 다음 예정 시각이 되면 그 회차는 건너뜀 (skipped)
+  - 실행 시간이 간격보다 길면 overrun, 시간 제한보다 길면 timeout으로 기록
+    (파이썬 스레드는 강제 종료할 수 없으므로 제한을 넘긴 작업은 끝날 때까지 다음 회차를 건너뜀)
+  - asyncio 실행 방식에서는 run_async()가 디스패치 스레드 대신 이벤트 루프에서 예정 시각을 관리
+"""
+
+import asyncio
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+
+from pipeline import LatencyHistogram
+from config import SCHEDULER_WORKERS
+
+
+class Job:
+    """주기 작업 1개 (설정 + 통계)"""
+
+    def __init__(self, name, fn, interval, jitter=0.0, timeout=None, priority=0):
+        """
+        Args:
+            name (str): 작업 이름
+            fn (callable): 실행할 함수 (인자 없음, 블로킹 호출 가능)
+            interval (float): 실행 간격 (초)
+            jitter (float): 예정 시각에 더할 무작위 지연 상한 (초)
+            timeout (float): 실행 시간 제한 (초, None이면 제한 없음)
+            priority (int): 우선순위 (작을수록 먼저)
+        """
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.priority = priority
+
+        self.next_run = 0.0     # 다음 예정 시각 (monotonic, 지터 포함)
+        self._base = 0.0        # 지터를 뺀 예정 시각 (다음 회차 계산 기준)
+        self._scheduled_at = 0.0
+        self.queued = False
+        self.running_since = None
+
+        # 통계
+        self.histogram = LatencyHistogram()
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.timeouts = 0
+        self.last_lag_ms = None  # 예정 시각 → 실제 시작까지 지연
+
+    def get_stats(self):
+        """
+        작업 통계 반환
+
+        Returns:
+            dict: 실행/오류/건너뜀/overrun/timeout 수, 처리 시간 p50/p95/최대, 마지막 시작 지연
+        """
+        snapshot = self.histogram.snapshot()
+        return {
+            "interval": self.interval,
+            "priority": self.priority,
+            "runs": self.runs,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "overruns": self.overruns,
+            "timeouts": self.timeouts,
+            "running": self.running_since is not None,
+            "p50_ms": snapshot["p50_ms"],
+            "p95_ms": snapshot["p95_ms"],
+            "max_ms": snapshot["max_ms"],
+            "last_lag_ms": self.last_lag_ms
+        }
+
+
+class Scheduler:
+    """
+    주기 작업 스케줄러 (디스패치 스레드 1개 + 워커 스레드 풀)
+
+    사용법:
+        scheduler = Scheduler()
+        scheduler.add_job("status", push_status, interval=30, jitter=3, timeout=10, priority=2)
+        scheduler.start()
+        ...
+        scheduler.trigger("status")   # 다음 주기를 기다리지 않고 바로 실행
+        scheduler.stop()
+    """
+
+    def __init__(self, workers=SCHEDULER_WORKERS):
+        """
+        Args:
+            workers (int): 작업 실행 워커 스레드 수
+        """
+        self.workers = max(1, workers)
+        self._jobs = {}
+        self._heap = []           # (예정 시각, 순번, 작업) - 시각이 바뀐 항목은 꺼낼 때 버림
+        self._ready = queue.PriorityQueue()
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._threads = []
+        self._running = False
+        self._wakeup = None       # asyncio 실행 방식: 예정 시각이 바뀌면 루프 깨우기
+
+    def add_job(self, name, fn, interval, jitter=0.0, timeout=None, priority=0, delay=0.0):
+        """
+        작업 등록 (첫 실행은 지터 없이 delay초 후 - 시작 직후 조회가 필요한 작업은 delay=0)
+
+        Returns:
+            Job: 등록된 작업
+        """
+        job = Job(name, fn, interval, jitter, timeout, priority)
+        with self._cond:
+            self._jobs[name] = job
+            self._schedule(job, time.monotonic() + delay, jitter=False)
+        return job
+
+    def trigger(self, name):
+        """다음 예정 시각을 기다리지 않고 바로 실행 요청 (실행 중이면 해당 회차는 건너뜀)"""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                return
+            job.next_run = job._base = time.monotonic()
+            heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+            self._notify()
+
+    def _schedule(self, job, base, jitter=True):
+        """예정 시각 설정 - 잠금을 잡은 상태에서 호출"""
+        job._base = base
+        job.next_run = base + (random.uniform(0, job.jitter) if jitter and job.jitter else 0.0)
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job))
+        self._notify()
+
+    def _notify(self):
+        self._cond.notify_all()
+        if self._wakeup is not None:
+            self._wakeup()
+
+    def _pop_due(self, now):
+        """
+        예정 시각이 된 작업을 꺼내고 다음 회차 예약 - 잠금을 잡은 상태에서 호출
+
+        Returns:
+            list: 실행할 작업 (우선순위 순)
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            when, _, job = heapq.heappop(self._heap)
+            if when != job.next_run:
+                continue  # trigger()로 시각이 바뀐 이전 항목
+
+            if job.queued or job.running_since is not None:
+                job.skipped += 1
+            else:
+                job.queued = True
+                job._scheduled_at = when
+                due.append(job)
+
+            base = job._base + job.interval
+            if base <= now:
+                base = now + job.interval  # 오래 밀렸으면 몰아서 실행하지 않음
+            self._schedule(job, base)
+        due.sort(key=lambda j: j.priority)
+        return due
+
+    def _execute(self, job):
+        """작업 1회 실행 (워커 스레드 / asyncio executor)"""
+        start = time.monotonic()
+        with self._cond:
+            job.queued = False
+            job.running_since = start
+            job.last_lag_ms = round((start - job._scheduled_at) * 1000, 1)
+        try:
+            job.fn()
+        except Exception as e:
+            job.errors += 1
+            print(f"[Scheduler] {job.name} 작업 오류: {e}")
+        finally:
+            elapsed = time.monotonic() - start
+            job.histogram.observe(elapsed)
+            with self._cond:
+                job.runs += 1
+                job.running_since = None
+                if elapsed > job.interval:
+                    job.overruns += 1
+                if job.timeout is not None and elapsed > job.timeout:
+                    job.timeouts += 1
+                    print(f"[Scheduler] {job.name} 작업 시간 초과: {elapsed:.1f}초 (제한 {job.timeout}초)")
+
+    # ------------------------------------------------------------------
+    # 스레드 실행
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """디스패치 스레드 + 워커 스레드 시작"""
+        self._running = True
+        self._threads = [threading.Thread(target=self._dispatch_loop, daemon=True,
+                                          name="scheduler-dispatch")]
+        self._threads += [threading.Thread(target=self._worker_loop, daemon=True,
+                                           name=f"scheduler-worker-{i}")
+                          for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """스레드 종료 (실행 중인 작업은 끝까지 실행)"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for _ in range(self.workers):
+            self._ready.put((float("inf"), next(self._seq), None))
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    if self._heap and self._heap[0][0] <= now:
+                        break
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                if not self._running:
+                    return
+                due = self._pop_due(now)
+            for job in due:
+                self._ready.put((job.priority, next(self._seq), job))
+
+    def _worker_loop(self):
+        while True:
+            _, _, job = self._ready.get()
+            if job is None:
+                return
+            self._execute(job)
+
+    # ------------------------------------------------------------------
+    # asyncio 실행
+    # ------------------------------------------------------------------
+
+    async def run_async(self, executor=None):
+        """
+        [asyncio 실행 방식] 이벤트 루프에서 예정 시각 관리, 작업은 executor에서 실행 (취소될 때까지)
+
+        Args:
+            executor (concurrent.futures.Executor): 작업 실행용 (None이면 루프 기본값)
+        """
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        self._wakeup = lambda: loop.call_soon_threadsafe(changed.set)
+        try:
+            while True:
+                with self._cond:
+                    now = time.monotonic()
+                    due = self._pop_due(now)
+                    wait = self._heap[0][0] - now if self._heap else None
+                for job in due:
+                    loop.run_in_executor(executor, self._execute, job)
+                changed.clear()
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._wakeup = None
+
+    # ------------------------------------------------------------------
+    # 통계
+    # ------------------------------------------------------------------
+
+    def jobs(self):
+        """등록된 작업 목록"""
+        with self._cond:
+            return list(self._jobs.values())
+
+    def stuck_jobs(self):
+        """
+        시간 제한을 넘겨 아직 실행 중인 작업
+
+        Returns:
+            list: [(이름, 실행 시간(초))]
+        """
+        now = time.monotonic()
+        with self._cond:
+            return [
+                (job.name, round(now - job.running_since, 1)) for job in self._jobs.values()
+                if job.running_since is not None and job.timeout is not None
+                and now - job.running_since > job.timeout
+            ]
+
+    def get_stats(self):
+        """
+        작업별 통계
+
+        Returns:
+            dict: {작업 이름: Job.get_stats()}
+        """
+        return {job.name: job.get_stats() for job in self.jobs()}
+
+
+# 테스트 코드: 빠른 작업 / 느린 작업 / 오류 작업을 함께 실행하며 건너뜀·overrun·우선순위 확인
+if __name__ == "__main__":
+    print("스케줄러 테스트 시작... (5초)")
+
+    def fast():
+        pass
+
+    def slow():
+        time.sleep(0.35)  # 간격(0.2초)보다 김 → overrun + 다음 회차 건너뜀
+
+    def flaky():
+        raise RuntimeError("네트워크 오류")
+
+    scheduler = Scheduler(workers=2)
+    scheduler.add_job("fast", fast, interval=0.1, jitter=0.02, priority=0)
+    scheduler.add_job("slow", slow, interval=0.2, timeout=0.3, priority=1)
+    scheduler.add_job("flaky", flaky, interval=1.0, priority=2)
+    scheduler.start()
+
+    time.sleep(2.5)
+    scheduler.trigger("flaky")
+    time.sleep(2.5)
+    scheduler.stop()
+
+    for name, stats in scheduler.get_stats().items():
+        print(f"{name:>6}: 실행 {stats['runs']}회, 건너뜀 {stats['skipped']}, overrun {stats['overruns']}, "
+              f"시간 초과 {stats['timeouts']}, 오류 {stats['errors']}, "
+              f"p95 {stats['p95_ms']} ms, 마지막 시작 지연 {stats['last_lag_ms']} ms")
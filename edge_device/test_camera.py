@@ -5,6 +5,7 @@
 
 import time
 import os
+import glob
 from camera_capture import CameraCapture
 from detector import NurungjiDetector
 import cv2
@@ -151,7 +152,7 @@ def test_calibration_helper():
             # 결과 출력
             print(f"[프레임 #{frame_count:04d}] 감지: {count}개", end="")
 
-            if boxes:
+            if len(boxes):
                 print(f" - 상세:")
                 for i, box in enumerate(boxes, 1):
                     print(f"    #{i}: 위치=({box['x']}, {box['y']}), "
@@ -195,6 +196,67 @@ def test_calibration_helper():
         print(f"\n캘리브레이션 이미지 저장 위치: {output_dir}")
 
 
+def test_backend_regression(image_dir):
+    """
+    감지 백엔드 회귀 테스트 - 저장된 이미지 세트에서 contours / components 결과 비교
+    (components 면적은 보정 추정값이라 MIN_AREA / MAX_AREA에 1% 이내로 붙은 블롭은 판정이 다를 수 있음
+     → 불일치가 나오면 임계값이 실제 누룽지 크기에 너무 가까운 것)
+
+    Args:
+        image_dir (str): 테스트 이미지 디렉토리 (*.jpg, *.png)
+
+    Returns:
+        bool: 모든 이미지에서 개수가 일치하면 True
+
+    Raises:
+        AssertionError: 두 백엔드의 개수가 다른 이미지가 있는 경우
+    """
+    print("\n" + "=" * 50)
+    print("테스트 4: 감지 백엔드 회귀 테스트 (contours vs components)")
+    print("=" * 50)
+
+    paths = sorted(
+        glob.glob(os.path.join(image_dir, "*.jpg"))
+        + glob.glob(os.path.join(image_dir, "*.png"))
+    )
+    if not paths:
+        print(f"✗ 이미지 없음: {image_dir}")
+        return False
+
+    detector = NurungjiDetector()
+    mismatches = []
+    elapsed = {"contours": 0.0, "components": 0.0}
+
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"  건너뜀 (읽기 실패): {path}")
+            continue
+        frame = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        counts = {}
+        for backend in ("contours", "components"):
+            start = time.perf_counter()
+            counts[backend], _ = detector.detect(frame, backend=backend)
+            elapsed[backend] += time.perf_counter() - start
+
+        status = "✓" if counts["contours"] == counts["components"] else "✗"
+        print(f"  {status} {os.path.basename(path)}: "
+              f"contours={counts['contours']}, components={counts['components']}")
+        if status == "✗":
+            mismatches.append(path)
+
+    print(f"\n결과: {len(paths) - len(mismatches)}/{len(paths)} 일치")
+    for backend, total in elapsed.items():
+        print(f"  - {backend} 평균: {total / len(paths) * 1000:.1f} ms/프레임")
+
+    assert not mismatches, (
+        f"백엔드 결과 불일치 {len(mismatches)}개: "
+        + ", ".join(os.path.basename(path) for path in mismatches)
+    )
+    return True
+
+
 def print_menu():
     """
     메뉴 출력
@@ -206,6 +268,7 @@ def print_menu():
     print("  1. 카메라 기본 동작 확인")
     print("  2. 객체 감지 테스트 (10개 프레임)")
     print("  3. 캘리브레이션 도우미 (실시간 감지)")
+    print("  4. 감지 백엔드 회귀 테스트 (이미지 세트)")
     print("  0. 종료")
     print()
 
@@ -227,6 +290,13 @@ def main():
         elif choice == "3":
             test_calibration_helper()
 
+        elif choice == "4":
+            image_dir = input("이미지 디렉토리 [/tmp/nurungji_calibration]: ").strip()
+            try:
+                test_backend_regression(image_dir or "/tmp/nurungji_calibration")
+            except AssertionError as e:
+                print(f"✗ {e}")
+
         elif choice == "0":
             print("\n종료합니다.")
             break
@@ -0,0 +1,370 @@
+"""
+누룽지 생산량 카운팅 시스템 - 프레임 간 객체 추적 (팬에 놓이는 누룽지 도착 이벤트)
+한 프레임에 보이는 윤곽선 수 대신, 팬에 새로 놓인 조각(도착)을 세어 겹치거나 쌓인 조각도 셈
+
+  - 감지 박스(valid_objects)를 이전 추적 박스와 IoU로 짝짓고, 남은 것은 중심 거리로 짝지음 (탐욕적 매칭)
+  - 새 박스가 confirm_frames 연속으로 보이면 도착 1건 (글레어 / 손 1프레임은 도착 아님)
+  - 추적 중인 박스의 면적이 stack_growth배 이상으로 confirm_frames 연속 커지면
+    그 위에 조각이 쌓인 것으로 보고 도착 1건 추가 (겹친 조각은 따로 보이지 않음)
+    단, 커진 박스가 다른 추적 박스와 겹치면 옆 조각과 붙어 보이는 것이라 쌓임이 아님
+  - 확정된 조각은 가려져도 팬이 끝날 때(reset)까지 유지 → 다시 보이면 같은 조각으로 짝지음
+    (max_misses 번 넘게 안 보인 조각은 IoU로만 짝지음 - 근처에 새로 놓인 조각을 가로채지 않도록)
+  - IoU / 거리 행렬은 NumPy로 한 번에 계산, 서로 최대 IoU인 쌍은 루프 없이 확정
+    → 조각 30개 기준 프레임당 약 0.1 ms (데스크톱, 라즈베리 파이 4는 수 배)
+"""
+
+import time
+
+import numpy as np
+
+from pipeline import LatencyHistogram
+from config import (
+    TRACKING_ENABLED,
+    TRACK_IOU_THRESHOLD,
+    TRACK_MAX_DISTANCE,
+    TRACK_CONFIRM_FRAMES,
+    TRACK_MAX_MISSES,
+    TRACK_STACK_GROWTH
+)
+
+# 처리 시간 히스토그램 구간 (ms) - 목표가 1 ms 미만이라 기본 구간보다 잘게
+TRACKER_BUCKETS_MS = (0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10)
+
+# 도착 종류
+ARRIVAL_NEW = "new"          # 따로 보이는 새 조각
+ARRIVAL_STACKED = "stacked"  # 추적 중인 조각 위에 겹쳐 놓인 조각 (면적 증가)
+
+
+def boxes_to_array(boxes):
+    """
+    감지 박스 → (N, 5) float 배열 [x, y, w, h, area]
+
+    Args:
+        boxes (list | numpy.ndarray): dict 리스트 또는 OBJECT_DTYPE 구조화 배열
+
+    Returns:
+        numpy.ndarray: (N, 5) 배열 (area 필드가 없으면 w*h)
+    """
+    if isinstance(boxes, np.ndarray) and boxes.dtype.names:
+        array = np.empty((len(boxes), 5), dtype=np.float64)
+        for i, field in enumerate(("x", "y", "w", "h", "area")):
+            array[:, i] = boxes[field]
+        return array
+    return np.array(
+        [(b["x"], b["y"], b["w"], b["h"], b.get("area", b["w"] * b["h"])) for b in boxes],
+        dtype=np.float64
+    ).reshape(-1, 5)
+
+
+def iou_matrix(a, b):
+    """
+    박스 IoU 행렬
+
+    Args:
+        a (numpy.ndarray): (N, 4+) [x, y, w, h, ...]
+        b (numpy.ndarray): (M, 4+) [x, y, w, h, ...]
+
+    Returns:
+        numpy.ndarray: (N, M) IoU
+    """
+    ax0, ay0 = a[:, 0:1], a[:, 1:2]
+    ax1, ay1 = ax0 + a[:, 2:3], ay0 + a[:, 3:4]
+    bx0, by0 = b[:, 0], b[:, 1]
+    bx1, by1 = bx0 + b[:, 2], by0 + b[:, 3]
+    inter = (np.maximum(np.minimum(ax1, bx1) - np.maximum(ax0, bx0), 0)
+             * np.maximum(np.minimum(ay1, by1) - np.maximum(ay0, by0), 0))
+    union = a[:, 2:3] * a[:, 3:4] + b[:, 2] * b[:, 3] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+class Track:
+    """추적 중인 조각 1개 (박스 좌표는 ObjectTracker의 배열에 같은 순서로 보관)"""
+
+    __slots__ = ("id", "ref_area", "hits", "misses", "confirmed", "grow_hits")
+
+    def __init__(self, track_id, area):
+        self.id = track_id
+        self.ref_area = area      # 쌓임 판단 기준 면적 (확정 / 마지막 쌓임 시점)
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+        self.grow_hits = 0
+
+
+class ObjectTracker:
+    """
+    프레임 간 객체 추적 + 도착 이벤트 (감지 단계 스레드 1개에서만 호출)
+    """
+
+    def __init__(self, enabled=None, iou_threshold=None, max_distance=None,
+                 confirm_frames=None, max_misses=None, stack_growth=None):
+        """
+        Args:
+            enabled (bool): 추적 사용 여부 (None이면 config 사용)
+            iou_threshold (float): 같은 조각으로 볼 최소 IoU
+            max_distance (float): IoU로 못 짝지은 박스의 중심 이동 허용 거리 (박스 대각선 대비 비율)
+            confirm_frames (int): 도착으로 확정할 연속 감지 횟수
+            max_misses (int): 이 횟수보다 오래 안 보인 조각은 IoU로만 다시 짝지음 (추적은 팬 끝까지 유지)
+            stack_growth (float): 쌓임으로 볼 면적 증가 배율 (0이면 쌓임 판단 안 함)
+        """
+        self.enabled = TRACKING_ENABLED if enabled is None else enabled
+        self.iou_threshold = iou_threshold or TRACK_IOU_THRESHOLD
+        self.max_distance = max_distance or TRACK_MAX_DISTANCE
+        self.confirm_frames = confirm_frames or TRACK_CONFIRM_FRAMES
+        self.max_misses = TRACK_MAX_MISSES if max_misses is None else max_misses
+        self.stack_growth = TRACK_STACK_GROWTH if stack_growth is None else stack_growth
+
+        self.tracks = []
+        self._boxes = np.empty((0, 5))  # tracks와 같은 순서의 [x, y, w, h, area]
+        self._next_id = 1
+
+        # 통계
+        self.updates = 0
+        self.arrivals = {ARRIVAL_NEW: 0, ARRIVAL_STACKED: 0}
+        self.histogram = LatencyHistogram(TRACKER_BUCKETS_MS)
+
+    def reset(self):
+        """추적 초기화 (팬 완료 후 / 빈 팬)"""
+        self.tracks = []
+        self._boxes = np.empty((0, 5))
+
+    def update(self, boxes):
+        """
+        감지 결과 1프레임 반영
+
+        Args:
+            boxes (list | numpy.ndarray): 감지 박스 (dict 리스트 또는 OBJECT_DTYPE 구조화 배열)
+
+        Returns:
+            list: 이번 프레임의 도착 이벤트 [{"track_id", "kind", "x", "y", "w", "h"}]
+        """
+        start = time.perf_counter()
+        detections = boxes_to_array(boxes)
+        matches = self._associate(detections)
+
+        arrivals = []
+        areas = detections[:, 4].tolist()
+        matched_t = {t for t, _ in matches}
+        for t, d in matches:
+            track = self.tracks[t]
+            area = areas[d]
+            track.hits += 1
+            track.misses = 0
+            if not track.confirmed:
+                if track.hits >= self.confirm_frames:
+                    track.confirmed = True
+                    track.ref_area = area
+                    arrivals.append(self._arrival(track, detections[d], ARRIVAL_NEW))
+            elif (self.stack_growth and area >= track.ref_area * self.stack_growth
+                  and not self._overlaps_other(t, detections[d])):
+                track.grow_hits += 1
+                if track.grow_hits >= self.confirm_frames:
+                    track.grow_hits = 0
+                    track.ref_area = area
+                    arrivals.append(self._arrival(track, detections[d], ARRIVAL_STACKED))
+            else:
+                track.grow_hits = 0
+
+        # 짝지은 추적은 새 박스로, 놓친 추적은 마지막 박스 유지 (확정 전이면 바로 버림)
+        # 확정된 조각은 가려진 동안에도 팬이 끝날 때까지 유지 (다시 보이면 새 도착이 아님)
+        boxes = self._boxes
+        if matches:
+            t_idx, d_idx = zip(*matches)
+            boxes[list(t_idx)] = detections[list(d_idx)]
+        keep = []
+        for t, track in enumerate(self.tracks):
+            if t not in matched_t:
+                track.misses += 1
+                if not track.confirmed:
+                    continue
+            keep.append(t)
+
+        used = {d for _, d in matches}
+        new = [d for d in range(len(detections)) if d not in used]
+        tracks = [self.tracks[t] for t in keep]
+        for d in new:
+            track = Track(self._next_id, areas[d])
+            self._next_id += 1
+            tracks.append(track)
+            if self.confirm_frames <= 1:
+                track.confirmed = True
+                arrivals.append(self._arrival(track, detections[d], ARRIVAL_NEW))
+
+        self.tracks = tracks
+        self._boxes = np.concatenate([boxes[keep], detections[new]]) if new else boxes[keep]
+        self.updates += 1
+        self.histogram.observe(time.perf_counter() - start)
+        return arrivals
+
+    def _associate(self, detections):
+        """
+        추적 박스 ↔ 감지 박스 짝짓기 (IoU 큰 순 → 남은 것은 중심 거리 가까운 순, 탐욕적)
+
+        서로가 서로의 최대 IoU인 쌍은 탐욕적 매칭에서도 항상 먼저 뽑히므로 한 번에 확정하고,
+        남은 박스만 파이썬 루프로 처리 (조각이 거의 안 움직이는 평소에는 루프 없음)
+
+        Returns:
+            list: [(추적 번호, 감지 번호)]
+        """
+        tracks = self._boxes
+        n, m = len(tracks), len(detections)
+        if not n or not m:
+            return []
+
+        iou = iou_matrix(tracks, detections)
+        best_d = iou.argmax(axis=1)
+        rows = np.arange(n)
+        mutual = (iou.argmax(axis=0)[best_d] == rows) & (iou[rows, best_d] >= self.iou_threshold)
+        matches = list(zip(rows[mutual].tolist(), best_d[mutual].tolist()))
+        if len(matches) == min(n, m):
+            return matches
+
+        used_t = {t for t, _ in matches}
+        used_d = {d for _, d in matches}
+
+        def greedy(scores, keep, descending):
+            keep[list(used_t), :] = False
+            keep[:, list(used_d)] = False
+            t_idx, d_idx = np.nonzero(keep)
+            values = scores[t_idx, d_idx]
+            for k in np.argsort(-values if descending else values, kind="stable"):
+                t, d = int(t_idx[k]), int(d_idx[k])
+                if t not in used_t and d not in used_d:
+                    used_t.add(t)
+                    used_d.add(d)
+                    matches.append((t, d))
+
+        greedy(iou, iou >= self.iou_threshold, descending=True)
+        if len(matches) < min(n, m):
+            # 오래 가려진 조각은 거리로 짝짓지 않음 (근처에 새로 놓인 조각을 가로채면 도착 누락)
+            live = np.array([track.misses <= self.max_misses for track in self.tracks])
+            centers_t = tracks[:, :2] + tracks[:, 2:4] / 2
+            centers_d = detections[:, :2] + detections[:, 2:4] / 2
+            distance = np.hypot(centers_t[:, None, 0] - centers_d[None, :, 0],
+                                centers_t[:, None, 1] - centers_d[None, :, 1])
+            limit = np.hypot(tracks[:, 2], tracks[:, 3])[:, None] * self.max_distance
+            greedy(distance, (distance <= limit) & live[:, None], descending=False)
+        return matches
+
+    def _overlaps_other(self, t, box):
+        """커진 박스가 다른 추적 박스(직전 위치)와 겹치는지 - 옆 조각과 붙어 한 덩어리로 보이는 경우"""
+        others = np.delete(self._boxes, t, axis=0)
+        if not len(others):
+            return False
+        x0, y0, x1, y1 = box[0], box[1], box[0] + box[2], box[1] + box[3]
+        overlap = ((np.minimum(others[:, 0] + others[:, 2], x1) > np.maximum(others[:, 0], x0))
+                   & (np.minimum(others[:, 1] + others[:, 3], y1) > np.maximum(others[:, 1], y0)))
+        return bool(overlap.any())
+
+    def _arrival(self, track, box, kind):
+        self.arrivals[kind] += 1
+        x, y, w, h = (int(v) for v in box[:4])
+        return {"track_id": track.id, "kind": kind, "x": x, "y": y, "w": w, "h": h}
+
+    def get_stats(self):
+        """
+        추적 통계 반환
+
+        Returns:
+            dict: 추적 중 / 확정 / 가려진 조각 수, 도착 수 (종류별), 처리 시간 p50/p95
+        """
+        snapshot = self.histogram.snapshot()
+        return {
+            "enabled": self.enabled,
+            "tracks": len(self.tracks),
+            "confirmed": sum(1 for track in self.tracks if track.confirmed),
+            "lost": sum(1 for track in self.tracks if track.misses > self.max_misses),
+            "arrivals_new": self.arrivals[ARRIVAL_NEW],
+            "arrivals_stacked": self.arrivals[ARRIVAL_STACKED],
+            "p50_ms": snapshot["p50_ms"],
+            "p95_ms": snapshot["p95_ms"]
+        }
+
+
+# 테스트 코드: 조각을 하나씩 놓으면서 일부는 이전 조각 위에 겹쳐 놓기
+#   → 한 프레임 윤곽선 수 / 도착 수 비교 + 추적 비용 측정
+if __name__ == "__main__":
+    from detector import NurungjiDetector
+
+    print("객체 추적 테스트 시작...")
+
+    detector = NurungjiDetector()
+    tracker = ObjectTracker(enabled=True)
+
+    # (x, y) 왼쪽 위 - 100x100 조각, 5번째 / 7번째는 1번 / 3번 조각에 절반 겹침
+    pieces = [(100, 100), (300, 100), (500, 100), (100, 350),
+              (150, 130), (300, 350), (550, 130), (500, 350)]
+
+    frame = np.full((720, 1280, 3), 40, dtype=np.uint8)
+    visible, arrivals = [], []
+    for i, (x, y) in enumerate(pieces):
+        frame[y:y + 100, x:x + 100] = 220
+        for _ in range(3):  # 조각을 놓은 뒤 3프레임
+            count, boxes = detector.detect(frame)
+            visible.append(count)
+            arrivals += tracker.update(boxes)
+
+    print(f"놓은 조각: {len(pieces)}개")
+    print(f"프레임별 윤곽선 수: {visible}")
+    print(f"마지막 프레임 윤곽선 수 (기존 판정): {visible[-1]}개")
+    print(f"도착 이벤트: {len(arrivals)}건 "
+          f"(새 조각 {sum(a['kind'] == ARRIVAL_NEW for a in arrivals)}, "
+          f"겹쳐 놓음 {sum(a['kind'] == ARRIVAL_STACKED for a in arrivals)})")
+
+    from pan_detector import PanCompleteDetector
+
+    def replay_pan(scenes):
+        """
+        장면 시퀀스 재생 → (도착 이벤트, 마지막 완료 팬)
+
+        Args:
+            scenes (list): 프레임별 조각 위치 [(x, y, w, h), ...] (팬이 비면 5초 동안 빈 프레임 추가)
+        """
+        pan_tracker, pan = ObjectTracker(enabled=True), PanCompleteDetector()
+        events = []
+        for i, rects in enumerate(scenes + [[]] * 6):
+            scene = np.full((720, 1280, 3), 40, dtype=np.uint8)
+            for x, y, w, h in rects:
+                scene[y:y + h, x:x + w] = 220
+            count, boxes = detector.detect(scene)
+            found = pan_tracker.update(boxes)
+            events += found
+            pan.update(count, found, now=float(i))
+            if pan.state == "empty" and not count:
+                pan_tracker.reset()
+        return events, pan.last_pan
+
+    # 가림: 조각 5개를 하나씩 놓은 뒤 손이 2개를 5프레임 가림 → 다시 보여도 새 도착이 아님
+    placed = [(100 + 200 * k, 100, 100, 100) for k in range(5)]
+    scenes = [placed[:k + 1] for k in range(5) for _ in range(3)]
+    scenes += [placed[2:]] * 5 + [placed] * 5
+    events, last_pan = replay_pan(scenes)
+    ok = len(events) == 5 and last_pan["count"] == 5
+    print(f"[가림 5프레임] 도착 {len(events)}건, 팬 갯수 {last_pan['count']}개"
+          + (" ✓" if ok else " ✗ (기대 5)"))
+
+    # 붙음: 옆 조각이 밀려 와서 한 덩어리로 보임 → 면적이 커져도 쌓임이 아님
+    a_piece, b_piece = (100, 400, 100, 100), (230, 400, 100, 100)
+    scenes = [[a_piece]] * 3 + [[a_piece, b_piece]] * 3 + [[a_piece, (200, 400, 100, 100)]] * 5
+    events, last_pan = replay_pan(scenes)
+    stacked = sum(e["kind"] == ARRIVAL_STACKED for e in events)
+    ok = ok and stacked == 0 and last_pan["count"] == 2
+    print(f"[옆 조각 붙음] 쌓임 도착 {stacked}건, 팬 갯수 {last_pan['count']}개"
+          + (" ✓" if stacked == 0 and last_pan["count"] == 2 else " ✗ (기대 쌓임 0, 2개)"))
+    if not ok:
+        print("   기대값 불일치")
+
+    # 추적 비용 (조각 30개, 매 프레임 약간씩 흔들림)
+    rng = np.random.default_rng(0)
+    base = [{"x": int(x), "y": int(y), "w": 90, "h": 90, "area": 8100}
+            for x, y in zip(rng.integers(0, 1800, 30), rng.integers(0, 1000, 30))]
+    ROUNDS = 2000
+    frames = [[dict(b, x=b["x"] + int(dx), y=b["y"] + int(dy))
+               for b, (dx, dy) in zip(base, rng.integers(-3, 4, (30, 2)))]
+              for _ in range(ROUNDS)]
+    bench = ObjectTracker(enabled=True)
+    start = time.perf_counter()
+    for boxes in frames:
+        bench.update(boxes)
+    cost_us = (time.perf_counter() - start) * 1e6 / ROUNDS
+    print(f"추적 비용 (조각 30개): {cost_us:.0f} us/프레임, 통계: {bench.get_stats()}")
@@ -0,0 +1,198 @@
+"""
+누룽지 생산량 카운팅 시스템 - MQTT 바이너리 메시지 형식 (버전 1)
+JSON dict 리스트 대신 고정 헤더 + 박스 레코드 배열로 직렬화 (PC 쪽 receiver/wire_format.py와 같은 형식)
+
+  - 토픽: MQTT_TOPICS["count_bin"] (JSON은 기존 MQTT_TOPICS["count"] 그대로 - 형식은 토픽으로 구분)
+  - 헤더 22바이트 (little endian):
+      magic "NC" | version u8 | flags u8 | seq u32 | timestamp f64 | count u16 | stable_count u16 | 박스 수 u16
+      flags bit0 = 하트비트 (박스 없음)
+  - 박스 레코드 14바이트 × 박스 수:
+      x i16 | y i16 | w i16 | h i16 | area i32 | aspect_ratio u16 (×100)
+  - 모르는 버전/magic은 ValueError (수신 측은 메시지를 버림)
+
+캘리브레이션 이미지 (MQTT_TOPICS["calibration_image_bin"], base64/JSON 없이 JPEG 원본):
+  - 헤더 18바이트: magic "NI" | version u8 | flags u8 | timestamp f64 | count u16 | width u16 | height u16
+  - 헤더 뒤는 JPEG 바이트 그대로
+"""
+
+import struct
+
+import numpy as np
+
+MAGIC = b"NC"
+VERSION = 1
+FLAG_HEARTBEAT = 0x01
+
+HEADER = struct.Struct("<2sBBIdHHH")
+
+IMAGE_MAGIC = b"NI"
+IMAGE_HEADER = struct.Struct("<2sBBdHHH")
+
+BOX_DTYPE = np.dtype([
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("w", "<i2"),
+    ("h", "<i2"),
+    ("area", "<i4"),
+    ("aspect_ratio", "<u2"),  # 소수 둘째 자리까지 (×100)
+])
+
+
+def _pack_boxes(boxes):
+    """박스 목록 (OBJECT_DTYPE 구조화 배열 또는 dict 리스트) → BOX_DTYPE 배열"""
+    packed = np.empty(len(boxes), dtype=BOX_DTYPE)
+    if len(boxes) == 0:
+        return packed
+    if isinstance(boxes, np.ndarray):
+        for field in ("x", "y", "w", "h", "area"):
+            packed[field] = boxes[field]
+        ratios = boxes["aspect_ratio"]
+    else:
+        for field in ("x", "y", "w", "h", "area"):
+            packed[field] = [box.get(field, 0) for box in boxes]
+        ratios = np.array([box.get("aspect_ratio", 0.0) for box in boxes], dtype=np.float32)
+    packed["aspect_ratio"] = np.clip(np.rint(ratios * 100), 0, 0xFFFF)
+    return packed
+
+
+def encode_count(seq, timestamp, count, boxes=None, stable_count=None, heartbeat=False):
+    """
+    카운트 메시지 직렬화
+
+    Args:
+        seq (int): 메시지 순번
+        timestamp (float): Unix 시각 (초)
+        count (int): 감지 개수
+        boxes (list | numpy.ndarray): 박스 목록 (하트비트면 무시)
+        stable_count (int): 안정화 개수 (None이면 count)
+        heartbeat (bool): 하트비트 여부
+
+    Returns:
+        bytes: 헤더 + 박스 레코드
+    """
+    packed = _pack_boxes([] if heartbeat or boxes is None else boxes)
+    header = HEADER.pack(
+        MAGIC, VERSION, FLAG_HEARTBEAT if heartbeat else 0,
+        seq & 0xFFFFFFFF, timestamp, count,
+        count if stable_count is None else stable_count, len(packed)
+    )
+    return header + packed.tobytes()
+
+
+def decode_count(data):
+    """
+    카운트 메시지 역직렬화
+
+    Args:
+        data (bytes): encode_count 결과
+
+    Returns:
+        dict: {"seq", "timestamp", "count", "stable_count", "heartbeat", "boxes"}
+              boxes는 BOX_DTYPE 구조화 배열 (aspect_ratio는 ×100 정수)
+
+    Raises:
+        ValueError: magic / 버전 / 길이가 맞지 않음
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"메시지가 너무 짧음: {len(data)} bytes")
+    magic, version, flags, seq, timestamp, count, stable_count, n_boxes = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"알 수 없는 형식: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"지원하지 않는 버전: {version}")
+    expected = HEADER.size + n_boxes * BOX_DTYPE.itemsize
+    if len(data) != expected:
+        raise ValueError(f"길이 불일치: {len(data)} bytes (예상 {expected})")
+
+    return {
+        "seq": seq,
+        "timestamp": timestamp,
+        "count": count,
+        "stable_count": stable_count,
+        "heartbeat": bool(flags & FLAG_HEARTBEAT),
+        "boxes": np.frombuffer(data, dtype=BOX_DTYPE, count=n_boxes, offset=HEADER.size)
+    }
+
+
+def encode_image(timestamp, count, jpeg, width, height):
+    """
+    캘리브레이션 이미지 직렬화
+
+    Args:
+        timestamp (float): Unix 시각 (초)
+        count (int): 감지 개수
+        jpeg (bytes | numpy.ndarray): JPEG 바이트 (cv2.imencode 결과 배열 가능)
+        width (int): 이미지 너비
+        height (int): 이미지 높이
+
+    Returns:
+        bytes: 헤더 + JPEG
+    """
+    header = IMAGE_HEADER.pack(IMAGE_MAGIC, VERSION, 0, timestamp, count, width, height)
+    return header + bytes(jpeg)
+
+
+def decode_image(data):
+    """
+    캘리브레이션 이미지 역직렬화
+
+    Returns:
+        dict: {"timestamp", "count", "width", "height", "jpeg"}
+
+    Raises:
+        ValueError: magic / 버전이 맞지 않음
+    """
+    if len(data) < IMAGE_HEADER.size:
+        raise ValueError(f"메시지가 너무 짧음: {len(data)} bytes")
+    magic, version, _, timestamp, count, width, height = IMAGE_HEADER.unpack_from(data)
+    if magic != IMAGE_MAGIC:
+        raise ValueError(f"알 수 없는 형식: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"지원하지 않는 버전: {version}")
+    return {
+        "timestamp": timestamp,
+        "count": count,
+        "width": width,
+        "height": height,
+        "jpeg": bytes(data[IMAGE_HEADER.size:])
+    }
+
+
+# 테스트 코드: 박스 0~30개에서 JSON 대비 크기 / 직렬화+파싱 시간 비교
+if __name__ == "__main__":
+    import json
+    import time
+    from detector import OBJECT_DTYPE, boxes_to_dicts
+
+    ROUNDS = 2000
+    print("카운트 메시지 형식 비교 (JSON vs 바이너리 v1)")
+    print(f"{'박스':>4} | {'JSON bytes':>10} {'JSON us':>8} | {'BIN bytes':>9} {'BIN us':>7} | 크기 비율")
+
+    rng = np.random.default_rng(0)
+    for n in (0, 1, 5, 10, 20, 30):
+        objects = np.empty(n, dtype=OBJECT_DTYPE)
+        objects["x"] = rng.integers(0, 1800, n)
+        objects["y"] = rng.integers(0, 1000, n)
+        objects["w"] = rng.integers(60, 120, n)
+        objects["h"] = rng.integers(60, 120, n)
+        objects["area"] = objects["w"] * objects["h"]
+        objects["aspect_ratio"] = objects["w"] / objects["h"]
+
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            message = json.dumps({
+                "timestamp": time.time(), "seq": i, "count": n, "stable_count": n,
+                "boxes": boxes_to_dicts(objects)
+            }, ensure_ascii=False).encode("utf-8")
+            json.loads(message.decode("utf-8"))
+        json_us = (time.perf_counter() - start) * 1e6 / ROUNDS
+
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            binary = encode_count(i, time.time(), n, objects)
+            decoded = decode_count(binary)
+        bin_us = (time.perf_counter() - start) * 1e6 / ROUNDS
+
+        assert (decoded["boxes"]["x"] == objects["x"]).all()
+        print(f"{n:>4} | {len(message):>10} {json_us:>8.1f} | {len(binary):>9} {bin_us:>7.1f} | "
+              f"{len(binary) / len(message) * 100:.0f}%")
@@ -9,7 +9,6 @@ from datetime import datetime
 import threading
 import sys
 import os
-import base64
 import io
 import urllib.request
 
@@ -576,10 +575,8 @@ class NurungjiCounterGUI:
         try:
             from PIL import Image, ImageTk
 
-            # base64 디코딩 → PIL Image
-            image_b64 = payload.get("image", "")
-            image_bytes = base64.b64decode(image_b64)
-            pil_image = Image.open(io.BytesIO(image_bytes))
+            # JPEG 바이트 → PIL Image
+            pil_image = Image.open(io.BytesIO(payload["jpeg"]))
 
             # Tkinter PhotoImage 변환
             photo = ImageTk.PhotoImage(pil_image)
@@ -708,8 +705,9 @@ class NurungjiCounterGUI:
     def _start_camera_stream(self, ip, port):
         """
         MJPEG HTTP 스트림을 읽어 프레임별로 UI 업데이트 (백그라운드 스레드)
+        뷰어 크기(640px)로 축소된 변형을 요청 → 엣지 전송량 감소, PC 쪽 리사이즈 불필요
         """
-        url = f"http://{ip}:{port}/stream"
+        url = f"http://{ip}:{port}/stream?w=640&q=60"
         try:
             self.root.after(0, lambda: self._camera_status_var.set(f"연결 중... {url}"))
             req = urllib.request.Request(url, headers={"User-Agent": "NurungjiViewer/1.0"})
@@ -757,8 +755,9 @@ class NurungjiCounterGUI:
         try:
             from PIL import Image, ImageTk
             pil_img = Image.open(io.BytesIO(jpeg_bytes))
-            # 창 크기에 맞게 축소 (최대 640×480)
-            pil_img.thumbnail((640, 480), Image.LANCZOS)
+            # 엣지가 640px 변형을 보내므로 보통 그대로 표시 (쿼리를 모르는 이전 버전 엣지만 축소)
+            if pil_img.width > 640 or pil_img.height > 480:
+                pil_img.thumbnail((640, 480), Image.LANCZOS)
             photo = ImageTk.PhotoImage(pil_img)
             self._camera_image_label.config(image=photo, text="")
             self._camera_photo = photo  # GC 방지
@@ -9,9 +9,11 @@ MQTT_BROKER_ADDRESS = "localhost"  # 또는 "192.168.1.100"
 MQTT_BROKER_PORT = 1883
 MQTT_TOPICS = {
     "count": "nurungji/count",
+    "count_bin": "nurungji/count/bin",  # 바이너리 카운트 (receiver/wire_format.py)
     "batch_complete": "nurungji/batch_complete",
     "status": "nurungji/status",
-    "calibration_image": "nurungji/calibration/image"  # 캘리브레이션 이미지 수신
+    "calibration_image": "nurungji/calibration/image",  # 캘리브레이션 이미지 수신 (base64 JSON)
+    "calibration_image_bin": "nurungji/calibration/image/jpeg"  # 캘리브레이션 이미지 (헤더 + JPEG)
 }
 
 # ============================================
@@ -5,6 +5,8 @@ MQTT 메시지 데이터 검증 및 변환
 
 from datetime import datetime
 
+from .wire_format import decode_count, decode_image
+
 
 class DataParser:
     """
@@ -27,12 +29,48 @@ class DataParser:
                 "timestamp": payload.get("timestamp", datetime.now().timestamp()),
                 "count": int(payload.get("count", 0)),
                 "stable_count": int(payload.get("stable_count", payload.get("count", 0))),
-                "boxes": payload.get("boxes", [])
+                "boxes": payload.get("boxes", []),
+                "seq": payload.get("seq"),
+                "heartbeat": bool(payload.get("heartbeat", False))  # True면 박스 없이 개수만 옴
             }
         except (ValueError, TypeError) as e:
             print(f"[DataParser] 카운트 메시지 파싱 오류: {e}")
             return None
 
+    @staticmethod
+    def parse_count_binary(data):
+        """
+        바이너리 카운트 메시지 파싱 (count_bin 토픽)
+
+        Args:
+            data (bytes): MQTT 메시지 페이로드
+
+        Returns:
+            dict: parse_count_message와 같은 키 (boxes는 NumPy 구조화 배열)
+        """
+        try:
+            return decode_count(data)
+        except ValueError as e:
+            print(f"[DataParser] 바이너리 카운트 메시지 파싱 오류: {e}")
+            return None
+
+    @staticmethod
+    def parse_calibration_image(data):
+        """
+        캘리브레이션 이미지 메시지 파싱 (calibration_image_bin 토픽)
+
+        Args:
+            data (bytes): MQTT 메시지 페이로드 (헤더 + JPEG)
+
+        Returns:
+            dict: {"timestamp", "count", "width", "height", "jpeg": bytes}
+        """
+        try:
+            return decode_image(data)
+        except ValueError as e:
+            print(f"[DataParser] 캘리브레이션 이미지 파싱 오류: {e}")
+            return None
+
     @staticmethod
     def parse_batch_message(payload):
         """
@@ -45,10 +83,23 @@ class DataParser:
             dict: 파싱된 데이터
         """
         try:
-            return {
+            parsed = {
                 "timestamp": payload.get("timestamp", datetime.now().timestamp()),
                 "final_count": int(payload.get("final_count", 0))
             }
+            # 생산 저널 형식: 팬 단위 기록 목록 (id, timestamp, final_count, product, frame_id)
+            if "pans" in payload:
+                parsed["pans"] = [
+                    {
+                        "id": pan.get("id"),
+                        "timestamp": pan.get("timestamp", parsed["timestamp"]),
+                        "final_count": int(pan.get("final_count", 0)),
+                        "product": pan.get("product"),
+                        "frame_id": pan.get("frame_id")
+                    }
+                    for pan in payload["pans"]
+                ]
+            return parsed
         except (ValueError, TypeError) as e:
             print(f"[DataParser] 팬 확정 메시지 파싱 오류: {e}")
             return None
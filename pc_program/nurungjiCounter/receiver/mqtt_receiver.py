@@ -4,9 +4,12 @@
 """
 
 import paho.mqtt.client as mqtt
+import base64
 import json
 import time
 import threading
+from collections import deque
+from .data_parser import DataParser
 from ..config import MQTT_BROKER_ADDRESS, MQTT_BROKER_PORT, MQTT_TOPICS, DEBUG_MODE
 
 
@@ -23,7 +26,7 @@ class MQTTReceiver:
             on_count_update (callable): 카운트 업데이트 콜백 (count, boxes)
             on_batch_complete (callable): 팬 확정 콜백 (final_count)
             on_status_update (callable): 상태 업데이트 콜백 (status_data)
-            on_calibration_image (callable): 캘리브레이션 이미지 수신 콜백 (payload)
+            on_calibration_image (callable): 캘리브레이션 이미지 수신 콜백 (payload - "jpeg" 키에 JPEG 바이트)
         """
         self.client = None
         self.connected = False
@@ -39,6 +42,16 @@ class MQTTReceiver:
         self.messages_received = 0
         self.last_message_time = None
 
+        # 카운트 메시지 순번 (누락 감지) / 하트비트에 쓸 마지막 박스 목록
+        self._last_count_seq = None
+        self._last_boxes = []
+        self.count_gaps = 0
+        self.heartbeats_received = 0
+
+        # 이미 처리한 팬 기록 id (엣지 재전송 시 중복 집계 방지)
+        self._seen_pan_ids = set()
+        self._seen_pan_order = deque()
+
         self._initialize_client()
 
     def _initialize_client(self):
@@ -120,6 +133,20 @@ class MQTTReceiver:
                 import time
                 self.last_message_time = time.time()
 
+            # 바이너리 카운트 (형식은 토픽으로 구분, 박스는 NumPy 배열로 바로 디코딩)
+            if msg.topic == MQTT_TOPICS.get("count_bin"):
+                payload = DataParser.parse_count_binary(msg.payload)
+                if payload is not None:
+                    self._handle_count_update(payload)
+                return
+
+            # 캘리브레이션 이미지 (헤더 + JPEG 원본)
+            if msg.topic == MQTT_TOPICS.get("calibration_image_bin"):
+                payload = DataParser.parse_calibration_image(msg.payload)
+                if payload is not None:
+                    self._handle_calibration_image(payload)
+                return
+
             # JSON 파싱
             payload = json.loads(msg.payload.decode('utf-8'))
 
@@ -134,6 +161,8 @@ class MQTTReceiver:
                 self._handle_status_update(payload)
 
             elif msg.topic == MQTT_TOPICS.get("calibration_image"):
+                # 이전 버전 엣지 (base64 JSON) → JPEG 바이트로 변환해서 같은 콜백 사용
+                payload["jpeg"] = base64.b64decode(payload.pop("image", ""))
                 self._handle_calibration_image(payload)
 
         except json.JSONDecodeError as e:
@@ -147,18 +176,43 @@ class MQTTReceiver:
         카운트 업데이트 처리
 
         Args:
-            payload (dict): 메시지 데이터
+            payload (dict): 메시지 데이터 (바이너리 형식이면 boxes가 NumPy 구조화 배열)
         """
         count = payload.get("count", 0)
-        boxes = payload.get("boxes", [])
+        self._check_count_seq(payload.get("seq"))
 
-        if DEBUG_MODE:
-            print(f"[MQTT Receiver] 카운트 수신: {count}개")
+        # 하트비트: 개수만 옴 (변경 없음) → 마지막으로 받은 박스 목록 사용
+        if payload.get("heartbeat"):
+            self.heartbeats_received += 1
+            boxes = self._last_boxes
+        else:
+            boxes = payload.get("boxes", [])
+            self._last_boxes = boxes
+            if DEBUG_MODE:
+                print(f"[MQTT Receiver] 카운트 수신: {count}개")
 
         # 콜백 호출
         if self.on_count_update:
             self.on_count_update(count, boxes)
 
+    def _check_count_seq(self, seq):
+        """
+        카운트 메시지 순번 확인 (엣지는 변경/하트비트마다 1씩 증가)
+
+        Args:
+            seq (int | None): 메시지 순번 (이전 버전 엣지는 None)
+        """
+        if seq is None:
+            return
+        last = self._last_count_seq
+        self._last_count_seq = seq
+        if last is None or seq <= last:
+            return  # 첫 메시지 또는 엣지 재시작
+        missed = seq - last - 1
+        if missed > 0:
+            self.count_gaps += missed
+            print(f"[MQTT Receiver] 카운트 메시지 누락: {missed}건 (#{last + 1}~#{seq - 1})")
+
     def _handle_batch_complete(self, payload):
         """
         팬 확정 처리
@@ -166,6 +220,16 @@ class MQTTReceiver:
         Args:
             payload (dict): 메시지 데이터
         """
+        # 생산 저널 형식: 팬 목록 (오프라인 동안 쌓인 기록이 한 번에 올 수 있음)
+        if "pans" in payload:
+            for pan in payload["pans"]:
+                pan_id = pan.get("id")
+                if pan_id in self._seen_pan_ids:
+                    continue  # 브로커 재전송(QoS 1) 또는 엣지 재시작 후 재전송
+                self._remember_pan(pan_id)
+                self._handle_batch_complete(pan)
+            return
+
         final_count = payload.get("final_count", 0)
 
         if DEBUG_MODE:
@@ -175,6 +239,15 @@ class MQTTReceiver:
         if self.on_batch_complete:
             self.on_batch_complete(final_count)
 
+    def _remember_pan(self, pan_id, limit=10000):
+        """처리한 팬 id 기록 (최근 limit개만 유지)"""
+        if pan_id is None:
+            return
+        self._seen_pan_ids.add(pan_id)
+        self._seen_pan_order.append(pan_id)
+        if len(self._seen_pan_order) > limit:
+            self._seen_pan_ids.discard(self._seen_pan_order.popleft())
+
     def _handle_status_update(self, payload):
         """
         상태 업데이트 처리
@@ -194,7 +267,7 @@ class MQTTReceiver:
         캘리브레이션 이미지 수신 처리
 
         Args:
-            payload (dict): {"timestamp": ..., "count": ..., "image": base64_string}
+            payload (dict): {"timestamp": ..., "count": ..., "jpeg": JPEG 바이트}
         """
         if DEBUG_MODE:
             print(f"[MQTT Receiver] 캘리브레이션 이미지 수신: {payload.get('count')}개")
@@ -255,7 +328,9 @@ class MQTTReceiver:
             return {
                 "connected": self.connected,
                 "messages_received": self.messages_received,
-                "last_message_time": self.last_message_time
+                "last_message_time": self.last_message_time,
+                "heartbeats_received": self.heartbeats_received,
+                "count_gaps": self.count_gaps
             }
 
     def disconnect(self):
@@ -0,0 +1,117 @@
+"""
+누룽지 생산량 카운팅 시스템 - MQTT 바이너리 메시지 형식 (버전 1) 디코더
+엣지 디바이스 edge_device/wire_format.py와 같은 형식
+
+  - 헤더 22바이트 (little endian):
+      magic "NC" | version u8 | flags u8 | seq u32 | timestamp f64 | count u16 | stable_count u16 | 박스 수 u16
+      flags bit0 = 하트비트 (박스 없음)
+  - 박스 레코드 14바이트 × 박스 수:
+      x i16 | y i16 | w i16 | h i16 | area i32 | aspect_ratio u16 (×100)
+
+캘리브레이션 이미지:
+  - 헤더 18바이트: magic "NI" | version u8 | flags u8 | timestamp f64 | count u16 | width u16 | height u16
+  - 헤더 뒤는 JPEG 바이트 그대로
+"""
+
+import struct
+
+import numpy as np
+
+MAGIC = b"NC"
+VERSION = 1
+FLAG_HEARTBEAT = 0x01
+
+HEADER = struct.Struct("<2sBBIdHHH")
+
+IMAGE_MAGIC = b"NI"
+IMAGE_HEADER = struct.Struct("<2sBBdHHH")
+
+# 전송용 레코드
+BOX_DTYPE = np.dtype([
+    ("x", "<i2"),
+    ("y", "<i2"),
+    ("w", "<i2"),
+    ("h", "<i2"),
+    ("area", "<i4"),
+    ("aspect_ratio", "<u2"),
+])
+
+# 디코딩 결과 (JSON 박스 dict와 같은 필드명 → box["x"] 접근 호환)
+OBJECT_DTYPE = np.dtype([
+    ("x", np.int32),
+    ("y", np.int32),
+    ("w", np.int32),
+    ("h", np.int32),
+    ("area", np.int32),
+    ("aspect_ratio", np.float32),
+])
+
+
+def decode_count(data):
+    """
+    카운트 메시지 역직렬화
+
+    Args:
+        data (bytes): MQTT 메시지 페이로드
+
+    Returns:
+        dict: {"seq", "timestamp", "count", "stable_count", "heartbeat", "boxes"}
+              boxes는 OBJECT_DTYPE 구조화 배열
+
+    Raises:
+        ValueError: magic / 버전 / 길이가 맞지 않음
+    """
+    if len(data) < HEADER.size:
+        raise ValueError(f"메시지가 너무 짧음: {len(data)} bytes")
+    magic, version, flags, seq, timestamp, count, stable_count, n_boxes = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"알 수 없는 형식: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"지원하지 않는 버전: {version}")
+    expected = HEADER.size + n_boxes * BOX_DTYPE.itemsize
+    if len(data) != expected:
+        raise ValueError(f"길이 불일치: {len(data)} bytes (예상 {expected})")
+
+    packed = np.frombuffer(data, dtype=BOX_DTYPE, count=n_boxes, offset=HEADER.size)
+    boxes = np.empty(n_boxes, dtype=OBJECT_DTYPE)
+    for field in ("x", "y", "w", "h", "area"):
+        boxes[field] = packed[field]
+    boxes["aspect_ratio"] = packed["aspect_ratio"] / 100.0
+
+    return {
+        "seq": seq,
+        "timestamp": timestamp,
+        "count": count,
+        "stable_count": stable_count,
+        "heartbeat": bool(flags & FLAG_HEARTBEAT),
+        "boxes": boxes
+    }
+
+
+def decode_image(data):
+    """
+    캘리브레이션 이미지 역직렬화
+
+    Args:
+        data (bytes): MQTT 메시지 페이로드
+
+    Returns:
+        dict: {"timestamp", "count", "width", "height", "jpeg"}
+
+    Raises:
+        ValueError: magic / 버전이 맞지 않음
+    """
+    if len(data) < IMAGE_HEADER.size:
+        raise ValueError(f"메시지가 너무 짧음: {len(data)} bytes")
+    magic, version, _, timestamp, count, width, height = IMAGE_HEADER.unpack_from(data)
+    if magic != IMAGE_MAGIC:
+        raise ValueError(f"알 수 없는 형식: {magic!r}")
+    if version != VERSION:
+        raise ValueError(f"지원하지 않는 버전: {version}")
+    return {
+        "timestamp": timestamp,
+        "count": count,
+        "width": width,
+        "height": height,
+        "jpeg": bytes(data[IMAGE_HEADER.size:])
+    }